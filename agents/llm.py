@@ -0,0 +1,20 @@
+from langchain_openai import ChatOpenAI
+from config import OPENAI_API_KEY, LANGSMITH_API_KEY
+import os
+from langchain.callbacks.tracers import LangChainTracer
+from stubs import OFFLINE_PROVIDERS
+from tools.metrics import llm_metrics
+
+if OFFLINE_PROVIDERS:
+    # Benchmarks and local runs without network: canned replies with simulated latency
+    from stubs import StubChatModel
+
+    llm = StubChatModel(callbacks=[llm_metrics])
+else:
+    os.environ["LANGSMITH_API_KEY"] = LANGSMITH_API_KEY
+    os.environ["LANGCHAIN_TRACING_V2"] = "true"
+
+    # One tracer and one chat client (with its pooled HTTP connections) shared by every agent
+    tracer = LangChainTracer()
+
+    llm = ChatOpenAI(model="gpt-4o-mini", api_key=OPENAI_API_KEY, callbacks=[tracer, llm_metrics])
@@ -2,10 +2,18 @@
 
 import os
 import json
-from typing import Any, Dict, List
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Literal, Optional, Union
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
 import uvicorn
 
 # 1) Enable LangSmith v2 tracing globally
@@ -17,14 +25,66 @@ os.environ["LANGCHAIN_TRACING_V2"] = "true"
 from langchain_core.tracers.context import tracing_v2_enabled
 tracing_v2_enabled()
 
+# OFFLINE_PROVIDERS=1 serves every provider and the chat model from local stubs (see stubs.py)
+import stubs
+if stubs.OFFLINE_PROVIDERS:
+    stubs.install()
+
 # 2) Your workflow & state type
-from workflow import create_financial_analysis_graph, FinancialAnalysisState
+from workflow import (
+    FinancialAnalysisState, SectionResult, ANALYSIS_MODE,
+    iter_sections, stream_summary,
+)
+from digest import indicator_rows
+from jobs import job_manager, JobQueueFull
+from portfolio import (
+    PORTFOLIO_CONCURRENCY, PORTFOLIO_MAX_CONCURRENCY, PORTFOLIO_MAX_TICKERS,
+    news_sentiment, normalize_tickers, portfolio_summary, run_portfolio,
+)
+from backtest import (
+    BACKTEST_COST_BPS, BACKTEST_DAYS, BACKTEST_MAX_TICKERS, RANK_METRICS,
+    SweepBusy, backtest, check_capacity, load_history, shutdown_pool, sweep,
+)
+from registry import registry
+from screener import ScreenError, screen
+from tools.company_news_tool import NEWS_WINDOW_DAYS
+from tools.cache import tool_cache, summary_cache, provider_flight
+from tools.log import RequestLogMiddleware, configure_logging, shutdown_logging, log_payload
+from tools.metrics import MetricsMiddleware
+from tools.rate_limit import scheduler, request_priority, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from tools.stock_data_tool import get_stock_quotes
+
+configure_logging()
+logger = logging.getLogger("api")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compile graphs, build shared clients and warm up before taking traffic
+    await registry.start()
+    job_manager.start()
+    yield
+    await job_manager.stop()
+    await asyncio.to_thread(shutdown_pool)
+    await registry.close()
+    shutdown_logging()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestLogMiddleware)
 
 # 3) Pydantic models
 class TickerRequest(BaseModel):
     ticker: str
+    # "agents" (ReAct sub-agents) or "direct" (tools called in code); defaults to ANALYSIS_MODE
+    mode: Optional[Literal["agents", "direct"]] = None
+
+class PortfolioRequest(BaseModel):
+    tickers: List[str]
+    mode: Optional[Literal["agents", "direct"]] = None
+    # Tickers analysed at once; defaults to PORTFOLIO_CONCURRENCY, capped at PORTFOLIO_MAX_CONCURRENCY
+    concurrency: Optional[int] = None
 
 class AnalysisResponse(BaseModel):
     stock_data:      Dict[str, Any]
@@ -32,11 +92,87 @@ class AnalysisResponse(BaseModel):
     technical_data:  List[Dict[str, Any]]
     final_summary:   str
     company_data:    Dict[str, Any]
+    # Section -> provider that served it, e.g. {"stock_data": "yfinance"}
+    providers:       Dict[str, str] = {}
+
+class QuotesResponse(BaseModel):
+    data:    Dict[str, Dict[str, Any]]
+    missing: List[str]
+
+class SentimentResponse(BaseModel):
+    days:    int
+    seconds: float
+    # Ticker -> {"score", "label", "articles", "positive", "negative", "neutral"}
+    data:    Dict[str, Dict[str, Any]]
+    errors:  Dict[str, str]
+
+class ScreenMatch(BaseModel):
+    ticker: str
+    # Date of the ticker's latest stored bar, which the screen was evaluated on
+    as_of:  str
+    close:  Optional[float] = None
+    rank:   Optional[float] = None
+
+class ScreenResponse(BaseModel):
+    expression: str
+    rank:       str
+    universe:   int
+    matched:    int
+    seconds:    float
+    results:    List[ScreenMatch]
+
+class BacktestRequest(BaseModel):
+    tickers:  List[str]
+    # Signal rules in the /screen expression language; without `exit` the position is held while `entry` is true
+    entry:    str
+    exit:     Optional[str] = None
+    days:     int = BACKTEST_DAYS
+    cost_bps: float = BACKTEST_COST_BPS
+
+class SweepRequest(BacktestRequest):
+    # Values filled into {placeholders} of entry/exit, e.g. {"period": [7, 14], "level": [20, 30]}
+    grid:    Dict[str, List[Union[int, float, str]]]
+    rank_by: Literal[tuple(RANK_METRICS)] = "sharpe"
+    top:     int = 20
+
+class BacktestResponse(BaseModel):
+    entry:     str
+    exit:      Optional[str] = None
+    cost_bps:  float
+    seconds:   float
+    aggregate: Dict[str, Any]
+    tickers:   Dict[str, Dict[str, Any]]
+    # Ticker -> provider whose history was used
+    sources:   Dict[str, str]
+    missing:   List[str]
+
+class SweepResponse(BaseModel):
+    entry:    str
+    exit:     Optional[str] = None
+    cost_bps: float
+    rank_by:  str
+    configs:  int
+    failed:   int
+    workers:  int
+    seconds:  float
+    results:  List[Dict[str, Any]]
+    errors:   List[Dict[str, Any]]
+    sources:  Dict[str, str]
+    missing:  List[str]
+
+class JobResponse(BaseModel):
+    job_id:       str
+    status:       Literal["queued", "running", "succeeded", "failed"]
+    submitted_at: float
+    started_at:   Optional[float] = None
+    finished_at:  Optional[float] = None
+    result:       Optional[AnalysisResponse] = None
+    error:        Optional[str] = None
 
 
 # 4) Core graph invocation
-async def run_financial_analysis(ticker: str) -> FinancialAnalysisState:
-    graph = create_financial_analysis_graph()
+async def run_financial_analysis(ticker: str, mode: Optional[str] = None) -> FinancialAnalysisState:
+    graph = registry.graph(mode)
     init_state: FinancialAnalysisState = {
         "ticker":          ticker,
         "stock_data":      {},
@@ -49,84 +185,386 @@ async def run_financial_analysis(ticker: str) -> FinancialAnalysisState:
     return await graph.ainvoke(init_state)
 
 
-# 5) Helper to pull out the JSON payload from your tool messages
-def extract_tool_json(
-    messages: List[Any],
-    tool_name: str
-) -> Any:
-    for msg in messages:
-        msg_type    = getattr(msg, "type", None) or getattr(msg, "message_type", None)
-        msg_name    = getattr(msg, "name", None) or getattr(msg, "tool", None)
-        msg_content = getattr(msg, "content", None)
-        if msg_type == "tool" and msg_name == tool_name and msg_content:
-            return json.loads(msg_content)
-        if isinstance(msg, dict) and msg.get("type") == "tool" and msg.get("name") == tool_name:
-            return json.loads(msg["content"])
-    return {}
+# 5) Section payloads: the key to unwrap from each section's tool result (None for the result itself)
+SECTION_KEYS = {
+    "stock_data":     None,
+    "news_data":      "data",
+    "technical_data": "data",
+    "company_data":   None,
+}
+
+
+def extract_section(section: str, result: SectionResult) -> Any:
+    """Turn a section result from the graph into the section's response payload."""
+    key = SECTION_KEYS[section]
+    payload = (result or {}).get("data") or {}
+    if key is None:
+        return payload
+
+    data = payload.get(key) or []
+    if section == "technical_data" and isinstance(data, dict):
+        # Alpha Vantage returns {indicator: {date: values}} rather than rows
+        data = indicator_rows(data)
+    return data
+
+
+def section_providers(state: FinancialAnalysisState) -> Dict[str, str]:
+    """Provider that served each section, for sections that returned data."""
+    return {
+        section: state[section]["provider"]
+        for section in SECTION_KEYS
+        if (state.get(section) or {}).get("data") is not None
+    }
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def ndjson_line(data: Any) -> str:
+    return json.dumps(data, default=str) + "\n"
+
+
+async def analyze_ticker(ticker: str, mode: str, priority: int = PRIORITY_INTERACTIVE) -> AnalysisResponse:
+    """Run the graph for `ticker` and shape the response. Executed on the job pool."""
+    # Interactive analyses are served ahead of queued background provider calls
+    request_priority.set(priority)
+    state = await run_financial_analysis(ticker, mode)
+
+    stock_data = extract_section("stock_data", state["stock_data"])
+    news_data = extract_section("news_data", state["news_data"])
+    technical_data = extract_section("technical_data", state["technical_data"])
+    company_data = extract_section("company_data", state["company_data"])
+
+    logger.info("Analysis completed", extra={"ticker": ticker, "mode": mode, "providers": section_providers(state)})
+    log_payload(
+        logger, "Response data",
+        company_data=company_data, stock_data=stock_data, news_data=news_data, technical_data=technical_data,
+    )
+
+    return AnalysisResponse(
+        stock_data=stock_data,
+        news_data=news_data,
+        technical_data=technical_data,
+        final_summary=state["final_summary"],
+        company_data=company_data,
+        providers=section_providers(state)
+    )
+
+
+def submit_analysis(request: TickerRequest):
+    """
+    Queue an analysis on the bounded job pool. Requests for a ticker and mode
+    that is already queued or running attach to that job. Raises 429 with
+    Retry-After when the pool is saturated.
+    """
+    ticker = request.ticker.strip().upper()
+    mode = request.mode or ANALYSIS_MODE
+    try:
+        return job_manager.submit(analyze_ticker, ticker, mode, key=(ticker, mode))
+    except JobQueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
 
 
 # 6) Your FastAPI routes
 @app.post("/analyze", response_model=AnalysisResponse)
 async def analyze(request: TickerRequest):
+    job = submit_analysis(request)
     try:
-        state = await run_financial_analysis(request.ticker)
+        return await job.wait()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        stock_data = extract_tool_json(
-            state["stock_data"]["messages"],
-            "get_stock_info_fmp"
-        )
 
-        news_raw = extract_tool_json(
-            state["news_data"]["messages"],
-            "get_company_news_finnhub"
-        )
-        news_data = news_raw.get("data", [])
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+async def create_job(request: TickerRequest, response: Response):
+    job = submit_analysis(request)
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
-        tech_raw = extract_tool_json(
-            state["technical_data"]["messages"],
-            "get_technical_indicators_twelvedata_tool"
-        )
-        technical_data = tech_raw.get("data", [])
 
-        company_data = extract_tool_json(
-            state["company_data"]["messages"],
-            "get_fundamentals_finnhub"
+@app.post("/analyze/stream")
+async def analyze_stream(request: TickerRequest):
+    """
+    Server-sent-events variant of /analyze. Emits one event per section
+    (stock_data, news_data, technical_data, company_data) as soon as it is
+    gathered, then `summary_token` events while the summary is generated,
+    and finally `done` with the full summary (or `error`). The stream holds a
+    slot of the analysis job pool while it runs; 429 when the pool is full.
+    """
+    request_priority.set(PRIORITY_INTERACTIVE)
+    ticker = request.ticker.strip().upper()
+    mode = request.mode or ANALYSIS_MODE
+    if job_manager.full():
+        retry_after = job_manager.retry_after()
+        raise HTTPException(
+            status_code=429,
+            detail=f"Job queue is full, retry in {retry_after}s",
+            headers={"Retry-After": str(retry_after)}
         )
 
-        print("----" * 10)
-        print("RESPONSE DATA")
-        print("----" * 10)
+    async def events():
+        state: FinancialAnalysisState = {"ticker": ticker}
+        # Taken inside the generator so the finally below always releases it
+        try:
+            lease = job_manager.lease()
+        except JobQueueFull as e:
+            yield sse_event("error", {"detail": str(e)})
+            return
+        try:
+            await lease.acquired()
+            async for section, result in iter_sections(ticker, mode):
+                state[section] = result
+                yield sse_event(section, extract_section(section, result))
 
-        print("company_data")
-        print(company_data)
-        print("\n" * 5)
+            summary = []
+            async for token in stream_summary(state):
+                summary.append(token)
+                yield sse_event("summary_token", {"text": token})
 
-        print("stock_data")
-        print(stock_data)
-        print("\n" * 5)
+            yield sse_event("done", {"final_summary": "".join(summary), "providers": section_providers(state)})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            lease.release()
 
-        print("news_data")
-        print(news_data)
-        print("\n" * 5)
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-        print("technical_data")
-        print(technical_data)
-        print("\n" * 5)
 
-        return AnalysisResponse(
-            stock_data=stock_data,
-            news_data=news_data,
-            technical_data=technical_data,
-            final_summary=state["final_summary"],
-            company_data=company_data
+@app.post("/portfolio")
+async def analyze_portfolio(request: PortfolioRequest):
+    """
+    Analyse a watchlist, streaming NDJSON: one `{"type": "result", "ticker", "result"}`
+    (or `{"type": "error", "ticker", "error"}`) line per ticker as it finishes,
+    then a `{"type": "summary", "summary"}` line aggregating the portfolio.
+    At most `concurrency` tickers run at once, each as a job on the shared
+    analysis pool (so /analyze's cap applies) at background priority; quotes are
+    fetched in batches and shared provider calls and summaries are served
+    from the caches. Returns 429 when the pool's queue is already full.
+    """
+    tickers = normalize_tickers(request.tickers)
+    if not tickers:
+        raise HTTPException(status_code=400, detail="No tickers provided")
+    if len(tickers) > PORTFOLIO_MAX_TICKERS:
+        raise HTTPException(status_code=400, detail=f"At most {PORTFOLIO_MAX_TICKERS} tickers per portfolio")
+    mode = request.mode or ANALYSIS_MODE
+    concurrency = max(1, min(request.concurrency or PORTFOLIO_CONCURRENCY, PORTFOLIO_MAX_CONCURRENCY))
+    if job_manager.full():
+        retry_after = job_manager.retry_after()
+        raise HTTPException(
+            status_code=429,
+            detail=f"Job queue is full, retry in {retry_after}s",
+            headers={"Retry-After": str(retry_after)}
         )
+
+    async def analyze_on_pool(ticker):
+        # Queued alongside /analyze jobs, waiting for room rather than dropping the ticker when the
+        # queue is full; its provider calls yield to interactive requests
+        job = await job_manager.submit_when_ready(analyze_ticker, ticker, mode, PRIORITY_BACKGROUND, key=(ticker, mode))
+        return await job.wait()
+
+    async def lines():
+        # Quote prefetches too
+        request_priority.set(PRIORITY_BACKGROUND)
+        started = time.monotonic()
+        results, errors = {}, {}
+        async for ticker, result, error in run_portfolio(tickers, analyze_on_pool, concurrency):
+            if error is None:
+                results[ticker] = result
+                yield ndjson_line({"type": "result", "ticker": ticker, "result": result.model_dump()})
+            else:
+                errors[ticker] = error
+                yield ndjson_line({"type": "error", "ticker": ticker, "error": error})
+
+        summary = portfolio_summary(results, errors, started)
+        logger.info("Portfolio completed", extra={
+            "tickers": len(tickers), "failed": len(errors), "mode": mode, "seconds": summary["seconds"],
+        })
+        yield ndjson_line({"type": "summary", "summary": summary})
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/quotes", response_model=QuotesResponse)
+async def quotes(symbols: str = Query(..., description="Comma-separated tickers, e.g. AAPL,MSFT,GOOGL")):
+    tickers = [s.strip().upper() for s in symbols.split(",") if s.strip()]
+    if not tickers:
+        raise HTTPException(status_code=400, detail="No symbols provided")
+
+    try:
+        data = await get_stock_quotes(tickers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    return QuotesResponse(
+        data=data,
+        missing=[t for t in dict.fromkeys(tickers) if t not in data]
+    )
+
+
+@app.get("/sentiment", response_model=SentimentResponse)
+async def sentiment(
+    tickers: str = Query(..., description="Comma-separated tickers, e.g. AAPL,MSFT,GOOGL"),
+    # The merged news feed keeps NEWS_WINDOW_DAYS of stories, so a longer window would score the same articles
+    days: int = Query(min(7, NEWS_WINDOW_DAYS), ge=1, le=NEWS_WINDOW_DAYS),
+):
+    """News sentiment per ticker, scored locally from the merged news feed without any LLM calls."""
+    symbols = normalize_tickers(tickers.split(","))
+    if not symbols:
+        raise HTTPException(status_code=400, detail="No tickers provided")
+    if len(symbols) > PORTFOLIO_MAX_TICKERS:
+        raise HTTPException(status_code=400, detail=f"At most {PORTFOLIO_MAX_TICKERS} tickers per request")
+
+    # Bulk news fetches yield the provider rate limits to interactive requests
+    request_priority.set(PRIORITY_BACKGROUND)
+    started = time.monotonic()
+    data, errors = await news_sentiment(symbols, days)
+    return SentimentResponse(days=days, seconds=round(time.monotonic() - started, 3), data=data, errors=errors)
+
+
+@app.get("/screen", response_model=ScreenResponse)
+async def screen_universe(
+    expr: str = Query(..., description='Condition, e.g. "rsi(14) < 30 and close > sma(50)", or a preset such as 52w_high_breakout'),
+    rank: Optional[str] = Query(None, description="Expression to order matches by (default: close * volume)"),
+    ascending: bool = False,
+    limit: int = Query(50, ge=1, le=1000),
+):
+    """Screen every ticker in the local OHLCV store at its latest bar."""
+    try:
+        # Vectorized NumPy over the whole universe; keep it off the event loop
+        return await asyncio.to_thread(screen, expr, rank, ascending, limit)
+    except ScreenError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def load_backtest_history(request: BacktestRequest):
+    tickers = normalize_tickers(request.tickers)
+    if not tickers:
+        raise HTTPException(status_code=400, detail="No tickers provided")
+    if len(tickers) > BACKTEST_MAX_TICKERS:
+        raise HTTPException(status_code=400, detail=f"At most {BACKTEST_MAX_TICKERS} tickers per backtest")
+    universe, sources, missing = await load_history(tickers, request.days)
+    if not len(universe):
+        raise HTTPException(status_code=404, detail="No historical data for any of the tickers")
+    return universe, sources, missing
+
+
+@app.post("/backtest", response_model=BacktestResponse)
+async def run_backtest(request: BacktestRequest):
+    """Backtest one long/flat rule set on daily bars from the historical tools."""
+    universe, sources, missing = await load_backtest_history(request)
+    try:
+        result = await asyncio.to_thread(backtest, universe, request.entry, request.exit, request.cost_bps)
+    except ScreenError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**result, "sources": sources, "missing": missing}
+
+
+@app.post("/backtest/sweep", response_model=SweepResponse)
+async def run_sweep(request: SweepRequest):
+    """
+    Backtest every grid combination of the entry/exit templates on the shared
+    process pool, best first. Raises 429 with Retry-After when
+    BACKTEST_MAX_SWEEPS sweeps are already running, before any history is
+    fetched, and 503 if the pool's processes died mid-sweep.
+    """
+    try:
+        check_capacity(request.grid)
+        universe, sources, missing = await load_backtest_history(request)
+        result = await asyncio.to_thread(
+            sweep, universe, request.entry, request.grid, request.exit, request.cost_bps,
+            request.rank_by, request.top,
+        )
+    except ScreenError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SweepBusy as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except BrokenProcessPool:
+        # The next sweep starts a fresh pool
+        raise HTTPException(status_code=503, detail="Backtest workers crashed, retry the sweep")
+    return {**result, "sources": sources, "missing": missing}
+
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    return {
+        "status": "ok" if registry.ready else "starting",
+        "warmup_seconds": registry.warmup_seconds,
+        "cache": tool_cache.stats(),
+        "summary_cache": summary_cache.stats(),
+        "inflight": {
+            "analyses": len(job_manager),
+            "provider_calls": len(provider_flight),
+        },
+        "provider_queues": scheduler.queue_depth(),
+        "jobs": job_manager.stats(),
+    }
+
+
+class StatsCollector:
+    """Cache and in-flight figures read from the live objects at scrape time."""
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache misses", labels=["cache"])
+        evictions = CounterMetricFamily("cache_evictions", "Entries evicted to stay under max_entries", labels=["cache"])
+        entries = GaugeMetricFamily("cache_entries", "Entries currently cached", labels=["cache"])
+        hit_ratio = GaugeMetricFamily("cache_hit_ratio", "Hits over lookups since start", labels=["cache"])
+        for name, cache in (("tool", tool_cache), ("summary", summary_cache)):
+            stats = cache.stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            evictions.add_metric([name], stats["evictions"])
+            if stats["entries"] is not None:
+                entries.add_metric([name], stats["entries"])
+            hit_ratio.add_metric([name], stats["hit_ratio"])
+        yield from (hits, misses, evictions, entries, hit_ratio)
+
+        queue_depth = GaugeMetricFamily("provider_queue_depth", "Calls waiting for a provider's rate limiter", labels=["provider"])
+        for provider, depth in scheduler.queue_depth().items():
+            queue_depth.add_metric([provider], depth)
+        yield queue_depth
+
+        jobs = job_manager.stats()
+        yield GaugeMetricFamily("analyses_in_flight", "Distinct analyses queued or running", value=len(job_manager))
+        yield GaugeMetricFamily("provider_calls_in_flight", "Coalesced upstream provider calls in progress", value=len(provider_flight))
+        yield GaugeMetricFamily("jobs_running", "Jobs being run by a worker", value=jobs["running"])
+        yield GaugeMetricFamily("jobs_queued", "Jobs waiting for a worker", value=jobs["queued"])
+
+
+REGISTRY.register(StatsCollector())
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition of latency histograms, error counters, cache and in-flight gauges."""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
 
 
 if __name__ == "__main__":
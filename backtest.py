@@ -0,0 +1,377 @@
+import os
+import math
+import time
+import uuid
+import asyncio
+import logging
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from screener import ScreenError, Universe, evaluate_series, stack
+from tools.lazy import lazy_object
+from tools.ohlcv_store import to_day, from_day
+
+logger = logging.getLogger(__name__)
+
+# (provider, historical tool) in fallback order; imported on first use so sweep workers start without the LangChain stack
+HISTORICAL_TOOLS = [
+    ("fmp", lazy_object("tools.historical_data_tool", "get_historical_data_fmp")),
+    ("stooq", lazy_object("tools.historical_data_tool", "get_historical_data_stooq")),
+]
+
+BARS_PER_YEAR = 252
+# Calendar days of history fetched per ticker
+BACKTEST_DAYS = int(os.getenv("BACKTEST_DAYS", "730"))
+# Cost of each position change, in basis points of the traded value
+BACKTEST_COST_BPS = float(os.getenv("BACKTEST_COST_BPS", "5"))
+# Processes in the pool shared by every parameter sweep
+BACKTEST_WORKERS = int(os.getenv("BACKTEST_WORKERS", str(os.cpu_count() or 1)))
+# Sweeps allowed on the pool at once; more are rejected with SweepBusy
+BACKTEST_MAX_SWEEPS = int(os.getenv("BACKTEST_MAX_SWEEPS", "2"))
+BACKTEST_MAX_CONFIGS = int(os.getenv("BACKTEST_MAX_CONFIGS", "20000"))
+BACKTEST_MAX_TICKERS = int(os.getenv("BACKTEST_MAX_TICKERS", "100"))
+# Sweeps smaller than this run in-process; starting the pool costs more than it saves
+SWEEP_MIN_PARALLEL_CONFIGS = 64
+# Concurrent history fetches while loading tickers
+FETCH_CONCURRENCY = 8
+
+# Retry-After estimate used before any pooled sweep has finished
+DEFAULT_SWEEP_SECONDS = 10.0
+
+# Metrics a sweep can be ranked by, and whether lower is better
+RANK_METRICS = {
+    "sharpe": False, "total_return": False, "annual_return": False,
+    "max_drawdown": False, "hit_rate": False, "volatility": True,
+}
+
+
+def _frame_block(df) -> np.ndarray:
+    """Date-indexed OHLCV frame as the store's (6, n) layout."""
+    days = np.array([to_day(ts) for ts in df.index], dtype=float)
+    return np.vstack([days] + [df[col].to_numpy(dtype=float) for col in ("Open", "High", "Low", "Close", "Volume")])
+
+
+async def load_history(tickers: list, days: int = BACKTEST_DAYS) -> tuple:
+    """
+    Fetch daily OHLCV for `tickers` through the historical tools (FMP, then
+    Stooq) and stack it into a Universe. Returns (universe, {ticker: provider},
+    [tickers with no data]).
+    """
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    async def fetch(ticker):
+        async with semaphore:
+            for provider, historical_tool in HISTORICAL_TOOLS:
+                try:
+                    df = await historical_tool.ainvoke({"ticker": ticker, "days": days})
+                    if df is not None and not df.empty:
+                        return ticker, provider, _frame_block(df)
+                except Exception as e:
+                    logger.warning("Error while fetching OHLCV from %s for %s: %s", provider, ticker, e)
+            return ticker, None, None
+
+    fetched = await asyncio.gather(*(fetch(ticker) for ticker in tickers))
+    blocks = {ticker: block for ticker, _, block in fetched if block is not None}
+    sources = {ticker: source for ticker, source, block in fetched if block is not None}
+    missing = [ticker for ticker, _, block in fetched if block is None]
+    bars = max((block.shape[1] for block in blocks.values()), default=0)
+    return stack(blocks, bars), sources, missing
+
+
+def _signal(expression: str, universe: Universe) -> np.ndarray:
+    value = evaluate_series(expression, universe)
+    if value.dtype != bool:
+        raise ScreenError(f"Signal rules must be conditions, got {expression!r}")
+    return value
+
+
+def positions(entry: np.ndarray, exit: np.ndarray = None) -> np.ndarray:
+    """
+    Long/flat positions (tickers, bars) decided at each bar's close. Without an
+    exit rule the position is held while `entry` is true; with one it is
+    opened on `entry` and held until `exit` (exit wins when both fire).
+    """
+    if exit is None:
+        return entry.astype(float)
+
+    fired = entry | exit
+    bars = np.arange(entry.shape[-1])
+    # Index of the latest bar where either rule fired; its rule decides the position
+    last = np.maximum.accumulate(np.where(fired, bars, -1), axis=-1)
+    state = np.take_along_axis(entry & ~exit, np.maximum(last, 0), axis=-1)
+    return np.where(last >= 0, state, False).astype(float)
+
+
+def _lag(x: np.ndarray, fill: float = 0.0) -> np.ndarray:
+    out = np.full(x.shape, fill)
+    out[..., 1:] = x[..., :-1]
+    return out
+
+
+def simulate(universe: Universe, entry: str, exit: str = None, cost_bps: float = BACKTEST_COST_BPS) -> dict:
+    """
+    Backtest the rules on every ticker of `universe` at once. Positions are
+    decided at a bar's close and earn the next bar's return, less `cost_bps`
+    per position change. Returns per-ticker metric arrays (see `_metrics`).
+    """
+    close = universe.series["close"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = close / _lag(close, np.nan) - 1.0
+    valid = np.isfinite(returns)
+    returns = np.where(valid, returns, 0.0)
+
+    held = _lag(positions(_signal(entry, universe), _signal(exit, universe) if exit else None))
+    turnover = np.abs(held - _lag(held))
+    strategy = held * returns - turnover * cost_bps / 10_000
+    return _metrics(strategy, held, valid, close)
+
+
+def _metrics(strategy: np.ndarray, held: np.ndarray, valid: np.ndarray, close: np.ndarray) -> dict:
+    n_tickers, n_bars = strategy.shape
+    bars = np.maximum(valid.sum(axis=-1), 1)
+
+    equity = np.cumprod(1.0 + strategy, axis=-1)
+    total_return = equity[:, -1] - 1.0 if n_bars else np.zeros(n_tickers)
+    drawdown = equity / np.maximum.accumulate(equity, axis=-1) - 1.0
+
+    mean = np.where(valid, strategy, 0.0).sum(axis=-1) / bars
+    var = np.where(valid, (strategy - mean[:, None]) ** 2, 0.0).sum(axis=-1) / bars
+    std = np.sqrt(var)
+
+    # Trades: runs of held bars. Number them across the flattened array, then sum each run's log return.
+    starts = (held > 0) & (_lag(held) == 0)
+    trade_id = np.cumsum(starts.ravel())
+    in_trade = held.ravel() > 0
+    trade_log = np.bincount(trade_id[in_trade], weights=np.log1p(strategy.ravel()[in_trade]),
+                            minlength=int(trade_id[-1]) + 1 if trade_id.size else 1)[1:]
+    trade_ticker = np.flatnonzero(starts.ravel()) // max(n_bars, 1)
+    trades = np.bincount(trade_ticker, minlength=n_tickers)
+    wins = np.bincount(trade_ticker, weights=trade_log > 0, minlength=n_tickers)
+
+    finite = np.where(np.isfinite(close), close, np.nan)
+    with np.errstate(all="ignore"):
+        first = np.take_along_axis(finite, np.argmax(np.isfinite(finite), axis=-1)[:, None], axis=-1)[:, 0]
+        buy_hold = close[:, -1] / first - 1.0 if n_bars else np.full(n_tickers, np.nan)
+        annual = (1.0 + total_return) ** (BARS_PER_YEAR / bars) - 1.0
+
+        return {
+            "total_return":  total_return,
+            "annual_return": annual,
+            "volatility":    std * np.sqrt(BARS_PER_YEAR),
+            "sharpe":        np.where(std > 0, mean / std * np.sqrt(BARS_PER_YEAR), 0.0),
+            "max_drawdown":  drawdown.min(axis=-1) if n_bars else np.zeros(n_tickers),
+            "trades":        trades,
+            "hit_rate":      np.where(trades > 0, wins / np.maximum(trades, 1), np.nan),
+            "exposure":      held.sum(axis=-1) / bars,
+            "buy_hold_return": buy_hold,
+        }
+
+
+def _number(value):
+    value = float(value)
+    return round(value, 4) if np.isfinite(value) else None
+
+
+def aggregate(metrics: dict) -> dict:
+    """Portfolio view of per-ticker metrics: equal-weight means, pooled trades and hit rate."""
+    trades = metrics["trades"]
+    wins = np.nansum(metrics["hit_rate"] * trades)
+    summary = {
+        name: _number(np.nanmean(values)) if np.isfinite(values).any() else None
+        for name, values in metrics.items() if name not in ("trades", "hit_rate")
+    }
+    summary["worst_drawdown"] = _number(np.min(metrics["max_drawdown"])) if len(trades) else None
+    summary["trades"] = int(trades.sum())
+    summary["hit_rate"] = _number(wins / trades.sum()) if trades.sum() else None
+    return summary
+
+
+def backtest(universe: Universe, entry: str, exit: str = None, cost_bps: float = BACKTEST_COST_BPS) -> dict:
+    """Per-ticker and aggregate results of one rule set. Raises ScreenError for bad rules."""
+    started = time.perf_counter()
+    metrics = simulate(universe, entry, exit, cost_bps)
+    per_ticker = {
+        ticker: {
+            "as_of": from_day(universe.last_day[i]).isoformat(),
+            **{name: (int(values[i]) if name == "trades" else _number(values[i])) for name, values in metrics.items()},
+        }
+        for i, ticker in enumerate(universe.tickers)
+    }
+    return {
+        "entry": entry,
+        "exit": exit,
+        "cost_bps": cost_bps,
+        "seconds": round(time.perf_counter() - started, 4),
+        "aggregate": aggregate(metrics),
+        "tickers": per_ticker,
+    }
+
+
+def expand(grid: dict) -> list:
+    """Every combination of the grid's values, as {name: value} dicts."""
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def _render(template: str, params: dict) -> str:
+    try:
+        return template.format(**params)
+    except (KeyError, IndexError, ValueError) as e:
+        raise ScreenError(f"Cannot fill {template!r} from the grid: {e}") from None
+
+
+class SweepBusy(Exception):
+    """Raised when BACKTEST_MAX_SWEEPS sweeps are already running on the pool."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"All {BACKTEST_MAX_SWEEPS} sweep slots are busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+# Spawned on the first pooled sweep and kept until shutdown_pool()
+_pool = None
+_pool_lock = threading.Lock()
+_running_sweeps = 0
+_avg_sweep_seconds = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(BACKTEST_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool(pool: ProcessPoolExecutor = None):
+    """Stop the sweep pool's processes, if it was started (or only if it is still `pool`)."""
+    global _pool
+    with _pool_lock:
+        if pool is not None and pool is not _pool:
+            return
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def _uses_pool(configs: int, workers: int) -> bool:
+    return min(workers, BACKTEST_WORKERS, configs) > 1 and configs >= SWEEP_MIN_PARALLEL_CONFIGS
+
+
+def _busy() -> SweepBusy:
+    return SweepBusy(max(1, math.ceil(_avg_sweep_seconds or DEFAULT_SWEEP_SECONDS)))
+
+
+def check_capacity(grid: dict, workers: int = BACKTEST_WORKERS):
+    """Raise SweepBusy if a sweep of `grid` would run on the pool and every slot is taken."""
+    if _uses_pool(len(expand(grid)), workers) and _running_sweeps >= BACKTEST_MAX_SWEEPS:
+        raise _busy()
+
+
+def _record_sweep(seconds: float):
+    global _avg_sweep_seconds
+    # Exponential moving average of pooled sweep durations
+    _avg_sweep_seconds = seconds if _avg_sweep_seconds is None else 0.8 * _avg_sweep_seconds + 0.2 * seconds
+
+
+def _sweep_state(sweep_id, tickers, last_day, series, entry, exit, cost_bps) -> dict:
+    return {"sweep_id": sweep_id, "universe": Universe(tickers, last_day, series),
+            "entry": entry, "exit": exit, "cost_bps": cost_bps}
+
+
+def _run_config(state: dict, params: dict) -> dict:
+    entry = _render(state["entry"], params)
+    exit = _render(state["exit"], params) if state["exit"] else None
+    try:
+        metrics = simulate(state["universe"], entry, exit, state["cost_bps"])
+    except ScreenError as e:
+        return {"params": params, "error": str(e)}
+    return {"params": params, **aggregate(metrics)}
+
+
+# The sweep a pool process last set up; its later chunks of that sweep reuse the universe and memoized series
+_worker = {}
+
+
+def _run_chunk(setup: tuple, configs: list) -> list:
+    if _worker.get("sweep_id") != setup[0]:
+        _worker.clear()
+        _worker.update(_sweep_state(*setup))
+    return [_run_config(_worker, params) for params in configs]
+
+
+def _run_pooled(setup: tuple, configs: list, workers: int) -> list:
+    global _running_sweeps
+    with _pool_lock:
+        if _running_sweeps >= BACKTEST_MAX_SWEEPS:
+            raise _busy()
+        _running_sweeps += 1
+    started = time.perf_counter()
+    try:
+        # Each chunk carries the price arrays; a process builds the universe once per sweep
+        size = max(1, math.ceil(len(configs) / (workers * 4)))
+        pool = _get_pool()
+        futures = [pool.submit(_run_chunk, setup, configs[i:i + size]) for i in range(0, len(configs), size)]
+        results = [result for future in futures for result in future.result()]
+    except BrokenProcessPool:
+        # A worker died; the next sweep starts a fresh pool
+        shutdown_pool(pool)
+        raise
+    finally:
+        with _pool_lock:
+            _running_sweeps -= 1
+    _record_sweep(time.perf_counter() - started)
+    return results
+
+
+def sweep(universe: Universe, entry: str, grid: dict, exit: str = None, cost_bps: float = BACKTEST_COST_BPS,
+          rank_by: str = "sharpe", top: int = 20, workers: int = BACKTEST_WORKERS) -> dict:
+    """
+    Backtest every combination of `grid` filled into the `entry` (and `exit`)
+    templates, e.g. entry="rsi({period}) < {level}" with grid={"period": [7, 14],
+    "level": [20, 30]}, over the shared process pool in chunks for `workers`
+    processes. Returns the `top` configurations by the aggregate `rank_by`
+    metric. Raises SweepBusy when BACKTEST_MAX_SWEEPS pooled sweeps are running.
+    """
+    if rank_by not in RANK_METRICS:
+        raise ScreenError(f"Unknown rank_by {rank_by!r}; use one of {', '.join(RANK_METRICS)}")
+    configs = expand(grid)
+    if not configs:
+        raise ScreenError("The grid is empty")
+    if len(configs) > BACKTEST_MAX_CONFIGS:
+        raise ScreenError(f"{len(configs)} configurations exceed BACKTEST_MAX_CONFIGS ({BACKTEST_MAX_CONFIGS})")
+    # Fail fast on a template that does not match the grid
+    _render(entry, configs[0])
+    if exit:
+        _render(exit, configs[0])
+
+    started = time.perf_counter()
+    setup = (uuid.uuid4().hex, universe.tickers, universe.last_day, universe.series, entry, exit, cost_bps)
+    if not _uses_pool(len(configs), workers):
+        workers = 1
+        state = _sweep_state(*setup)
+        results = [_run_config(state, params) for params in configs]
+    else:
+        workers = min(workers, BACKTEST_WORKERS, len(configs))
+        results = _run_pooled(setup, configs, workers)
+
+    errors = [result for result in results if "error" in result]
+    ranked = [result for result in results if "error" not in result and result.get(rank_by) is not None]
+    ranked.sort(key=lambda result: result[rank_by], reverse=not RANK_METRICS[rank_by])
+    return {
+        "entry": entry,
+        "exit": exit,
+        "cost_bps": cost_bps,
+        "rank_by": rank_by,
+        "configs": len(configs),
+        "failed": len(errors),
+        "workers": workers,
+        "seconds": round(time.perf_counter() - started, 3),
+        "results": ranked[:top],
+        "errors": errors[:5],
+    }
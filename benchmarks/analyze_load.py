@@ -0,0 +1,230 @@
+"""
+End-to-end load benchmark for POST /analyze, fully offline.
+
+Starts the API under uvicorn with OFFLINE_PROVIDERS=1 (every provider and the
+chat model served by stubs.py, see its STUB_* settings for latency and error
+injection), then drives it with a closed loop of clients at each concurrency
+level and reports throughput, p50/p95/p99 latency and the server's peak RSS.
+
+    python benchmarks/analyze_load.py
+    python benchmarks/analyze_load.py --concurrency 1,4,16,64 --requests 200 --mode agents
+    STUB_LATENCY_MS=300 STUB_ERROR_RATE=0.05 python benchmarks/analyze_load.py --json results.json
+
+Provider rate limits are lifted unless --keep-rate-limits is given, so the
+numbers reflect the app rather than the free-tier quotas. Every request asks
+for a new ticker, so caches only help with --tickers N (a pool of N tickers).
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Providers whose RATE_LIMIT_<PROVIDER>_PER_MIN is raised for the run (see tools/rate_limit.py)
+RATE_LIMITED_PROVIDERS = ["alpha_vantage", "twelvedata", "finnhub", "fmp", "google_news", "yfinance", "stooq"]
+STARTUP_TIMEOUT_SECONDS = 60
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid: int):
+    """Current resident set size of `pid` in MB, or None if it cannot be read."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        # macOS and other systems without /proc
+        out = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True)
+        return int(out.stdout.strip()) / 1024
+    except (OSError, ValueError):
+        return None
+
+
+class RssSampler:
+    """Polls a process' RSS on a background thread and keeps the peak."""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = rss_mb(self.pid)
+            if rss is not None:
+                self.peak = rss if self.peak is None else max(self.peak, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentile(sorted_values: list, q: float):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def start_server(port: int, store_dir: str, keep_rate_limits: bool) -> subprocess.Popen:
+    env = dict(os.environ, OFFLINE_PROVIDERS="1", OHLCV_STORE_DIR=store_dir)
+    env.setdefault("LOG_LEVEL", "WARNING")
+    if not keep_rate_limits:
+        for provider in RATE_LIMITED_PROVIDERS:
+            env[f"RATE_LIMIT_{provider.upper()}_PER_MIN"] = "1000000"
+
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+
+
+async def wait_until_ready(base_url: str, server: subprocess.Popen):
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with code {server.returncode}")
+            try:
+                if (await client.get("/health")).json().get("status") == "ok":
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server not ready after {STARTUP_TIMEOUT_SECONDS}s")
+
+
+async def run_level(base_url: str, concurrency: int, total: int, mode: str, tickers) -> dict:
+    """Send `total` requests from `concurrency` clients, each sending its next request when the last returns."""
+    latencies, errors, rejected = [], 0, 0
+    remaining = iter(range(total))
+
+    async def client_loop(client):
+        nonlocal errors, rejected
+        for i in remaining:
+            ticker = tickers(i)
+            started = time.perf_counter()
+            try:
+                response = await client.post("/analyze", json={"ticker": ticker, "mode": mode})
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started)
+            elif response.status_code == 429:
+                rejected += 1
+            else:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "ok": len(latencies),
+        "errors": errors,
+        "rejected": rejected,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+    }
+
+
+def print_row(row: dict):
+    def fmt(value, width, spec=""):
+        return f"{'-' if value is None else format(value, spec):>{width}}"
+
+    print(f"{row['concurrency']:>11} {row['ok']:>5}/{row['requests']:<5} {row['errors']:>6} {row['rejected']:>8} "
+          f"{fmt(row['throughput_rps'], 8, '.2f')} {fmt(row['p50_ms'], 9, '.1f')} {fmt(row['p95_ms'], 9, '.1f')} "
+          f"{fmt(row['p99_ms'], 9, '.1f')} {fmt(row['peak_rss_mb'], 12, '.1f')}")
+
+
+async def benchmark(args) -> list:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    counter = iter(range(10**9))
+    if args.tickers:
+        tickers = lambda i: f"T{i % args.tickers:04d}"
+    else:
+        # A fresh ticker per request (across levels too): every provider call misses the cache
+        tickers = lambda i: f"T{next(counter):06d}"
+
+    with tempfile.TemporaryDirectory(prefix="ohlcv-bench-") as store_dir:
+        server = start_server(port, store_dir, args.keep_rate_limits)
+        try:
+            await wait_until_ready(base_url, server)
+            # One untimed request pays for lazy imports and first-use setup
+            await run_level(base_url, 1, 1, args.mode, tickers)
+
+            print(f"POST /analyze, mode={args.mode}, {args.requests} requests per level")
+            print(f"{'concurrency':>11} {'ok/requests':>11} {'errors':>6} {'rejected':>8} {'req/s':>8} "
+                  f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak RSS MB':>12}")
+
+            results = []
+            for concurrency in args.concurrency:
+                with RssSampler(server.pid) as rss:
+                    row = await run_level(base_url, concurrency, args.requests, args.mode, tickers)
+                row["peak_rss_mb"] = round(rss.peak, 1) if rss.peak is not None else None
+                print_row(row)
+                results.append(row)
+            return results
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,2,4,8,16",
+                        type=lambda s: [int(c) for c in s.split(",") if c.strip()],
+                        help="Comma-separated concurrency levels (default: 1,2,4,8,16)")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per level (default: 50)")
+    parser.add_argument("--mode", choices=["direct", "agents"], default="direct",
+                        help="Analysis mode to request (default: direct)")
+    parser.add_argument("--tickers", type=int, default=0,
+                        help="Cycle through this many tickers instead of a new one per request")
+    parser.add_argument("--keep-rate-limits", action="store_true",
+                        help="Keep the providers' configured rate limits")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON to PATH")
+    args = parser.parse_args()
+
+    results = asyncio.run(benchmark(args))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"mode": args.mode, "levels": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Import-time benchmark for the API.
+
+Times `python -c "import api"` in fresh interpreters and fails (exit code 1)
+when the median exceeds the budget, or when a provider SDK that should be
+imported lazily is loaded at import time.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 10 --budget 2.0
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported on first use (see tools/lazy.py)
+LAZY_MODULES = [
+    "yfinance",
+    "pandas_datareader",
+    "twelvedata",
+    "feedparser",
+    "langchain_openai",
+    "openai",
+]
+
+DEFAULT_BUDGET_SECONDS = float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", "3.0"))
+
+
+def time_import(module: str) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=ROOT, check=True)
+    return time.perf_counter() - started
+
+
+def eagerly_loaded(module: str) -> list:
+    """Lazy modules that end up in sys.modules after importing `module`."""
+    code = (
+        f"import sys, json, {module}; "
+        f"print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True,
+                            capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="api", help="Module to import (default: api)")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time (default: 5)")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS,
+                        help="Max median wall time in seconds (default: IMPORT_TIME_BUDGET_SECONDS or 3.0)")
+    args = parser.parse_args()
+
+    # First run warms the OS file cache and the bytecode cache; not counted
+    time_import(args.module)
+    samples = [time_import(args.module) for _ in range(args.runs)]
+    median = statistics.median(samples)
+
+    print(f"import {args.module}: median {median:.3f}s, min {min(samples):.3f}s, "
+          f"max {max(samples):.3f}s over {args.runs} runs (budget {args.budget:.3f}s)")
+
+    failed = False
+    eager = eagerly_loaded(args.module)
+    if eager:
+        print(f"FAIL: imported eagerly, should be lazy: {', '.join(eager)}")
+        failed = True
+    if median > args.budget:
+        print(f"FAIL: median import time {median:.3f}s exceeds budget {args.budget:.3f}s")
+        failed = True
+
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark for screener.py over a synthetic universe.
+
+Fills a temporary OHLCV store with deterministic bars for N tickers (the same
+generator the offline stubs use), stacks it once, then times each screen:
+
+    python benchmarks/screener_speed.py
+    python benchmarks/screener_speed.py --tickers 10000 --repeat 10
+    python benchmarks/screener_speed.py --expr "rsi(14) < 30 and close > sma(50)" --expr oversold
+
+The first run of a screen computes its indicator series; later runs reuse
+them from the universe's memo, so both are reported. Exits non-zero if any
+cold screen takes longer than --budget seconds (default 1.0).
+"""
+import os
+import sys
+import time
+import datetime
+import argparse
+import tempfile
+import statistics
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from screener import PRESETS, load_universe, screen  # noqa: E402
+from stubs import daily_bars  # noqa: E402
+from tools.ohlcv_store import OHLCVStore, to_day  # noqa: E402
+
+DEFAULT_SCREENS = [
+    "rsi(14) < 30 and close > sma(50)",
+    "52w_high_breakout",
+    "cross_above(sma(20), sma(50)) and volume > sma(volume, 20)",
+    "adx(14) > 25 and stoch_k(14) < 20",
+]
+
+
+def fill_store(store: OHLCVStore, tickers: int, days: int):
+    end = datetime.date.today()
+    start = end - datetime.timedelta(days=days)
+    for i in range(tickers):
+        ticker = f"T{i:05d}"
+        bars = daily_bars(ticker, start, end)
+        dates = np.array([to_day(datetime.date.fromisoformat(d)) for d in bars["date"]], dtype=float)
+        block = np.vstack([dates] + [np.asarray(bars[f], dtype=float) for f in ("open", "high", "low", "close", "volume")])
+        store.append("fmp", ticker, block, to_day(start), to_day(end))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=5000, help="Tickers in the universe (default: 5000)")
+    parser.add_argument("--days", type=int, default=400, help="Calendar days of history per ticker (default: 400)")
+    parser.add_argument("--expr", action="append", help=f"Screen to time (repeatable); presets: {', '.join(PRESETS)}")
+    parser.add_argument("--repeat", type=int, default=5, help="Warm runs per screen (default: 5)")
+    parser.add_argument("--budget", type=float, default=1.0, help="Max seconds for a cold screen (default: 1.0)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="screener-bench-") as root:
+        store = OHLCVStore(root)
+        started = time.perf_counter()
+        fill_store(store, args.tickers, args.days)
+        print(f"store: {args.tickers} tickers written in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        universe = load_universe(store, sources=["fmp"])
+        print(f"stack: {len(universe)} x {universe.series['close'].shape[1]} bars in {time.perf_counter() - started:.2f}s")
+
+        over_budget = False
+        print(f"{'cold s':>8} {'warm s':>8} {'matched':>8}  screen")
+        for expr in args.expr or DEFAULT_SCREENS:
+            universe = load_universe(store, sources=["fmp"])
+            started = time.perf_counter()
+            result = screen(expr, universe=universe)
+            cold = time.perf_counter() - started
+
+            warm = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                screen(expr, universe=universe)
+                warm.append(time.perf_counter() - started)
+
+            over_budget |= cold > args.budget
+            print(f"{cold:>8.3f} {statistics.median(warm):>8.4f} {result['matched']:>8}  {expr}")
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+import os
+import json
+import math
+import hashlib
+from datetime import datetime, timezone
+
+from tools.failover import is_usable
+from tools.sentiment import aggregate, article_scores
+
+# Max tokens of section data in the summary prompt (instructions not included)
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "1200"))
+# Rough chars-per-token ratio for English text and JSON with GPT tokenizers
+CHARS_PER_TOKEN = 4
+
+# Richest first; the first level whose digest fits the budget is used
+DETAIL_LEVELS = [
+    {"headlines": 8, "deltas": (1, 5, 20), "metrics": "extended"},
+    {"headlines": 5, "deltas": (1, 5), "metrics": "extended"},
+    {"headlines": 5, "deltas": (5,), "metrics": "core"},
+    {"headlines": 3, "deltas": (), "metrics": "core"},
+]
+
+# Significant digits kept when hashing numbers for the summary cache key,
+# so small price moves reuse the cached summary
+SUMMARY_KEY_DIGITS = int(os.getenv("SUMMARY_CACHE_DIGITS", "3"))
+# Bump when the summary prompt changes so old summaries are not reused
+SUMMARY_KEY_VERSION = 2
+
+# Fundamentals worth putting in front of the LLM, from get_fundamentals_finnhub's financials
+CORE_METRICS = [
+    "peTTM", "pb", "psTTM", "netProfitMarginTTM", "revenueGrowthTTMYoy",
+    "epsGrowthTTMYoy", "roeTTM", "totalDebt/totalEquityQuarterly", "beta",
+]
+EXTENDED_METRICS = CORE_METRICS + [
+    "enterpriseValue", "grossMarginTTM", "operatingMarginTTM", "revenueGrowth5Y",
+    "epsGrowth5Y", "roaTTM", "currentDividendYieldTTM", "payoutRatioTTM",
+    "currentRatioQuarterly", "epsTTM",
+]
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def _round(value, digits: int = 2):
+    value = _number(value)
+    return None if value is None else round(value, digits)
+
+
+def _human(value):
+    """Large counts as short strings: 2.91T, 48.2M."""
+    value = _number(value)
+    if value is None:
+        return None
+    for threshold, suffix in ((1e12, "T"), (1e9, "B"), (1e6, "M"), (1e3, "K")):
+        if abs(value) >= threshold:
+            return f"{value / threshold:.3g}{suffix}"
+    return f"{value:.3g}"
+
+
+def _compact(d: dict) -> dict:
+    return {k: v for k, v in d.items() if v not in (None, "", [], {})}
+
+
+def stock_digest(quote: dict, level: dict) -> dict:
+    price = _number(quote.get("lastPrice")) or _number(quote.get("close"))
+    prev = _number(quote.get("previousClose"))
+    change = price - prev if price is not None and prev else None
+    year_change = _number(quote.get("yearChange"))
+
+    return _compact({
+        "price": _round(price),
+        "change": _round(change),
+        "change_pct": _round(change / prev * 100) if change is not None else None,
+        "open": _round(quote.get("open")),
+        "day_low": _round(quote.get("dayLow")),
+        "day_high": _round(quote.get("dayHigh")),
+        "volume": _human(quote.get("volume")),
+        "market_cap": _human(quote.get("marketCap")),
+        "52w_low": _round(quote.get("yearLow")),
+        "52w_high": _round(quote.get("yearHigh")),
+        "year_change_pct": _round(year_change * 100) if year_change is not None else None,
+    })
+
+
+def _news_time(value) -> str:
+    """ISO timestamp of an article; Finnhub gives epoch seconds, the RSS tool ISO strings."""
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=timezone.utc).replace(tzinfo=None).isoformat()
+    return str(value) if value else ""
+
+
+def news_digest(items: list, level: dict) -> dict:
+    # Newest first, one entry per headline
+    items = sorted(items, key=lambda item: _news_time(item.get("datetime")), reverse=True)
+    # Lexicon scores stand in for the article summaries: numbers, not paragraphs
+    scores = article_scores(items)
+    seen = set()
+    headlines = []
+    for item, score in zip(items, scores):
+        headline = (item.get("headline") or "").strip()
+        if not headline or headline.lower() in seen:
+            continue
+        seen.add(headline.lower())
+
+        entry = {"date": _news_time(item.get("datetime"))[:10], "source": item.get("source"), "headline": headline}
+        if item.get("copies", 1) > 1:
+            # Syndicated story (merged news tool): how widely it was carried
+            entry["copies"] = item["copies"]
+        entry["sentiment"] = _round(score)
+        headlines.append(_compact(entry))
+
+        if len(headlines) == level["headlines"]:
+            break
+
+    sentiment = aggregate(items, scores)
+    return {"articles": sentiment.pop("articles"), "sentiment": _compact(sentiment), "top_headlines": headlines}
+
+
+def indicator_rows(data) -> list:
+    """
+    Indicator rows newest first as {"datetime": ..., name: float}. Accepts Twelve
+    Data / local rows, or Alpha Vantage's {INDICATOR: {date: {field: value}}}.
+    """
+    if isinstance(data, list):
+        return [{k: (v if k == "datetime" else _number(v)) for k, v in row.items()} for row in data]
+
+    by_date = {}
+    for series in (data or {}).values():
+        for date, fields in (series or {}).items():
+            row = by_date.setdefault(date, {"datetime": date})
+            for field, value in fields.items():
+                row[field.lower().replace(" ", "_")] = _number(value)
+    return [by_date[date] for date in sorted(by_date, reverse=True)]
+
+
+def technical_digest(data, level: dict) -> dict:
+    rows = indicator_rows(data)
+    if not rows:
+        return {}
+
+    latest = rows[0]
+    indicators = {}
+    for name, value in latest.items():
+        if name == "datetime" or value is None:
+            continue
+        entry = {"last": _round(value)}
+        for lag in level["deltas"]:
+            if lag < len(rows) and rows[lag].get(name) is not None:
+                entry[f"chg_{lag}"] = _round(value - rows[lag][name])
+        indicators[name] = entry
+
+    return {"as_of": latest.get("datetime"), "bars": len(rows), "indicators": indicators}
+
+
+def company_digest(fundamentals: dict, level: dict) -> dict:
+    profile = fundamentals.get("profile") or {}
+    metrics = {}
+    for group in (fundamentals.get("financials") or {}).values():
+        metrics.update(group or {})
+
+    wanted = EXTENDED_METRICS if level["metrics"] == "extended" else CORE_METRICS
+    # Finnhub reports market cap in millions
+    market_cap = _number(profile.get("marketCapitalization"))
+    return _compact({
+        "name": profile.get("name"),
+        "industry": profile.get("finnhubIndustry"),
+        "exchange": profile.get("exchange"),
+        "country": profile.get("country"),
+        "ipo": profile.get("ipo"),
+        "market_cap": _human(market_cap * 1e6) if market_cap else None,
+        "metrics": _compact({name: _round(metrics.get(name)) for name in wanted}),
+    })
+
+
+# State section -> (digest function, key of the data inside the tool payload, or None for the payload itself)
+SECTION_DIGESTS = {
+    "stock_data":     (stock_digest, None),
+    "news_data":      (news_digest, "data"),
+    "technical_data": (technical_digest, "data"),
+    "company_data":   (company_digest, None),
+}
+
+
+def _digest_at(state: dict, level: dict) -> dict:
+    digest = {}
+    for section, (digest_fn, key) in SECTION_DIGESTS.items():
+        result = state.get(section) or {}
+        payload = result.get("data")
+        if not is_usable(payload):
+            error = result.get("error")
+            digest[section] = {"unavailable": error or "no data returned"}
+            continue
+        digest[section] = digest_fn(payload if key is None else payload.get(key), level)
+    return digest
+
+
+def build_digest(state: dict, budget: int = None) -> dict:
+    """
+    Reduce each state section to a compact, fixed-schema summary (latest values
+    with deltas, top headlines, key fundamentals), using the most detailed level
+    that fits within `budget` tokens (default SUMMARY_TOKEN_BUDGET).
+    """
+    budget = SUMMARY_TOKEN_BUDGET if budget is None else budget
+    for level in DETAIL_LEVELS:
+        digest = _digest_at(state, level)
+        if estimate_tokens(format_digest(digest)) <= budget:
+            return digest
+    return digest
+
+
+def format_section(data: dict) -> str:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def format_digest(digest: dict) -> str:
+    return "\n".join(f"{section.upper()}: {format_section(data)}" for section, data in digest.items())
+
+
+def _normalize(value, digits: int):
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(f"{value:.{digits}g}")
+    if isinstance(value, dict):
+        return {k: _normalize(v, digits) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_normalize(v, digits) for v in value]
+    return value
+
+
+def summary_key(ticker: str, digest: dict, digits: int = None) -> str:
+    """
+    Content hash of the summary inputs: price rounded to `digits` significant
+    digits, the set of headlines, the indicator values as of the latest bar and
+    the fundamentals. Volume, timestamps and error text do not affect the key.
+    """
+    digits = SUMMARY_KEY_DIGITS if digits is None else digits
+
+    def section(name):
+        data = digest.get(name) or {}
+        return None if "unavailable" in data else data
+
+    stock, news, technical, company = (section(name) for name in SECTION_DIGESTS)
+    material = {
+        "version": SUMMARY_KEY_VERSION,
+        "ticker": ticker.strip().upper(),
+        "price": _normalize(stock.get("price"), digits) if stock else None,
+        "headlines": sorted({h["headline"].lower() for h in news["top_headlines"]}) if news else None,
+        "technical": {
+            "as_of": technical.get("as_of"),
+            "last": {name: _normalize(v.get("last"), digits) for name, v in technical.get("indicators", {}).items()},
+        } if technical else None,
+        "company": _normalize(company, digits) if company else None,
+    }
+    encoded = json.dumps(material, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
@@ -0,0 +1,229 @@
+import os
+import math
+import time
+import uuid
+import asyncio
+import logging
+
+from tools.log import current_context, bind_context
+
+logger = logging.getLogger(__name__)
+
+# Analyses that may run at the same time
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Jobs allowed to wait for a worker before new submissions are rejected
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "32"))
+# How long finished jobs (and their results) can be polled
+JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+# Retry-After estimate used before any job has finished
+DEFAULT_JOB_SECONDS = 30.0
+
+
+class JobQueueFull(Exception):
+    """Raised when every worker is busy and the queue is at capacity."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Job:
+    def __init__(self, func, args, key=None):
+        self.id = uuid.uuid4().hex
+        self.func = func
+        self.args = args
+        self.key = key
+        # Correlation id (and log sampling) of the submitting request; the job's logs carry it too
+        self.log_context = current_context()
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = asyncio.Event()
+
+    async def wait(self):
+        """Wait for the job to finish and return its result (or raise its error)."""
+        await self._done.wait()
+        if self.status == "failed":
+            raise RuntimeError(self.error)
+        return self.result
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class Lease:
+    """
+    A worker slot held for work the caller runs itself, such as a streamed
+    response: wait for `acquired()` before starting and `release()` when done
+    (releasing while still queued frees the slot as soon as it is reached).
+    """
+
+    def __init__(self):
+        self._running = asyncio.Event()
+        self._released = asyncio.Event()
+
+    async def _hold(self):
+        self._running.set()
+        await self._released.wait()
+
+    async def acquired(self):
+        await self._running.wait()
+
+    def release(self):
+        self._released.set()
+
+
+class JobManager:
+    """
+    Fixed pool of async workers fed by a bounded queue. At most `workers` jobs
+    run at once and at most `max_queue` wait; beyond that `submit` raises
+    JobQueueFull so callers can shed load instead of piling up work. Jobs
+    submitted with the same key while one is pending share that job.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queue: int = JOB_QUEUE_SIZE,
+                 result_ttl: float = JOB_RESULT_TTL_SECONDS):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self._jobs = {}
+        self._active = {}
+        self._queue = None
+        self._tasks = []
+        self._running = 0
+        self._avg_seconds = None
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, func, *args, key=None) -> Job:
+        """Queue `func(*args)` (a coroutine function) and return its Job."""
+        if key is not None and key in self._active:
+            job = self._active[key]
+            logger.info("Attached to job %s", job.id, extra={"job_id": job.id, "job_request_id": job.log_context[0]})
+            return job
+
+        self._prune()
+        job = Job(func, args, key)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            logger.warning("Job queue full, rejecting job", extra={"queued": self._queue.qsize()})
+            raise JobQueueFull(self.retry_after())
+        self._jobs[job.id] = job
+        if key is not None:
+            self._active[key] = job
+        return job
+
+    async def submit_when_ready(self, func, *args, key=None) -> Job:
+        """Like `submit`, but waits for room in the queue instead of raising JobQueueFull."""
+        if key is not None and key in self._active:
+            return self.submit(func, *args, key=key)
+
+        self._prune()
+        job = Job(func, args, key)
+        # Registered first, so identical submissions attach while this one waits
+        self._jobs[job.id] = job
+        if key is not None:
+            self._active[key] = job
+        try:
+            await self._queue.put(job)
+        except asyncio.CancelledError:
+            self._jobs.pop(job.id, None)
+            if self._active.get(key) is job:
+                del self._active[key]
+            job.status = "failed"
+            job.error = "Cancelled"
+            job._done.set()
+            raise
+        return job
+
+    def lease(self) -> Lease:
+        """Queue a Lease on the pool, so caller-run work counts against its cap. Raises JobQueueFull."""
+        lease = Lease()
+        self.submit(lease._hold)
+        return lease
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def __len__(self):
+        """Number of distinct keyed jobs queued or running."""
+        return len(self._active)
+
+    def full(self) -> bool:
+        """True when a new submission would be rejected."""
+        return self._queue is not None and self._queue.full()
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up, from the average job time."""
+        avg = self._avg_seconds or DEFAULT_JOB_SECONDS
+        waves = (self._queue.qsize() + 1) / max(1, self.workers)
+        return max(1, math.ceil(avg * waves))
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "tracked": len(self._jobs),
+        }
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            bind_context(job.log_context)
+            self._running += 1
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = await job.func(*job.args)
+                job.status = "succeeded"
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "Cancelled"
+                raise
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                logger.exception("Job %s failed", job.id, extra={"job_id": job.id})
+            finally:
+                job.finished_at = time.time()
+                job._done.set()
+                self._active.pop(job.key, None)
+                self._running -= 1
+                self._queue.task_done()
+                self._record(job.finished_at - job.started_at)
+
+    def _record(self, seconds: float):
+        # Exponential moving average of job durations
+        self._avg_seconds = seconds if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * seconds
+
+    def _prune(self):
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+job_manager = JobManager()
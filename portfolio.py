@@ -0,0 +1,163 @@
+import os
+import time
+import asyncio
+import logging
+
+from digest import DETAIL_LEVELS, stock_digest
+from tools.company_news_tool import get_company_news
+from tools.log import current_context, bind_context
+from tools.sentiment import aggregate
+from tools.stock_data_tool import get_stock_quotes
+
+logger = logging.getLogger(__name__)
+
+# Tickers of one portfolio analysed at the same time, unless the request asks for fewer
+PORTFOLIO_CONCURRENCY = int(os.getenv("PORTFOLIO_CONCURRENCY", "4"))
+# Upper bound on the concurrency a request may ask for
+PORTFOLIO_MAX_CONCURRENCY = int(os.getenv("PORTFOLIO_MAX_CONCURRENCY", "16"))
+PORTFOLIO_MAX_TICKERS = int(os.getenv("PORTFOLIO_MAX_TICKERS", "500"))
+# Tickers ahead of the workers whose quotes are fetched in one batch request. Kept
+# small enough that the batch is used before the 15s quote TTL runs out.
+QUOTE_PREFETCH_WINDOW = int(os.getenv("PORTFOLIO_QUOTE_PREFETCH", "25"))
+# Movers listed in each direction in the portfolio summary
+TOP_MOVERS = 5
+# Tickers whose news /sentiment fetches at the same time
+SENTIMENT_CONCURRENCY = int(os.getenv("SENTIMENT_CONCURRENCY", "16"))
+
+
+def normalize_tickers(tickers: list) -> list:
+    """Upper-cased tickers in request order, without blanks and duplicates."""
+    return list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+
+
+class QuotePrefetcher:
+    """
+    Fetches quotes for the next `window` tickers in one batch (see
+    `get_stock_quotes`) whenever a worker reaches a ticker not yet covered, so
+    the per-ticker quote calls in the graph hit the primed cache.
+    """
+
+    def __init__(self, tickers: list, window: int = QUOTE_PREFETCH_WINDOW):
+        self.tickers = tickers
+        self.window = window
+        self._covered = 0
+        self._lock = asyncio.Lock()
+
+    async def ensure(self, index: int):
+        if self.window <= 0:
+            return
+        async with self._lock:
+            if index < self._covered:
+                return
+            batch = self.tickers[index:index + self.window]
+            self._covered = index + len(batch)
+            try:
+                await get_stock_quotes(batch)
+            except Exception as e:
+                # The graph fetches the quotes itself
+                logger.warning("Portfolio quote prefetch failed: %s", e)
+
+
+async def run_portfolio(tickers: list, analyze, concurrency: int = PORTFOLIO_CONCURRENCY):
+    """
+    Run `analyze(ticker)` for every ticker with at most `concurrency` running at
+    once, yielding (ticker, result, error) in completion order. Stopping the
+    iteration cancels the analyses still running.
+    """
+    prefetcher = QuotePrefetcher(tickers)
+    pending = iter(enumerate(tickers))
+    finished = asyncio.Queue()
+    log_context = current_context()
+
+    async def worker():
+        bind_context(log_context)
+        for index, ticker in pending:
+            await prefetcher.ensure(index)
+            try:
+                result, error = await analyze(ticker), None
+            except Exception as e:
+                logger.warning("Portfolio analysis failed", extra={"ticker": ticker, "error": str(e)})
+                result, error = None, str(e) or type(e).__name__
+            await finished.put((ticker, result, error))
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(max(1, min(concurrency, len(tickers))))]
+    try:
+        for _ in tickers:
+            yield await finished.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def news_sentiment(tickers: list, days: int = 7, concurrency: int = SENTIMENT_CONCURRENCY) -> tuple:
+    """
+    News sentiment per ticker from the merged news tool's lexicon scores, with
+    no LLM calls: ({ticker: aggregate}, {ticker: error}).
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(ticker):
+        async with semaphore:
+            return await get_company_news.ainvoke({"ticker": ticker, "days": days})
+
+    results = await asyncio.gather(*(fetch(ticker) for ticker in tickers), return_exceptions=True)
+    sentiment, errors = {}, {}
+    for ticker, result in zip(tickers, results):
+        if isinstance(result, Exception) or "error" in result:
+            errors[ticker] = str(result) if isinstance(result, Exception) else result["error"]
+        else:
+            sentiment[ticker] = result["sentiment"]
+    return sentiment, errors
+
+
+def _mover(ticker: str, move: dict) -> dict:
+    return {"ticker": ticker, "price": move.get("price"), "change_pct": move.get("change_pct")}
+
+
+def portfolio_summary(results: dict, errors: dict, started: float) -> dict:
+    """
+    Aggregate of the per-ticker results ({ticker: AnalysisResponse}): breadth,
+    average day change, top movers, RSI extremes, news sentiment and the
+    providers used.
+    """
+    level = DETAIL_LEVELS[-1]
+    moves = {ticker: stock_digest(result.stock_data, level) for ticker, result in results.items()}
+    changes = {ticker: move["change_pct"] for ticker, move in moves.items() if move.get("change_pct") is not None}
+    ranked = sorted(changes, key=changes.get, reverse=True)
+
+    sentiment = {ticker: aggregate(result.news_data)["score"] for ticker, result in results.items()}
+    sentiment = {ticker: score for ticker, score in sentiment.items() if score is not None}
+    by_sentiment = sorted(sentiment, key=sentiment.get, reverse=True)
+
+    overbought, oversold = [], []
+    providers = {}
+    for ticker, result in results.items():
+        rsi = result.technical_data[0].get("rsi") if result.technical_data else None
+        if rsi is not None and rsi >= 70:
+            overbought.append(ticker)
+        elif rsi is not None and rsi <= 30:
+            oversold.append(ticker)
+        for section, provider in result.providers.items():
+            counts = providers.setdefault(section, {})
+            counts[provider] = counts.get(provider, 0) + 1
+
+    return {
+        "tickers": len(results) + len(errors),
+        "succeeded": len(results),
+        "failed": len(errors),
+        "errors": errors,
+        "seconds": round(time.monotonic() - started, 3),
+        "advancers": sum(1 for change in changes.values() if change > 0),
+        "decliners": sum(1 for change in changes.values() if change < 0),
+        "unchanged": sum(1 for change in changes.values() if change == 0),
+        "avg_change_pct": round(sum(changes.values()) / len(changes), 2) if changes else None,
+        "top_gainers": [_mover(t, moves[t]) for t in ranked[:TOP_MOVERS] if changes[t] > 0],
+        "top_losers": [_mover(t, moves[t]) for t in ranked[::-1][:TOP_MOVERS] if changes[t] < 0],
+        "rsi_overbought": overbought,
+        "rsi_oversold": oversold,
+        "avg_sentiment": round(sum(sentiment.values()) / len(sentiment), 3) if sentiment else None,
+        "most_positive_news": [{"ticker": t, "sentiment": sentiment[t]} for t in by_sentiment[:TOP_MOVERS] if sentiment[t] > 0],
+        "most_negative_news": [{"ticker": t, "sentiment": sentiment[t]} for t in by_sentiment[::-1][:TOP_MOVERS] if sentiment[t] < 0],
+        "providers": providers,
+    }
@@ -0,0 +1,120 @@
+import os
+import time
+import asyncio
+import logging
+
+import numpy as np
+
+from workflow import (
+    create_financial_analysis_graph, iter_sections, load_agents, orchestrator_llm, ANALYSIS_MODES,
+)
+from tools.http_client import get_http_client, close_http_client
+from tools.indicators import compute_indicators
+from tools.log import request_id
+from tools.rate_limit import request_priority, PRIORITY_BACKGROUND
+from tools.technical_indicator_tool import get_td_client
+
+logger = logging.getLogger(__name__)
+
+# Provider hosts to open pooled connections to at boot (TLS handshake done before the first request)
+WARMUP_URLS = [
+    "https://financialmodelingprep.com",
+    "https://finnhub.io",
+    "https://www.alphavantage.co",
+    "https://news.google.com",
+]
+# Comma-separated tickers whose data is fetched at boot to prime the caches and OHLCV store
+WARMUP_TICKERS = [t.strip().upper() for t in os.getenv("WARMUP_TICKERS", "").split(",") if t.strip()]
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "20"))
+
+
+class ResourceRegistry:
+    """
+    Long-lived resources built once at startup and shared by every request:
+    the compiled graph per analysis mode, the shared LLM client and the pooled
+    provider clients.
+    """
+
+    def __init__(self):
+        self.graphs = {}
+        self.ready = False
+        self.warmup_seconds = None
+
+    async def start(self):
+        for mode in ANALYSIS_MODES:
+            self.graphs[mode] = create_financial_analysis_graph(mode)
+        get_http_client()
+
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self.warm_up(), WARMUP_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning("Warm-up: timed out after %.0fs", WARMUP_TIMEOUT_SECONDS)
+        self.warmup_seconds = round(time.monotonic() - started, 3)
+        self.ready = True
+        logger.info("Warm-up: finished in %.2fs", self.warmup_seconds)
+
+    async def close(self):
+        # Release pooled provider connections on shutdown
+        await close_http_client()
+
+    def graph(self, mode: str):
+        """Return the compiled graph for `mode`, compiling it on first use outside the app."""
+        if mode not in self.graphs:
+            self.graphs[mode] = create_financial_analysis_graph(mode)
+        return self.graphs[mode]
+
+    async def warm_up(self):
+        """
+        Pay the one-off costs before the first request: import the agents,
+        open provider and LLM connections, run the indicator kernels once and
+        optionally prefetch WARMUP_TICKERS. Failures are logged and ignored.
+        """
+        logger.info("Warm-up: opening connections and priming caches")
+
+        # Agent modules are imported lazily (they pull in the LLM SDK)
+        await asyncio.to_thread(load_agents)
+
+        # Exercise the NumPy indicator code paths on synthetic prices
+        close = np.linspace(100.0, 120.0, 200)
+        compute_indicators(close, close + 1, close - 1, close)
+
+        await asyncio.gather(
+            *(self._open_connection(url) for url in WARMUP_URLS),
+            self._open_llm_connection(),
+            self._build_td_client(),
+            *(self._prefetch(ticker) for ticker in WARMUP_TICKERS),
+        )
+
+    async def _open_connection(self, url: str):
+        try:
+            await get_http_client().head(url)
+        except Exception as e:
+            logger.warning("Warm-up: could not reach %s: %s", url, e)
+
+    async def _build_td_client(self):
+        try:
+            await asyncio.to_thread(get_td_client)
+        except Exception as e:
+            logger.warning("Warm-up: Twelve Data client unavailable: %s", e)
+
+    async def _open_llm_connection(self):
+        # Cheap authenticated call that leaves a pooled connection in the LLM client
+        client = getattr(orchestrator_llm.load(), "root_async_client", None)
+        if client is None:
+            return
+        try:
+            await client.models.list()
+        except Exception as e:
+            logger.warning("Warm-up: LLM endpoint unavailable: %s", e)
+
+    async def _prefetch(self, ticker: str):
+        # Prefetching must not delay interactive traffic arriving during boot
+        request_priority.set(PRIORITY_BACKGROUND)
+        request_id.set(f"warmup-{ticker}")
+        async for section, result in iter_sections(ticker, "direct"):
+            if isinstance(result, dict) and "error" in result:
+                logger.warning("Warm-up: %s for %s failed: %s", section, ticker, result["error"])
+
+
+registry = ResourceRegistry()
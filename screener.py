@@ -0,0 +1,389 @@
+import os
+import ast
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from tools import indicators
+from tools.ohlcv_store import ohlcv_store, from_day
+
+logger = logging.getLogger(__name__)
+
+# Store sources stacked into the universe, in order of preference when a ticker is in several
+SCREENER_SOURCES = [s.strip() for s in os.getenv("SCREENER_SOURCES", "fmp,stooq").split(",") if s.strip()]
+# Trailing bars kept per ticker; 52-week conditions need at least 253
+SCREENER_BARS = int(os.getenv("SCREENER_BARS", "260"))
+# How long the stacked universe is reused before the store is read again
+SCREENER_UNIVERSE_TTL_SECONDS = float(os.getenv("SCREENER_UNIVERSE_TTL_SECONDS", "300"))
+# Indicator series kept per universe, so repeated screens skip recomputing them
+SERIES_MEMO_SIZE = 64
+# Recent screens whose series a rebuilt universe computes before it replaces the old one
+WARM_SCREENS = 8
+
+# Ranking used when a screen does not give one: most liquid (dollar volume) first
+DEFAULT_RANK = "close * volume"
+
+# Named screens, usable in place of an expression
+PRESETS = {
+    "52w_high_breakout": "close > prev(highest(high, 252))",
+    "52w_low_breakdown": "close < prev(lowest(low, 252))",
+    "oversold":          "rsi(14) < 30",
+    "overbought":        "rsi(14) > 70",
+    "oversold_uptrend":  "rsi(14) < 30 and close > sma(50)",
+    "golden_cross":      "cross_above(sma(50), sma(200))",
+    "death_cross":       "cross_below(sma(50), sma(200))",
+    "volume_spike":      "volume > 2 * prev(sma(volume, 20))",
+}
+
+SERIES = ("open", "high", "low", "close", "volume")
+
+
+class ScreenError(ValueError):
+    """Raised for screen expressions that cannot be parsed or evaluated."""
+
+
+class Universe:
+    """
+    OHLCV of every stored ticker stacked into (tickers, bars) arrays. Each row
+    is right-aligned on that ticker's latest stored bar (`last_day`), so
+    tickers refreshed on different days still screen on their latest data;
+    rows with fewer bars are NaN-padded at the front.
+    """
+
+    def __init__(self, tickers: list, last_day: np.ndarray, series: dict):
+        self.tickers = tickers
+        self.last_day = last_day
+        self.series = series
+        self.loaded_at = time.monotonic()
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def memoized(self, key: str, compute):
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+        value = compute()
+        with self._lock:
+            self._memo[key] = value
+            while len(self._memo) > SERIES_MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return value
+
+
+def stack(blocks: dict, bars: int) -> Universe:
+    """Stack {ticker: (6, n) store array} into a Universe of the trailing `bars` bars; tickers without bars are left out."""
+    tickers = sorted(ticker for ticker, data in blocks.items() if data is not None and data.shape[1])
+    stacked = np.full((len(SERIES), len(tickers), bars), np.nan)
+    last_day = np.empty(len(tickers), dtype=np.int64)
+    for i, ticker in enumerate(tickers):
+        tail = np.asarray(blocks[ticker][:, -bars:])
+        stacked[:, i, bars - tail.shape[1]:] = tail[1:]
+        last_day[i] = int(tail[0, -1])
+
+    return Universe(tickers, last_day, dict(zip(SERIES, stacked)))
+
+
+def load_universe(store=ohlcv_store, sources: list = None, bars: int = SCREENER_BARS) -> Universe:
+    """Stack the trailing `bars` bars of every ticker in the store."""
+    chosen = {}
+    for source in sources or SCREENER_SOURCES:
+        for ticker in store.tickers(source):
+            chosen.setdefault(ticker, source)
+    return stack({ticker: store.read(source, ticker) for ticker, source in chosen.items()}, bars)
+
+
+_universe = None
+_universe_lock = threading.Lock()
+_rebuilding = False
+# Recent (expression, rank) screens, re-run on a rebuilt universe before it is swapped in
+_recent_screens = OrderedDict()
+
+
+def _remember_screen(expression: str, rank: str):
+    with _universe_lock:
+        _recent_screens[(expression, rank)] = None
+        _recent_screens.move_to_end((expression, rank))
+        while len(_recent_screens) > WARM_SCREENS:
+            _recent_screens.popitem(last=False)
+
+
+def _rebuild():
+    global _universe, _rebuilding
+    try:
+        universe = load_universe()
+        with _universe_lock:
+            recent = list(_recent_screens)
+        # Fill the new memo first, so the swap does not make the next screen recompute its series
+        for expression, rank in recent:
+            try:
+                evaluate(expression, universe)
+                evaluate(rank or DEFAULT_RANK, universe)
+            except ScreenError:
+                pass
+        with _universe_lock:
+            _universe = universe
+    except Exception:
+        logger.exception("Screener universe rebuild failed")
+    finally:
+        with _universe_lock:
+            _rebuilding = False
+
+
+def get_universe(refresh: bool = False) -> Universe:
+    """
+    The stacked universe. Once it is older than SCREENER_UNIVERSE_TTL_SECONDS it
+    is rebuilt on a background thread and swapped in, and the current one is
+    served meanwhile; only the first load (or `refresh`) waits for the store.
+    """
+    global _universe, _rebuilding
+    with _universe_lock:
+        if refresh or _universe is None:
+            _universe = load_universe()
+        elif time.monotonic() - _universe.loaded_at > SCREENER_UNIVERSE_TTL_SECONDS and not _rebuilding:
+            _rebuilding = True
+            threading.Thread(target=_rebuild, name="screener-rebuild", daemon=True).start()
+        return _universe
+
+
+def _shift(x, periods: int = 1):
+    """`x` as of `periods` bars earlier; constants are returned as they are."""
+    if np.ndim(x) == 0:
+        return x
+    periods = int(periods)
+    if periods < 1:
+        raise ScreenError("prev() and change() need a positive number of bars")
+    out = np.full(np.shape(x), np.nan)
+    out[..., periods:] = x[..., :-periods]
+    return out
+
+
+def _change(x, periods: int = 1):
+    prev = _shift(x, periods)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100.0 * (x / prev - 1.0)
+
+
+def _cross_above(a, b):
+    return (a > b) & (_shift(a) <= _shift(b))
+
+
+def _cross_below(a, b):
+    return (a < b) & (_shift(a) >= _shift(b))
+
+
+# name -> (function, OHLCV series passed before the arguments, defaults of the remaining arguments).
+# A leading "x" means the first argument is a series and may be left out (it defaults to close).
+FUNCTIONS = {
+    "sma":         (indicators.sma, ["x"], [None]),
+    "ema":         (indicators.ema, ["x"], [14]),
+    "rsi":         (indicators.rsi, ["x"], [14]),
+    "std":         (indicators.rolling_std, ["x"], [20]),
+    "highest":     (indicators.rolling_max, ["x"], [None]),
+    "lowest":      (indicators.rolling_min, ["x"], [None]),
+    "prev":        (_shift, ["x"], [1]),
+    "change":      (_change, ["x"], [1]),
+    "cci":         (indicators.cci, ["high", "low", "close"], [20]),
+    "adx":         (indicators.adx, ["high", "low", "close"], [14]),
+    "stoch_k":     (lambda h, l, c, n: indicators.stoch(h, l, c, n)[0], ["high", "low", "close"], [14]),
+    "stoch_d":     (lambda h, l, c, n: indicators.stoch(h, l, c, n)[1], ["high", "low", "close"], [14]),
+    "bb_upper":    (lambda c, n, k: indicators.bbands(c, n, k)[0], ["close"], [20, 2.0]),
+    "bb_lower":    (lambda c, n, k: indicators.bbands(c, n, k)[2], ["close"], [20, 2.0]),
+    "aroon_up":    (lambda h, l, n: indicators.aroon(h, l, n)[1], ["high", "low"], [14]),
+    "aroon_down":  (lambda h, l, n: indicators.aroon(h, l, n)[0], ["high", "low"], [14]),
+    "cross_above": (_cross_above, [], [None, None]),
+    "cross_below": (_cross_below, [], [None, None]),
+    "abs":         (np.abs, [], [None]),
+}
+
+# Functions whose first argument after the series is a window length in bars, and its minimum
+WINDOWS = {name: 1 for name in FUNCTIONS if name not in ("cross_above", "cross_below", "abs")}
+WINDOWS["adx"] = 2
+
+_COMPARE = {
+    ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater,
+    ast.GtE: np.greater_equal, ast.Eq: np.equal, ast.NotEq: np.not_equal,
+}
+_ARITHMETIC = {
+    ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide, ast.Pow: np.power,
+}
+
+
+class _Evaluator:
+    """Evaluates a parsed expression over the whole universe, one (tickers, bars) array per node."""
+
+    def __init__(self, universe: Universe):
+        self.universe = universe
+
+    def eval(self, node):
+        method = getattr(self, f"_{type(node).__name__}", None)
+        if method is None:
+            raise ScreenError(f"Unsupported syntax: {ast.unparse(node)!r}")
+        return method(node)
+
+    def _Expression(self, node):
+        return self.eval(node.body)
+
+    def _Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ScreenError(f"Unsupported constant: {node.value!r}")
+        return node.value
+
+    def _Name(self, node):
+        name = node.id.lower()
+        if name not in self.universe.series:
+            raise ScreenError(f"Unknown series {node.id!r}; use one of {', '.join(SERIES)}")
+        return self.universe.series[name]
+
+    def _BoolOp(self, node):
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        result = self._condition(node.values[0])
+        for value in node.values[1:]:
+            result = combine(result, self._condition(value))
+        return result
+
+    def _UnaryOp(self, node):
+        if isinstance(node.op, ast.Not):
+            return np.logical_not(self._condition(node.operand))
+        if isinstance(node.op, ast.USub):
+            return np.negative(self.eval(node.operand))
+        if isinstance(node.op, ast.UAdd):
+            return self.eval(node.operand)
+        raise ScreenError(f"Unsupported operator in {ast.unparse(node)!r}")
+
+    def _BinOp(self, node):
+        op = _ARITHMETIC.get(type(node.op))
+        if op is None:
+            raise ScreenError(f"Unsupported operator in {ast.unparse(node)!r}")
+        return op(self.eval(node.left), self.eval(node.right))
+
+    def _Compare(self, node):
+        # Chained comparisons: 30 < rsi(14) < 70
+        result, left = None, self.eval(node.left)
+        for op, comparator in zip(node.ops, node.comparators):
+            compare = _COMPARE.get(type(op))
+            if compare is None:
+                raise ScreenError(f"Unsupported comparison in {ast.unparse(node)!r}")
+            right = self.eval(comparator)
+            step = compare(left, right)
+            result = step if result is None else np.logical_and(result, step)
+            left = right
+        return result
+
+    def _Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.keywords:
+            raise ScreenError(f"Unsupported call: {ast.unparse(node)!r}")
+        name = node.func.id.lower()
+        if name not in FUNCTIONS:
+            raise ScreenError(f"Unknown function {node.func.id!r}; use one of {', '.join(FUNCTIONS)}")
+        func, inputs, defaults = FUNCTIONS[name]
+
+        args = [self.eval(arg) for arg in node.args]
+        series = [self.universe.series[field] for field in inputs if field != "x"]
+        if inputs == ["x"]:
+            # The series argument is optional: sma(50) is sma(close, 50)
+            if not args or np.isscalar(args[0]):
+                args.insert(0, self.universe.series["close"])
+            series, args = [args[0]], args[1:]
+
+        if len(args) > len(defaults):
+            raise ScreenError(f"{name}() takes at most {len(defaults)} argument(s) after the series")
+        args += defaults[len(args):]
+        if any(arg is None for arg in args):
+            raise ScreenError(f"Missing argument in {ast.unparse(node)!r}")
+        if name in WINDOWS:
+            window = args[0]
+            if not np.isscalar(window) or not float(window).is_integer() or window < WINDOWS[name]:
+                raise ScreenError(f"{name}() needs a whole number of bars >= {WINDOWS[name]} as its window, "
+                                  f"got {ast.unparse(node)!r}")
+        # Window lengths are used as slice bounds
+        args = [int(arg) if np.isscalar(arg) and float(arg).is_integer() else arg for arg in args]
+
+        def compute():
+            try:
+                return func(*series, *args)
+            except (TypeError, ValueError, IndexError, ArithmeticError) as e:
+                raise ScreenError(f"Cannot evaluate {ast.unparse(node)!r}: {e}") from None
+
+        # Same call, same universe: reuse the series (e.g. sma(50) in the condition and the ranking)
+        return self.universe.memoized(ast.dump(node).lower(), compute)
+
+    def _condition(self, node):
+        value = self.eval(node)
+        if not (isinstance(value, np.ndarray) and value.dtype == bool):
+            raise ScreenError(f"Expected a condition, got {ast.unparse(node)!r}")
+        return value
+
+
+def _parse(expression: str) -> ast.Expression:
+    expression = PRESETS.get(expression.strip(), expression)
+    try:
+        return ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ScreenError(f"Invalid expression: {e.msg}") from None
+
+
+def evaluate_series(expression: str, universe: Universe) -> np.ndarray:
+    """Value of `expression` for every ticker and bar, shape (tickers, bars)."""
+    with np.errstate(all="ignore"):
+        value = _Evaluator(universe).eval(_parse(expression))
+    return np.broadcast_to(value, universe.series["close"].shape)
+
+
+def evaluate(expression: str, universe: Universe) -> np.ndarray:
+    """Value of `expression` for every ticker at its latest bar, shape (tickers,)."""
+    return evaluate_series(expression, universe)[:, -1]
+
+
+def screen(expression: str, rank: str = None, ascending: bool = False, limit: int = 50,
+           universe: Universe = None) -> dict:
+    """
+    Tickers whose latest bar satisfies `expression` (or a PRESETS name), e.g.
+    "rsi(14) < 30 and close > sma(50)", ordered by `rank` (DEFAULT_RANK when
+    omitted), highest first unless `ascending`. Raises ScreenError for bad
+    expressions.
+    """
+    started = time.perf_counter()
+    shared = universe is None
+    if shared:
+        universe = get_universe()
+    if not len(universe):
+        matches = np.empty(0, dtype=int)
+        ranks = np.empty(0)
+    else:
+        mask = evaluate(expression, universe)
+        if mask.dtype != bool:
+            raise ScreenError("The screen expression must be a condition, e.g. rsi(14) < 30")
+        matches = np.flatnonzero(mask)
+        ranks = evaluate(rank or DEFAULT_RANK, universe)[matches].astype(float)
+
+    # NaN ranks go last either way
+    keys = np.where(np.isnan(ranks), np.inf, ranks if ascending else -ranks)
+    order = matches[np.argsort(keys, kind="stable")][:limit]
+    rank_by_ticker = dict(zip(matches.tolist(), ranks.tolist()))
+    close = universe.series["close"][:, -1] if len(universe) else np.empty(0)
+    if shared:
+        _remember_screen(expression, rank)
+
+    return {
+        "expression": PRESETS.get(expression.strip(), expression),
+        "rank": rank or DEFAULT_RANK,
+        "universe": len(universe),
+        "matched": int(matches.size),
+        "seconds": round(time.perf_counter() - started, 4),
+        "results": [
+            {
+                "ticker": universe.tickers[i],
+                "as_of": from_day(universe.last_day[i]).isoformat(),
+                "close": None if np.isnan(close[i]) else round(float(close[i]), 4),
+                "rank": None if np.isnan(rank_by_ticker[i]) else round(rank_by_ticker[i], 4),
+            }
+            for i in order.tolist()
+        ],
+    }
@@ -1,5 +1,6 @@
 import streamlit as st
 import requests
+import json
 from datetime import datetime
 import pandas as pd
 
@@ -429,37 +430,7 @@ st.sidebar.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-ticker = st.sidebar.text_input("Enter ticker symbol", "AAPL", help="Type any stock symbol (e.g., AAPL, GOOGL, TSLA)").upper()
-api_url = st.sidebar.text_input("API URL", "http://localhost:8000/analyze", help="Your backend API endpoint")
-
-# Initialize session_state
-if "data" not in st.session_state:
-    st.session_state.data = None
-if "error" not in st.session_state:
-    st.session_state.error = None
-
-# Enhanced fetch button with loading state
-if st.sidebar.button("🚀 Run Analysis", help="Fetch and analyze the stock data"):
-    with st.sidebar:
-        with st.spinner("Fetching data..."):
-            st.session_state.error = None
-            try:
-                r = requests.post(api_url, json={"ticker": ticker})
-                r.raise_for_status()
-                st.session_state.data = r.json()
-                st.success("✅ Data loaded successfully!")
-            except Exception as e:
-                st.session_state.error = str(e)
-                st.session_state.data = None
-
-# Show any fetch error with enhanced styling
-if st.session_state.error:
-    st.sidebar.error(f"❌ API error: {st.session_state.error}")
-
-# Main content area
-if st.session_state.data:
-    data = st.session_state.data
-    
+def render_header():
     # Modern header with gradient background
     st.markdown("""
     <div style="text-align: center; padding: 2rem 0 1rem 0;">
@@ -472,8 +443,13 @@ if st.session_state.data:
     </div>
     """, unsafe_allow_html=True)
 
+
+def render_company(company_data):
     # Enhanced Company Profile Card
-    profile = data["company_data"]["profile"]
+    profile = company_data.get("profile")
+    if not profile:
+        st.warning("⚠️ Company profile unavailable.")
+        return
     
     st.markdown('<div class="company-card">', unsafe_allow_html=True)
     
@@ -530,8 +506,12 @@ if st.session_state.data:
     
     st.markdown('</div>', unsafe_allow_html=True)
 
+
+def render_stock(sd):
     # Price data with enhanced metrics display
-    sd = data["stock_data"]
+    if not sd:
+        st.warning("⚠️ Market data unavailable.")
+        return
     
     st.markdown('<div class="section-header">💹 Live Market Data</div>', unsafe_allow_html=True)
 
@@ -570,8 +550,14 @@ if st.session_state.data:
     with r2[6]:
         st.metric("⏳ Year Change", f"{sd['yearChange']:.2%}")
 
+
+def render_technical(technical_data):
     # Technical indicators with enhanced chart
-    td = pd.DataFrame(data["technical_data"])
+    if not technical_data:
+        st.warning("⚠️ Technical indicators unavailable.")
+        return
+
+    td = pd.DataFrame(technical_data)
     td["datetime"] = pd.to_datetime(td["datetime"])
     td.set_index("datetime", inplace=True)
 
@@ -607,11 +593,16 @@ if st.session_state.data:
                 height=400,
             )
 
+
+def render_news(news_data):
     # News section with modern cards
     st.markdown('<div class="section-header">📰 Latest Market News</div>', unsafe_allow_html=True)
     
-    for i, itm in enumerate(data["news_data"][:5]):
+    for i, itm in enumerate(news_data[:5]):
         dt = datetime.fromtimestamp(itm["datetime"]).strftime("%Y-%m-%d %H:%M")
+        outlets = ", ".join(itm.get("sources") or [itm["source"]])
+        copies = f" ({itm['copies']} copies)" if itm.get("copies", 1) > 1 else ""
+        tone = f" • 💬 {itm['sentiment']:+.2f}" if itm.get("sentiment") is not None else ""
         
         st.markdown(f"""
         <div class="news-card">
@@ -619,7 +610,7 @@ if st.session_state.data:
                 <a href="{itm['url']}" target="_blank">{itm['headline']}</a>
             </h4>
             <p style="color: #94a3b8; font-size: 0.9rem; margin: 0 0 1rem 0;">
-                📅 {dt} • 📰 {itm['source']}
+                📅 {dt} • 📰 {outlets}{copies}{tone}
             </p>
             <p style="margin: 0; line-height: 1.6;">
                 {itm['summary']}
@@ -627,22 +618,32 @@ if st.session_state.data:
         </div>
         """, unsafe_allow_html=True)
 
+
+def render_summary_header():
     # Summary analysis with enhanced styling
     st.markdown('<div class="section-header">📋 AI-Powered Analysis</div>', unsafe_allow_html=True)
-    
-    st.markdown(f"""
+
+
+def render_summary(summary, target=st):
+    # `target` may be an st.empty() placeholder that is re-rendered as tokens stream in
+    target.markdown(f"""
     <div style="background: linear-gradient(135deg, rgba(251,191,36,0.1) 0%, rgba(245,158,11,0.1) 100%); 
                 border: 1px solid rgba(251,191,36,0.3); border-radius: 16px; padding: 2rem; 
                 backdrop-filter: blur(20px); box-shadow: 0 8px 32px rgba(0,0,0,0.1);">
         <div style="font-size: 1.1rem; line-height: 1.8; color: #e2e8f0;">
-            {data["final_summary"]}
+            {summary}
         </div>
     </div>
     """, unsafe_allow_html=True)
 
+
+def render_fundamentals(company_data):
     # — Full financials in collapsible section (now “Company Fundamental Data”)
+    financials = company_data.get("financials")
+    if not financials:
+        return
+
     with st.expander("🔍 Company Fundamental Data", expanded=False):
-        financials = data["company_data"]["financials"]
         for section_title, metrics in financials.items():
             # Section heading
             st.markdown(f"### {section_title}")
@@ -653,6 +654,123 @@ if st.session_state.data:
             # Display as a table
             st.table(df)
 
+
+
+def render_analysis(data):
+    render_header()
+    render_company(data["company_data"])
+    render_stock(data["stock_data"])
+    render_technical(data["technical_data"])
+    render_news(data["news_data"])
+    render_summary_header()
+    render_summary(data["final_summary"])
+    render_fundamentals(data["company_data"])
+
+
+def iter_sse(response):
+    """Parse a server-sent-events response into (event, data) pairs."""
+    event, data = None, []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if event:
+                yield event, json.loads("\n".join(data))
+            event, data = None, []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].lstrip())
+
+
+def run_streaming_analysis(url, ticker):
+    """
+    Call the /analyze/stream endpoint and render each section as soon as it
+    arrives, then the summary token by token. Returns the assembled response.
+    """
+    render_header()
+    # Containers keep the page layout fixed regardless of arrival order
+    slots = {section: st.container() for section in ["company_data", "stock_data", "technical_data", "news_data"]}
+    render_summary_header()
+    summary_slot = st.empty()
+    fundamentals_slot = st.container()
+
+    renderers = {
+        "company_data": render_company,
+        "stock_data": render_stock,
+        "technical_data": render_technical,
+        "news_data": render_news,
+    }
+
+    data = {"final_summary": ""}
+    with requests.post(url, json={"ticker": ticker}, stream=True) as r:
+        r.raise_for_status()
+        for event, payload in iter_sse(r):
+            if event in renderers:
+                data[event] = payload
+                with slots[event]:
+                    renderers[event](payload)
+                if event == "company_data":
+                    with fundamentals_slot:
+                        render_fundamentals(payload)
+            elif event == "summary_token":
+                data["final_summary"] += payload["text"]
+                render_summary(data["final_summary"] + " ▌", summary_slot)
+            elif event == "done":
+                data["final_summary"] = payload["final_summary"]
+                render_summary(data["final_summary"], summary_slot)
+            elif event == "error":
+                raise RuntimeError(payload["detail"])
+    return data
+
+
+ticker = st.sidebar.text_input("Enter ticker symbol", "AAPL", help="Type any stock symbol (e.g., AAPL, GOOGL, TSLA)").upper()
+api_url = st.sidebar.text_input("API URL", "http://localhost:8000/analyze", help="Your backend API endpoint")
+stream_results = st.sidebar.checkbox("⚡ Stream results", value=True, help="Show each section as soon as it is ready")
+
+# Initialize session_state
+if "data" not in st.session_state:
+    st.session_state.data = None
+if "error" not in st.session_state:
+    st.session_state.error = None
+
+# Enhanced fetch button with loading state
+streamed = False
+if st.sidebar.button("🚀 Run Analysis", help="Fetch and analyze the stock data"):
+    if stream_results:
+        # Rendered progressively in the main area while the response streams in
+        streamed = True
+        st.session_state.error = None
+        status = st.sidebar.empty()
+        status.info("⏳ Streaming analysis...")
+        try:
+            st.session_state.data = run_streaming_analysis(api_url.rstrip("/") + "/stream", ticker)
+            status.success("✅ Data loaded successfully!")
+        except Exception as e:
+            status.empty()
+            st.session_state.error = str(e)
+            st.session_state.data = None
+    else:
+        with st.sidebar:
+            with st.spinner("Fetching data..."):
+                st.session_state.error = None
+                try:
+                    r = requests.post(api_url, json={"ticker": ticker})
+                    r.raise_for_status()
+                    st.session_state.data = r.json()
+                    st.success("✅ Data loaded successfully!")
+                except Exception as e:
+                    st.session_state.error = str(e)
+                    st.session_state.data = None
+
+# Show any fetch error with enhanced styling
+if st.session_state.error:
+    st.sidebar.error(f"❌ API error: {st.session_state.error}")
+
+# Main content area
+if streamed:
+    # Already rendered progressively while streaming
+    pass
+elif st.session_state.data:
+    render_analysis(st.session_state.data)
 else:
     # Welcome screen when no data is loaded
     st.markdown("""
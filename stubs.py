@@ -0,0 +1,501 @@
+import os
+import re
+import json
+import math
+import time
+import uuid
+import zlib
+import random
+import asyncio
+import datetime
+
+import httpx
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from tools.indicators import compute_indicators, to_twelvedata_rows
+
+# Serve every provider and the chat model from the in-process stubs below (no network, no API keys used)
+OFFLINE_PROVIDERS = os.getenv("OFFLINE_PROVIDERS", "").lower() in ("1", "true", "yes")
+
+# Median latency of a stubbed provider call; override per provider with STUB_<PROVIDER>_LATENCY_MS
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "150"))
+# Spread of the log-normal latency distribution (0 = every call takes exactly the median)
+STUB_LATENCY_SIGMA = float(os.getenv("STUB_LATENCY_SIGMA", "0.5"))
+# Fraction of calls that fail; override per provider with STUB_<PROVIDER>_ERROR_RATE
+STUB_ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0"))
+# HTTP status returned by injected failures
+STUB_ERROR_STATUS = int(os.getenv("STUB_ERROR_STATUS", "503"))
+
+# Chat model: time to first token, generation speed and length of the final summary
+STUB_LLM_LATENCY_MS = float(os.getenv("STUB_LLM_LATENCY_MS", "400"))
+STUB_LLM_TOKENS_PER_SECOND = float(os.getenv("STUB_LLM_TOKENS_PER_SECOND", "80"))
+STUB_LLM_SUMMARY_TOKENS = int(os.getenv("STUB_LLM_SUMMARY_TOKENS", "150"))
+
+# Host -> provider, for the latency and error settings of HTTP providers
+PROVIDER_HOSTS = {
+    "financialmodelingprep.com": "fmp",
+    "finnhub.io": "finnhub",
+    "www.alphavantage.co": "alpha_vantage",
+    "news.google.com": "google_news",
+}
+
+# Finnhub metrics the fundamentals tool and the summary digest read
+FINNHUB_METRICS = {
+    "peTTM": (8, 60), "peAnnual": (8, 60), "pb": (1, 40), "psTTM": (1, 20),
+    "netProfitMarginTTM": (-5, 40), "grossMarginTTM": (20, 80), "operatingMarginTTM": (0, 45),
+    "revenueGrowthTTMYoy": (-10, 40), "revenueGrowth5Y": (0, 30), "epsGrowthTTMYoy": (-20, 50),
+    "epsGrowth5Y": (0, 30), "roeTTM": (0, 60), "roaTTM": (0, 25), "epsTTM": (0.5, 15),
+    "totalDebt/totalEquityQuarterly": (0, 3), "currentRatioQuarterly": (0.5, 3),
+    "currentDividendYieldTTM": (0, 4), "payoutRatioTTM": (0, 80), "beta": (0.5, 2),
+    "enterpriseValue": (1e4, 3e6), "52WeekHigh": (50, 500), "52WeekLow": (20, 300),
+}
+
+_WORDS = (
+    "revenue momentum remains solid while valuation looks stretched relative to peers and "
+    "technical indicators point to a consolidating trend with support near the moving average"
+).split()
+
+
+class StubProviderError(Exception):
+    """Injected failure from a stubbed provider SDK."""
+
+
+def _setting(provider: str, name: str, default: float) -> float:
+    return float(os.getenv(f"STUB_{provider.upper()}_{name}", str(default)))
+
+
+def _delay(provider: str) -> float:
+    """Seconds a call to `provider` takes: log-normal around its median latency."""
+    median = _setting(provider, "LATENCY_MS", STUB_LATENCY_MS) / 1000
+    if median <= 0:
+        return 0.0
+    return random.lognormvariate(math.log(median), STUB_LATENCY_SIGMA) if STUB_LATENCY_SIGMA else median
+
+
+def _fails(provider: str) -> bool:
+    return random.random() < _setting(provider, "ERROR_RATE", STUB_ERROR_RATE)
+
+
+def _seed(*parts) -> int:
+    return zlib.crc32(":".join(str(p) for p in parts).encode())
+
+
+def daily_bars(ticker: str, start: datetime.date, end: datetime.date) -> dict:
+    """
+    Deterministic synthetic OHLCV for the weekdays in [start, end]: the same
+    ticker and date always get the same bar, whatever range is requested.
+    """
+    dates = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1)
+    dates = dates[np.is_busday(dates)]
+    day = dates.astype("int64").astype(float)
+
+    seed = _seed(ticker) % 10_000
+    base = 20 + seed % 480
+    # Slow cycles plus hash noise in place of a random walk, so any window can be computed on its own
+    noise = np.modf(np.abs(np.sin(day * 12.9898 + seed) * 43758.5453))[0] - 0.5
+    close = base * (1 + 0.15 * np.sin(day / 45 + seed) + 0.05 * np.sin(day / 7) + 0.02 * noise)
+    open_ = close * (1 - 0.01 * noise)
+    spread = close * (0.005 + 0.01 * np.abs(noise))
+
+    return {
+        "date": [str(d) for d in dates],
+        "open": np.round(open_, 2),
+        "high": np.round(np.maximum(open_, close) + spread, 2),
+        "low": np.round(np.minimum(open_, close) - spread, 2),
+        "close": np.round(close, 2),
+        "volume": (1e6 * (1 + np.abs(noise) * 4)).astype(int),
+    }
+
+
+def _last_bars(ticker: str, days: int = 400) -> dict:
+    end = datetime.date.today()
+    return daily_bars(ticker, end - datetime.timedelta(days=days), end)
+
+
+def quote(ticker: str) -> dict:
+    """FMP-style quote record."""
+    bars = _last_bars(ticker)
+    close, prev = float(bars["close"][-1]), float(bars["close"][-2])
+    year = bars["close"][-252:]
+    return {
+        "symbol": ticker,
+        "price": close,
+        "previousClose": prev,
+        "open": float(bars["open"][-1]),
+        "dayHigh": float(bars["high"][-1]),
+        "dayLow": float(bars["low"][-1]),
+        "volume": int(bars["volume"][-1]),
+        "yearHigh": float(year.max()),
+        "yearLow": float(year.min()),
+        "marketCap": close * 1e9,
+        "sharesOutstanding": 1_000_000_000,
+        "changesPercentage": round((close / float(year[0]) - 1) * 100, 2),
+    }
+
+
+# HTTP providers
+
+def _fmp(request: httpx.Request) -> httpx.Response:
+    path = request.url.path
+    if path.startswith("/api/v3/quote/"):
+        symbols = path.rsplit("/", 1)[-1].split(",")
+        return httpx.Response(200, json=[quote(s.upper()) for s in symbols if s])
+
+    if path.startswith("/api/v3/historical-price-full/"):
+        ticker = path.rsplit("/", 1)[-1].upper()
+        start = datetime.date.fromisoformat(request.url.params["from"])
+        end = datetime.date.fromisoformat(request.url.params["to"])
+        bars = daily_bars(ticker, start, end)
+        fields = ("open", "high", "low", "close", "volume")
+        historical = [
+            {"date": date, **{field: bars[field][i].item() for field in fields}}
+            for i, date in enumerate(bars["date"])
+        ]
+        return httpx.Response(200, json={"symbol": ticker, "historical": historical[::-1]})
+
+    return httpx.Response(404, json={"error": f"stub: unknown FMP endpoint {path}"})
+
+
+def company_news(ticker: str, to: str) -> list:
+    """Finnhub company-news items for `ticker`, the same for every request on day `to`."""
+    rng = random.Random(_seed(ticker, to))
+    now = int(time.time())
+    return [{
+        "category": "company",
+        "datetime": now - rng.randint(600, 6 * 86400),
+        "headline": f"{ticker} {' '.join(rng.sample(_WORDS, 6))}",
+        "id": rng.randint(1, 10**9),
+        "image": "",
+        "related": ticker,
+        "source": rng.choice(["Reuters", "Bloomberg", "MarketWatch", "Yahoo"]),
+        "summary": " ".join(rng.choices(_WORDS, k=40)),
+        "url": f"https://example.com/{ticker.lower()}/{i}",
+    } for i in range(20)]
+
+
+def _finnhub(request: httpx.Request) -> httpx.Response:
+    path = request.url.path
+    ticker = request.url.params.get("symbol", "").upper()
+
+    if path.endswith("/company-news"):
+        return httpx.Response(200, json=company_news(ticker, request.url.params.get("to")))
+
+    if path.endswith("/stock/profile2"):
+        q = quote(ticker)
+        return httpx.Response(200, json={
+            "country": "US", "currency": "USD", "exchange": "NASDAQ NMS - GLOBAL MARKET",
+            "finnhubIndustry": "Technology", "ipo": "2000-01-01", "name": f"{ticker} Inc",
+            "ticker": ticker, "marketCapitalization": q["marketCap"] / 1e6,
+            "shareOutstanding": q["sharesOutstanding"] / 1e6, "weburl": f"https://example.com/{ticker.lower()}",
+        })
+
+    if path.endswith("/stock/metric"):
+        rng = random.Random(_seed(ticker, "metric"))
+        metric = {name: round(rng.uniform(low, high), 4) for name, (low, high) in FINNHUB_METRICS.items()}
+        return httpx.Response(200, json={"metric": metric, "metricType": "all", "symbol": ticker})
+
+    return httpx.Response(404, json={"error": f"stub: unknown Finnhub endpoint {path}"})
+
+
+# Alpha Vantage function -> value fields of each data point
+ALPHA_VANTAGE_FIELDS = {
+    "STOCH": ("SlowK", "SlowD"),
+    "BBANDS": ("Real Upper Band", "Real Middle Band", "Real Lower Band"),
+    "AROON": ("Aroon Down", "Aroon Up"),
+}
+
+
+def _alpha_vantage(request: httpx.Request) -> httpx.Response:
+    function = request.url.params.get("function", "")
+    ticker = request.url.params.get("symbol", "").upper()
+    rng = random.Random(_seed(ticker, function))
+    fields = ALPHA_VANTAGE_FIELDS.get(function, (function,))
+
+    today = datetime.date.today().replace(day=1)
+    series = {}
+    for month in range(24):
+        date = (today - datetime.timedelta(days=30 * month)).replace(day=1)
+        series[date.isoformat()] = {field: f"{rng.uniform(10, 90):.4f}" for field in fields}
+    return httpx.Response(200, json={
+        "Meta Data": {"1: Symbol": ticker, "2: Indicator": function},
+        f"Technical Analysis: {function}": series,
+    })
+
+
+def _google_news(request: httpx.Request) -> httpx.Response:
+    query = request.url.params.get("q", "")
+    ticker = query.split()[0].upper() if query else "STUB"
+    rng = random.Random(_seed(ticker, "rss"))
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    # Like the real feed, half the items are syndicated copies of stories Finnhub also returns
+    syndicated = company_news(ticker, now.date().isoformat())[:5]
+    stories = [(f"{item['headline']} - {item['source']}",
+                datetime.datetime.fromtimestamp(item["datetime"] + rng.randint(60, 3600), datetime.timezone.utc))
+               for item in syndicated]
+    stories += [(f"{ticker} {' '.join(rng.sample(_WORDS, 6))} - Example News",
+                 now - datetime.timedelta(hours=rng.randint(1, 120)))
+                for _ in range(10 - len(stories))]
+
+    items = []
+    for i, (title, published) in enumerate(stories):
+        items.append(
+            f"<item><title>{title}</title>"
+            f"<link>https://news.example.com/{ticker.lower()}/{i}</link>"
+            f"<pubDate>{published.strftime('%a, %d %b %Y %H:%M:%S GMT')}</pubDate>"
+            f"<description>{' '.join(rng.choices(_WORDS, k=30))}</description>"
+            f"<source url=\"https://news.example.com\">Example News</source></item>"
+        )
+    body = f'<?xml version="1.0"?><rss version="2.0"><channel><title>{query}</title>{"".join(items)}</channel></rss>'
+    return httpx.Response(200, text=body, headers={"content-type": "application/rss+xml"})
+
+
+HTTP_HANDLERS = {
+    "fmp": _fmp,
+    "finnhub": _finnhub,
+    "alpha_vantage": _alpha_vantage,
+    "google_news": _google_news,
+}
+
+
+class StubTransport(httpx.AsyncBaseTransport):
+    """httpx transport answering provider requests from the synthetic data above, with injected latency and errors."""
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        provider = PROVIDER_HOSTS.get(request.url.host)
+        await asyncio.sleep(_delay(provider or "http"))
+
+        if request.method == "HEAD":
+            return httpx.Response(200)
+        if provider is None:
+            return httpx.Response(404, json={"error": f"stub: no provider for {request.url.host}"})
+        if _fails(provider):
+            return httpx.Response(STUB_ERROR_STATUS, json={"error": "stub: injected failure"})
+        return HTTP_HANDLERS[provider](request)
+
+
+# Provider SDKs (blocking, like the real ones; the tools call them on worker threads)
+
+def _sdk_call(provider: str):
+    time.sleep(_delay(provider))
+    if _fails(provider):
+        raise StubProviderError(f"stub: injected {provider} failure")
+
+
+class _FastInfo:
+    def __init__(self, ticker: str):
+        q = quote(ticker)
+        self.dayHigh, self.dayLow, self.open = q["dayHigh"], q["dayLow"], q["open"]
+        self.previousClose, self.lastPrice = q["previousClose"], q["price"]
+        self.volume = self.lastVolume = q["volume"]
+        self.marketCap, self.shares = q["marketCap"], q["sharesOutstanding"]
+        self.yearHigh, self.yearLow = q["yearHigh"], q["yearLow"]
+        self.yearChange = q["changesPercentage"] / 100
+
+
+class _YFTicker:
+    def __init__(self, ticker: str):
+        self.ticker = ticker.upper()
+
+    @property
+    def fast_info(self):
+        _sdk_call("yfinance")
+        return _FastInfo(self.ticker)
+
+
+class StubYFinance:
+    """Stands in for the `yfinance` module."""
+
+    Ticker = _YFTicker
+
+    class Tickers:
+        def __init__(self, symbols: str):
+            self.tickers = {s.upper(): _YFTicker(s) for s in symbols.split()}
+
+    @staticmethod
+    def download(tickers, period="1y", group_by="ticker", **kwargs):
+        import pandas as pd
+
+        _sdk_call("yfinance")
+        symbols = tickers.split() if isinstance(tickers, str) else list(tickers)
+        end = datetime.date.today()
+        frames = {}
+        for symbol in symbols:
+            try:
+                bars = daily_bars(symbol.upper(), end - datetime.timedelta(days=365), end)
+            except Exception:
+                # yfinance reports failed symbols and returns them as all-NaN columns
+                bars = {"date": [], "open": [], "high": [], "low": [], "close": [], "volume": []}
+            frames[symbol] = pd.DataFrame({
+                "Open": bars["open"], "High": bars["high"], "Low": bars["low"], "Close": bars["close"],
+                "Adj Close": bars["close"], "Volume": bars["volume"],
+            }, index=pd.DatetimeIndex(bars["date"], name="Date"), dtype=float)
+        # Columns (ticker, field), like yfinance with group_by="ticker"
+        return pd.concat(frames, axis=1)
+
+
+class StubDataReader:
+    """Stands in for `pandas_datareader.data` (Stooq)."""
+
+    @staticmethod
+    def DataReader(ticker, source, start, end):
+        import pandas as pd
+
+        _sdk_call(source)
+        bars = daily_bars(ticker.upper(), pd.Timestamp(start).date(), pd.Timestamp(end).date())
+        frame = pd.DataFrame({
+            "Open": bars["open"], "High": bars["high"], "Low": bars["low"],
+            "Close": bars["close"], "Volume": bars["volume"],
+        }, index=pd.DatetimeIndex(bars["date"], name="Date"))
+        # Stooq returns newest first
+        return frame.iloc[::-1]
+
+
+class _TimeSeries:
+    def __init__(self, symbol: str, outputsize: int):
+        self.symbol = symbol.upper()
+        self.outputsize = outputsize
+
+    def __getattr__(self, name):
+        # with_rsi(), with_sma(), ...: every indicator is always computed
+        if name.startswith("with_"):
+            return lambda *args, **kwargs: self
+        raise AttributeError(name)
+
+    def without_ohlc(self):
+        return self
+
+    def as_json(self):
+        _sdk_call("twelvedata")
+        bars = _last_bars(self.symbol, days=self.outputsize * 2)
+        indicators = compute_indicators(bars["open"], bars["high"], bars["low"], bars["close"], bars["volume"])
+        return tuple(to_twelvedata_rows(bars["date"], indicators, self.outputsize))
+
+
+class StubTwelveData:
+    """Stands in for the `twelvedata` module."""
+
+    class exceptions:
+        class TwelveDataError(Exception):
+            pass
+
+    class TDClient:
+        def __init__(self, apikey: str = None, **kwargs):
+            pass
+
+        def time_series(self, symbol: str, interval: str = "1day", outputsize: int = 30, **kwargs):
+            return _TimeSeries(symbol, outputsize)
+
+
+# Chat model
+
+def _ticker(messages) -> str:
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            match = re.search(r"\bfor ([A-Z][A-Z0-9.\-]*)", message.content)
+            if match:
+                return match.group(1)
+    return "STUB"
+
+
+def _tool_failed(message: ToolMessage) -> bool:
+    try:
+        payload = json.loads(message.content)
+    except (TypeError, ValueError):
+        return True
+    return isinstance(payload, dict) and "error" in payload
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Offline stand-in for the OpenAI chat model. With tools bound (the ReAct
+    sub-agents) it calls the tools in order until one returns data, then
+    answers; without tools (the summary) it writes STUB_LLM_SUMMARY_TOKENS
+    words at STUB_LLM_TOKENS_PER_SECOND after STUB_LLM_LATENCY_MS.
+    """
+
+    model_name: str = "stub-chat"
+    latency_ms: float = STUB_LLM_LATENCY_MS
+    tokens_per_second: float = STUB_LLM_TOKENS_PER_SECOND
+    summary_tokens: int = STUB_LLM_SUMMARY_TOKENS
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _reply(self, messages, tools) -> AIMessage:
+        if _fails("openai"):
+            raise StubProviderError("stub: injected LLM failure")
+
+        ticker = _ticker(messages)
+        if not tools:
+            rng = random.Random(_seed(ticker, len(messages)))
+            words = [ticker] + rng.choices(_WORDS, k=max(0, self.summary_tokens - 1))
+            return AIMessage(content=" ".join(words))
+
+        called = {call["name"] for m in messages if isinstance(m, AIMessage) for call in m.tool_calls}
+        last = messages[-1]
+        if isinstance(last, ToolMessage) and not _tool_failed(last):
+            return AIMessage(content=f"Collected the requested data for {ticker}.")
+
+        for spec in tools:
+            function = spec["function"]
+            if function["name"] in called:
+                continue
+            params = function.get("parameters", {})
+            required = params.get("required") or list(params.get("properties", {}))
+            args = {required[0]: ticker} if required else {}
+            return AIMessage(content="", tool_calls=[{"name": function["name"], "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"}])
+        return AIMessage(content=f"No provider returned data for {ticker}.")
+
+    def _seconds(self, message: AIMessage) -> float:
+        tokens = len(message.content.split()) if message.content else 1
+        return self.latency_ms / 1000 + tokens / self.tokens_per_second
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._reply(messages, kwargs.get("tools"))
+        time.sleep(self._seconds(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._reply(messages, kwargs.get("tools"))
+        await asyncio.sleep(self._seconds(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._reply(messages, kwargs.get("tools"))
+        await asyncio.sleep(self.latency_ms / 1000)
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": 0} for c in message.tool_calls
+            ]))
+            return
+        for i, word in enumerate(message.content.split()):
+            await asyncio.sleep(1 / self.tokens_per_second)
+            token = word if i == 0 else f" {word}"
+            if run_manager:
+                await run_manager.on_llm_new_token(token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+def install():
+    """
+    Route every provider call to the stubs: HTTP providers through a stub
+    transport on the shared client, and the yfinance, Stooq and Twelve Data
+    SDKs replaced by fakes. The chat model is swapped in agents/llm.py.
+    """
+    from tools import http_client, historical_data_tool, stock_data_tool, technical_indicator_tool
+
+    http_client.set_transport(StubTransport())
+    stock_data_tool.yf = StubYFinance()
+    historical_data_tool.pdr = StubDataReader()
+    technical_indicator_tool.twelvedata = StubTwelveData()
+    # Nothing to send traces to
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
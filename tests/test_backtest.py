@@ -0,0 +1,100 @@
+"""
+backtest.simulate against a per-bar loop: positions, costs, the equity curve
+and the per-trade hit rate it derives with np.bincount.
+"""
+import math
+
+import numpy as np
+import pytest
+
+import backtest
+from screener import stack
+from tools import indicators
+
+COST_BPS = 5.0
+
+
+@pytest.fixture(scope="module")
+def universe():
+    rng = np.random.default_rng(11)
+    blocks = {}
+    for i, bars in enumerate([300, 300, 180, 40]):
+        close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+        days = np.arange(bars, dtype=float) + 19000
+        ohlc = [close * 0.99, close * 1.01, close * 0.98, close]
+        blocks[f"T{i}"] = np.vstack([days] + ohlc + [np.full(bars, 1e6)])
+    # Shorter histories are NaN-padded at the front
+    return stack(blocks, 300)
+
+
+def ref_ticker(close, entry, exit, cost_bps):
+    """One ticker, bar by bar: decide at the close, earn the next bar's return."""
+    position, held_prev = 0.0, 0.0
+    equity, peak, max_drawdown = 1.0, 1.0, 0.0
+    strategy, valid, held_bars, trades, trade = [], 0, 0, [], None
+    for t in range(len(close)):
+        held = position if t else 0.0
+        ret = close[t] / close[t - 1] - 1 if t and not (math.isnan(close[t]) or math.isnan(close[t - 1])) else None
+        if ret is not None:
+            valid += 1
+        held_bars += held
+        r = held * (ret or 0.0) - abs(held - held_prev) * cost_bps / 10_000
+        strategy.append((r, ret is not None))
+        equity *= 1 + r
+        peak = max(peak, equity)
+        max_drawdown = min(max_drawdown, equity / peak - 1)
+        if held and not held_prev:
+            trade = 1.0
+        if held:
+            trade *= 1 + r
+        elif held_prev:
+            trades.append(trade - 1)
+        held_prev = held
+
+        if exit is None:
+            position = float(entry[t])
+        elif exit[t]:
+            position = 0.0
+        elif entry[t]:
+            position = 1.0
+    if held_prev:
+        trades.append(trade - 1)
+
+    bars = max(valid, 1)
+    mean = sum(r for r, ok in strategy if ok) / bars
+    std = math.sqrt(sum((r - mean) ** 2 for r, ok in strategy if ok) / bars)
+    return {
+        "total_return": equity - 1,
+        "max_drawdown": max_drawdown,
+        "sharpe": mean / std * math.sqrt(backtest.BARS_PER_YEAR) if std > 0 else 0.0,
+        "trades": len(trades),
+        "hit_rate": sum(x > 0 for x in trades) / len(trades) if trades else math.nan,
+        "exposure": held_bars / bars,
+    }
+
+
+def test_positions_exit_wins_and_holds_between_signals():
+    entry = np.array([[False, True, False, False, True, True, False]])
+    exit = np.array([[False, False, False, True, False, True, False]])
+    np.testing.assert_array_equal(backtest.positions(entry, exit), [[0, 1, 1, 0, 1, 0, 0]])
+    np.testing.assert_array_equal(backtest.positions(entry), entry.astype(float))
+
+
+@pytest.mark.parametrize("exit_rule", ["rsi(14) > 60", None])
+def test_simulate_matches_per_bar_loop(universe, exit_rule):
+    metrics = backtest.simulate(universe, "rsi(14) < 40", exit_rule, COST_BPS)
+    close = universe.series["close"]
+    rsi = indicators.rsi(close, 14)
+    for i in range(len(universe)):
+        expected = ref_ticker(list(close[i]), rsi[i] < 40, rsi[i] > 60 if exit_rule else None, COST_BPS)
+        for name in ("total_return", "max_drawdown", "sharpe", "trades", "exposure"):
+            assert metrics[name][i] == pytest.approx(expected[name], rel=1e-9, abs=1e-12), (universe.tickers[i], name)
+        np.testing.assert_allclose(metrics["hit_rate"][i], expected["hit_rate"], rtol=1e-12, equal_nan=True)
+
+
+def test_aggregate_pools_trades(universe):
+    metrics = backtest.simulate(universe, "rsi(14) < 40", "rsi(14) > 60", COST_BPS)
+    summary = backtest.aggregate(metrics)
+    wins = np.nansum(metrics["hit_rate"] * metrics["trades"])
+    assert summary["trades"] == int(metrics["trades"].sum())
+    assert summary["hit_rate"] == round(wins / metrics["trades"].sum(), 4)
@@ -0,0 +1,79 @@
+"""
+The atomic `add` every shared cache backend provides for refresh leases:
+the first add wins until its entry expires.
+"""
+import time
+import asyncio
+import threading
+
+import pytest
+
+from tools.cache_backends import CACHE_REDIS_URL, RedisCache, SQLiteCache, TTLCache
+
+TTL = 0.2
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        yield TTLCache(max_entries=16)
+        return
+    if request.param == "sqlite":
+        yield SQLiteCache("test", max_entries=16, path=str(tmp_path / "cache.sqlite3"))
+        return
+
+    redis = pytest.importorskip("redis")
+    try:
+        redis.Redis.from_url(CACHE_REDIS_URL).ping()
+    except redis.exceptions.ConnectionError:
+        pytest.skip(f"No Redis server at {CACHE_REDIS_URL}")
+    cache = RedisCache(f"test-{time.time_ns()}", max_entries=16)
+    yield cache
+    cache.clear()
+
+
+def test_first_add_wins(cache):
+    assert cache.add("lease", "worker-1", TTL)
+    assert not cache.add("lease", "worker-2", TTL)
+    assert cache.peek("lease") == (True, "worker-1")
+
+
+def test_expired_entry_can_be_added_again(cache):
+    assert cache.add("lease", "worker-1", TTL)
+    time.sleep(TTL * 2)
+    assert cache.add("lease", "worker-2", TTL)
+    assert cache.peek("lease") == (True, "worker-2")
+
+
+def test_deleted_entry_can_be_added_again(cache):
+    assert cache.add("lease", "worker-1", TTL)
+    cache.delete("lease")
+    assert cache.add("lease", "worker-2", TTL)
+
+
+def test_concurrent_adds_have_one_winner(cache):
+    start = threading.Barrier(8)
+    wins = []
+
+    def add(worker):
+        start.wait()
+        wins.append(cache.add("lease", worker, 5))
+
+    threads = [threading.Thread(target=add, args=(f"worker-{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(wins) == 1
+
+
+def test_async_variants(cache):
+    async def run():
+        assert await cache.aadd("lease", "worker-1", TTL)
+        assert not await cache.aadd("lease", "worker-2", TTL)
+        await cache.aset("key", {"data": 1}, TTL)
+        assert await cache.aget("key") == (True, {"data": 1})
+        await cache.adelete("key")
+        assert await cache.apeek("key") == (False, None)
+
+    asyncio.run(run())
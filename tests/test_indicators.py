@@ -0,0 +1,226 @@
+"""
+Accuracy of tools/indicators.py against straightforward loop implementations
+of the TA-Lib definitions (the ones Twelve Data and Alpha Vantage compute).
+"""
+import math
+
+import numpy as np
+import pytest
+
+from tools import indicators
+
+PERIOD = 14
+
+
+@pytest.fixture(scope="module")
+def ohlc():
+    rng = np.random.default_rng(7)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 300)))
+    open_ = close * np.exp(rng.normal(0, 0.005, close.size))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.01, close.size)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.01, close.size)))
+    return high, low, close
+
+
+def assert_matches(actual, expected, lookback):
+    """NaN through the first `lookback` values, equal afterwards."""
+    actual, expected = np.asarray(actual), np.asarray(expected)
+    assert np.isnan(actual[:lookback]).all()
+    np.testing.assert_allclose(actual[lookback:], expected[lookback:], rtol=1e-9, atol=1e-9)
+
+
+def ref_sma(x, period):
+    out = [math.nan] * len(x)
+    for i in range(period - 1, len(x)):
+        out[i] = sum(x[i - period + 1:i + 1]) / period
+    return out
+
+
+def ref_smoothed(x, period, alpha, start=0):
+    """SMA of x[start:start + period] at its last index, then y = y_prev + alpha * (x - y_prev)."""
+    out = [math.nan] * len(x)
+    first = start + period - 1
+    out[first] = sum(x[start:first + 1]) / period
+    for i in range(first + 1, len(x)):
+        out[i] = out[i - 1] + alpha * (x[i] - out[i - 1])
+    return out
+
+
+def ref_rsi(close, period):
+    gains = [0.0] + [max(close[i] - close[i - 1], 0.0) for i in range(1, len(close))]
+    losses = [0.0] + [max(close[i - 1] - close[i], 0.0) for i in range(1, len(close))]
+    avg_gain = ref_smoothed(gains, period, 1 / period, start=1)
+    avg_loss = ref_smoothed(losses, period, 1 / period, start=1)
+    return [100 - 100 / (1 + g / l) if l else (math.nan if math.isnan(g) else 100.0)
+            for g, l in zip(avg_gain, avg_loss)]
+
+
+def ref_bbands(close, period, k):
+    upper, middle, lower = [math.nan] * len(close), [math.nan] * len(close), [math.nan] * len(close)
+    for i in range(period - 1, len(close)):
+        window = close[i - period + 1:i + 1]
+        mean = sum(window) / period
+        std = math.sqrt(sum((v - mean) ** 2 for v in window) / period)
+        upper[i], middle[i], lower[i] = mean + k * std, mean, mean - k * std
+    return upper, middle, lower
+
+
+def ref_stoch(high, low, close, fast_k, slow_d):
+    k = [math.nan] * len(close)
+    for i in range(fast_k - 1, len(close)):
+        hh, ll = max(high[i - fast_k + 1:i + 1]), min(low[i - fast_k + 1:i + 1])
+        k[i] = 100 * (close[i] - ll) / (hh - ll) if hh != ll else 0.0
+    d = [math.nan] * len(close)
+    for i in range(fast_k + slow_d - 2, len(close)):
+        d[i] = sum(k[i - slow_d + 1:i + 1]) / slow_d
+    return k, d
+
+
+def ref_cci(high, low, close, period):
+    typical = [(h + l + c) / 3 for h, l, c in zip(high, low, close)]
+    out = [math.nan] * len(close)
+    for i in range(period - 1, len(close)):
+        window = typical[i - period + 1:i + 1]
+        mean = sum(window) / period
+        dev = sum(abs(v - mean) for v in window) / period
+        out[i] = (typical[i] - mean) / (0.015 * dev) if dev else 0.0
+    return out
+
+
+def ref_adx(high, low, close, period):
+    """TA-Lib's ADX loop: running sums seeded over period - 1 bars, DX averaged over the next period bars."""
+    n = len(close)
+    out = [math.nan] * n
+
+    def step(today):
+        up, down = high[today] - high[today - 1], low[today - 1] - low[today]
+        plus = up if up > 0 and up > down else 0.0
+        minus = down if down > 0 and down > up else 0.0
+        tr = max(high[today] - low[today], abs(high[today] - close[today - 1]), abs(low[today] - close[today - 1]))
+        return plus, minus, tr
+
+    def dx(plus_dm, minus_dm, tr):
+        if tr == 0:
+            return 0.0
+        plus_di, minus_di = 100 * plus_dm / tr, 100 * minus_dm / tr
+        total = plus_di + minus_di
+        return 100 * abs(plus_di - minus_di) / total if total else 0.0
+
+    plus_dm = minus_dm = tr = 0.0
+    today = 0
+    for _ in range(period - 1):
+        today += 1
+        p, m, t = step(today)
+        plus_dm, minus_dm, tr = plus_dm + p, minus_dm + m, tr + t
+
+    def advance():
+        nonlocal today, plus_dm, minus_dm, tr
+        today += 1
+        p, m, t = step(today)
+        plus_dm = plus_dm - plus_dm / period + p
+        minus_dm = minus_dm - minus_dm / period + m
+        tr = tr - tr / period + t
+        return dx(plus_dm, minus_dm, tr)
+
+    adx = sum(advance() for _ in range(period)) / period
+    out[today] = adx
+    while today < n - 1:
+        value = advance()
+        adx = (adx * (period - 1) + value) / period
+        out[today] = adx
+    return out
+
+
+def ref_aroon(high, low, period):
+    down, up = [math.nan] * len(high), [math.nan] * len(high)
+    for i in range(period, len(high)):
+        highs, lows = high[i - period:i + 1], low[i - period:i + 1]
+        # Ties go to the most recent extreme
+        since_high = period - max(range(period + 1), key=lambda j: (highs[j], j))
+        since_low = period - min(range(period + 1), key=lambda j: (lows[j], -j))
+        up[i] = 100 * (period - since_high) / period
+        down[i] = 100 * (period - since_low) / period
+    return down, up
+
+
+def test_sma(ohlc):
+    _, _, close = ohlc
+    assert_matches(indicators.sma(close, PERIOD), ref_sma(list(close), PERIOD), PERIOD - 1)
+
+
+def test_ema(ohlc):
+    _, _, close = ohlc
+    expected = ref_smoothed(list(close), PERIOD, 2 / (PERIOD + 1))
+    assert_matches(indicators.ema(close, PERIOD), expected, PERIOD - 1)
+
+
+def test_rsi(ohlc):
+    _, _, close = ohlc
+    assert_matches(indicators.rsi(close, PERIOD), ref_rsi(list(close), PERIOD), PERIOD)
+
+
+def test_rsi_matches_published_example():
+    # StockCharts' "Relative Strength Index (RSI)" ChartSchool worked example (Wilder smoothing, 14 days)
+    close = np.array([
+        44.3389, 44.0902, 44.1497, 43.6124, 44.3278, 44.8264, 45.0955, 45.4245, 45.8433, 46.0826, 45.8931,
+        46.0328, 45.6140, 46.2820, 46.2820, 46.0028, 46.0328, 46.4116, 46.2222, 45.6439, 46.2122, 46.2521,
+        45.7137, 46.4515, 45.7835, 45.3548, 44.0288, 44.1783, 44.2181, 44.5672, 43.4205, 42.6628, 43.1314,
+    ])
+    published = [70.53, 66.32, 66.55, 69.41, 66.36, 57.97, 62.93, 63.26, 56.06, 62.38,
+                 54.71, 50.42, 39.99, 41.46, 41.87, 45.46, 37.30, 33.08, 37.77]
+    np.testing.assert_allclose(indicators.rsi(close, PERIOD)[PERIOD:], published, atol=0.005)
+
+
+def test_rsi_without_losses_is_100():
+    close = np.arange(1.0, 40.0)
+    assert (indicators.rsi(close, PERIOD)[PERIOD:] == 100.0).all()
+
+
+def test_bbands(ohlc):
+    _, _, close = ohlc
+    for actual, expected in zip(indicators.bbands(close, 20, 2.0), ref_bbands(list(close), 20, 2.0)):
+        assert_matches(actual, expected, 19)
+
+
+def test_stoch(ohlc):
+    high, low, close = ohlc
+    slow_k, slow_d = indicators.stoch(high, low, close)
+    expected_k, expected_d = ref_stoch(list(high), list(low), list(close), 14, 3)
+    assert_matches(slow_k, expected_k, 13)
+    assert_matches(slow_d, expected_d, 15)
+
+
+def test_cci(ohlc):
+    high, low, close = ohlc
+    assert_matches(indicators.cci(high, low, close, 20), ref_cci(list(high), list(low), list(close), 20), 19)
+
+
+def test_adx(ohlc):
+    high, low, close = ohlc
+    assert_matches(indicators.adx(high, low, close, PERIOD), ref_adx(list(high), list(low), list(close), PERIOD),
+                   2 * PERIOD - 1)
+
+
+def test_adx_early_rows_follow_talib_seeding(ohlc):
+    # An SMA-seeded smoothing of +DM/-DM/TR drifts from TA-Lib most in the first rows
+    high, low, close = ohlc
+    actual = indicators.adx(high, low, close, PERIOD)[2 * PERIOD - 1:2 * PERIOD + 9]
+    expected = ref_adx(list(high), list(low), list(close), PERIOD)[2 * PERIOD - 1:2 * PERIOD + 9]
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9)
+
+
+def test_aroon(ohlc):
+    high, low, _ = ohlc
+    for actual, expected in zip(indicators.aroon(high, low, PERIOD), ref_aroon(list(high), list(low), PERIOD)):
+        assert_matches(actual, expected, PERIOD)
+
+
+def test_universe_rows_match_single_tickers(ohlc):
+    high, low, close = ohlc
+    universe = np.vstack([close, close[::-1], close * 2])
+    highs, lows = np.vstack([high, high[::-1], high * 2]), np.vstack([low, low[::-1], low * 2])
+    together = indicators.compute_indicators(None, highs, lows, universe)
+    for row in range(universe.shape[0]):
+        alone = indicators.compute_indicators(None, highs[row], lows[row], universe[row])
+        for name, values in alone.items():
+            np.testing.assert_allclose(together[name][row], values, rtol=1e-9, atol=1e-9, equal_nan=True)
@@ -0,0 +1,45 @@
+"""
+Headline clustering in tools/news_dedup.py: syndicated copies collapse into
+one story, distinct stories with near-identical headlines do not.
+"""
+import pytest
+
+from tools.news_dedup import LSHIndex, signatures, split_source
+
+NEAR_MISSES = [
+    ("Microsoft stock hits record high", "Apple stock hits record high"),
+    ("Apple Q3 earnings beat estimates", "Apple Q2 earnings beat estimates"),
+    ("Apple announces $90B buyback", "Apple announces $110B buyback"),
+    ("Tesla recalls 2 million vehicles over Autopilot", "Tesla recalls 200,000 vehicles over Autopilot"),
+    ("Fed holds rates steady, signals two cuts in 2025", "Fed holds rates steady, signals three cuts in 2025"),
+]
+
+COPIES = [
+    ("Nvidia unveils Blackwell chips at GTC conference", "Nvidia unveils Blackwell chips at GTC conference - Reuters"),
+    ("Apple beats quarterly revenue estimates on iPhone demand", "Apple Beats Quarterly Revenue Estimates on iPhone Demand"),
+    ("Amazon to invest $10 billion in North Carolina data centers",
+     "Amazon to invest $10 billion in North Carolina data centers - CNBC"),
+]
+
+
+def clusters(first: str, second: str) -> tuple:
+    index = LSHIndex()
+    headlines = [split_source(first)[0], split_source(second)[0]]
+    return tuple(index.add(signature) for signature in signatures(headlines))
+
+
+@pytest.mark.parametrize("first, second", NEAR_MISSES)
+def test_distinct_stories_stay_apart(first, second):
+    a, b = clusters(first, second)
+    assert a != b
+
+
+@pytest.mark.parametrize("first, second", COPIES)
+def test_syndicated_copies_merge(first, second):
+    a, b = clusters(first, second)
+    assert a == b
+
+
+def test_split_source():
+    assert split_source("Apple beats estimates - Reuters") == ("Apple beats estimates", "Reuters")
+    assert split_source("Apple beats estimates") == ("Apple beats estimates", None)
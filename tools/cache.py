@@ -0,0 +1,177 @@
+import os
+import time
+import socket
+import asyncio
+import inspect
+import functools
+from contextlib import asynccontextmanager
+
+from tools.cache_backends import make_cache
+from tools.metrics import PROVIDER
+from tools.singleflight import SingleFlight
+
+# Time-to-live (seconds) for each class of provider data
+TTL_SECONDS = {
+    "quote":        15,
+    "news":         5 * 60,
+    "indicators":   5 * 60,
+    "historical":   60 * 60,
+    "fundamentals": 6 * 60 * 60,
+}
+
+# Arguments that carry a ticker symbol; normalized so "aapl" and "AAPL" share an entry
+TICKER_ARGS = {"ticker", "symbol", "ticker_symbol"}
+
+# With a shared backend, the worker refreshing a key holds a lease on it; the others wait for its result
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+REFRESH_LEASE_SECONDS = float(os.getenv("CACHE_REFRESH_LEASE_SECONDS", "60"))
+REFRESH_POLL_SECONDS = float(os.getenv("CACHE_REFRESH_POLL_SECONDS", "0.05"))
+# The poll interval doubles up to this, so long refreshes do not keep hammering the backend
+REFRESH_POLL_MAX_SECONDS = float(os.getenv("CACHE_REFRESH_POLL_MAX_SECONDS", "1"))
+
+
+tool_cache = make_cache("tool", max_entries=int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024")))
+
+# Concurrent cache misses for the same key share one upstream call
+provider_flight = SingleFlight()
+
+# LLM summaries, keyed by a hash of their normalized inputs (see digest.summary_key)
+SUMMARY_TTL_SECONDS = float(os.getenv("SUMMARY_CACHE_TTL_SECONDS", "900"))
+summary_cache = make_cache("summary", max_entries=int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "256")))
+
+
+# Per-ticker state of the merged news pipeline (cursors and clustered stories), see company_news_tool
+news_cache = make_cache("news", max_entries=int(os.getenv("NEWS_CACHE_MAX_ENTRIES", "1024")))
+
+
+def make_key(provider: str, endpoint: str, func, args, kwargs) -> tuple:
+    """Build a hashable cache key from the provider, endpoint and bound call arguments."""
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+
+    params = []
+    for name, value in sorted(bound.arguments.items()):
+        if name in TICKER_ARGS and isinstance(value, str):
+            value = value.strip().upper()
+        params.append((name, repr(value)))
+
+    return (provider, endpoint, tuple(params))
+
+
+async def alookup(provider: str, endpoint: str, func, *args, **kwargs):
+    """Look up the entry `func(*args, **kwargs)` would hit through @cached."""
+    return await tool_cache.aget(make_key(provider, endpoint, func, args, kwargs))
+
+
+async def astore(provider: str, endpoint: str, data_class: str, func, value, *args, **kwargs):
+    """Store `value` as if `func(*args, **kwargs)` had been called through @cached."""
+    if _is_cacheable(value):
+        await tool_cache.aset(make_key(provider, endpoint, func, args, kwargs), value, TTL_SECONDS[data_class])
+
+
+def _poll_refresh(cache, key, lease_key):
+    # One worker-thread hop per poll: the value, else whether the lease is still held
+    hit, value = cache.peek(key)
+    if hit:
+        return True, value, True
+    held, _ = cache.peek(lease_key)
+    if not held:
+        hit, value = cache.peek(key)
+    return hit, value, held
+
+
+async def wait_for_refresh(cache, key, lease_key) -> tuple:
+    """
+    Poll `cache` until another worker stores `key` or gives up its lease.
+    Returns (True, value) on success, (False, None) if the key is still missing.
+    """
+    deadline = time.monotonic() + REFRESH_LEASE_SECONDS
+    interval = REFRESH_POLL_SECONDS
+    while time.monotonic() < deadline:
+        hit, value, held = await asyncio.to_thread(_poll_refresh, cache, key, lease_key)
+        if hit or not held:
+            return hit, value
+        await asyncio.sleep(interval)
+        interval = min(interval * 2, REFRESH_POLL_MAX_SECONDS)
+    return False, None
+
+
+@asynccontextmanager
+async def refresh_lease(cache, key):
+    """
+    Make sure only one worker refreshes `key` in a shared cache. Yields
+    (True, value) when another worker produced the value meanwhile; otherwise
+    (False, None), and the caller should compute and store it. In-process
+    caches always yield (False, None): SingleFlight already coalesces there.
+    """
+    if not cache.shared:
+        yield False, None
+        return
+
+    lease_key = ("refresh", key)
+    if await cache.aadd(lease_key, WORKER_ID, REFRESH_LEASE_SECONDS):
+        try:
+            yield False, None
+        finally:
+            await cache.adelete(lease_key)
+        return
+
+    # Another worker holds the lease; if it fails or stalls, this one refreshes without it
+    yield await wait_for_refresh(cache, key, lease_key)
+
+
+def _is_cacheable(result) -> bool:
+    # Provider failures are reported as {"error": ...}; never pin those in the cache
+    return not (isinstance(result, dict) and "error" in result)
+
+
+def cached(provider: str, endpoint: str, data_class: str):
+    """
+    Decorator caching a provider call in `tool_cache` under the TTL of `data_class`.
+    Works for both sync and async functions; apply it below `@tool`. For async
+    functions, concurrent misses on the same key are coalesced into one call,
+    across workers too when the cache backend is shared (see `refresh_lease`).
+    Misses are timed under the provider_request metrics.
+    """
+    ttl = TTL_SECONDS[data_class]
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = make_key(provider, endpoint, func, args, kwargs)
+                hit, value = await tool_cache.aget(key)
+                if hit:
+                    return value
+
+                async def call():
+                    async with refresh_lease(tool_cache, key) as (hit, value):
+                        if hit:
+                            return value
+                        with PROVIDER.time(provider=provider, endpoint=endpoint) as outcome:
+                            result = await func(*args, **kwargs)
+                            outcome.failed = not _is_cacheable(result)
+                        if _is_cacheable(result):
+                            await tool_cache.aset(key, result, ttl)
+                        return result
+
+                return await provider_flight.do(key, call)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(provider, endpoint, func, args, kwargs)
+            hit, value = tool_cache.get(key)
+            if hit:
+                return value
+            with PROVIDER.time(provider=provider, endpoint=endpoint) as outcome:
+                result = func(*args, **kwargs)
+                outcome.failed = not _is_cacheable(result)
+            if _is_cacheable(result):
+                tool_cache.set(key, result, ttl)
+            return result
+
+        return wrapper
+
+    return decorator
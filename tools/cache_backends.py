@@ -0,0 +1,321 @@
+import os
+import time
+import asyncio
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from tools.lazy import lazy_import
+
+# Redis client, only imported when CACHE_BACKEND=redis
+redis = lazy_import("redis")
+
+# "memory" (per process), "sqlite" (a file every worker on the host opens) or "redis" (any Redis-compatible server)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+# Put it on tmpfs (e.g. /dev/shm/financial-agent-cache.sqlite3) to keep it in memory
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", os.path.join("data", "cache.sqlite3"))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+# Shared backends drop expired and excess entries once every this many writes (per process)
+PRUNE_EVERY = 100
+
+
+class CacheBackend:
+    """
+    Key/value store with per-entry TTL. Backends implement `peek`, `set`, `add`,
+    `delete`, `clear` and `__len__`; `get` adds this process' hit/miss counters.
+    Values must be picklable for the shared backends. Async code uses the
+    `a`-prefixed variants, which keep a shared backend's I/O off the event loop.
+    """
+
+    name = "base"
+    # Whether other worker processes see the same entries
+    shared = False
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key):
+        """Return (True, value) for a fresh entry, (False, None) otherwise."""
+        hit, value = self.peek(key)
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return hit, value
+
+    def peek(self, key):
+        """Like `get`, without counting towards the hit ratio."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl: float):
+        raise NotImplementedError
+
+    def add(self, key, value, ttl: float) -> bool:
+        """Atomically store `value` only if `key` has no fresh entry; True if it was stored."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    async def _offload(self, method, *args):
+        # Shared backends block on a socket or the SQLite write lock; run them on a worker thread
+        if not self.shared:
+            return method(*args)
+        return await asyncio.to_thread(method, *args)
+
+    async def aget(self, key):
+        return await self._offload(self.get, key)
+
+    async def apeek(self, key):
+        return await self._offload(self.peek, key)
+
+    async def aset(self, key, value, ttl: float):
+        return await self._offload(self.set, key, value, ttl)
+
+    async def aadd(self, key, value, ttl: float) -> bool:
+        return await self._offload(self.add, key, value, ttl)
+
+    async def adelete(self, key):
+        return await self._offload(self.delete, key)
+
+    def entries(self):
+        """Number of fresh entries, or None when the backend cannot count them cheaply."""
+        return len(self)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            hits, misses, evictions = self.hits, self.misses, self.evictions
+        total = hits + misses
+        return {
+            "backend":   self.name,
+            "entries":   self.entries(),
+            "hits":      hits,
+            "misses":    misses,
+            "evictions": evictions,
+            "hit_ratio": hits / total if total else 0.0,
+        }
+
+
+class TTLCache(CacheBackend):
+    """
+    Thread-safe in-process cache with a per-entry TTL and LRU eviction once
+    `max_entries` is reached. Keeps hit/miss/eviction counters for monitoring.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024):
+        super().__init__(max_entries)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    def peek(self, key):
+        with self._lock:
+            entry = self._fresh(key)
+            if entry is None:
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def set(self, key, value, ttl: float):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key, value, ttl: float) -> bool:
+        with self._lock:
+            if self._fresh(key) is not None:
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def _store(self, key, value, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+def _key(key) -> str:
+    # Cache keys are tuples of strings/numbers (or strings); their repr is stable across processes
+    return key if isinstance(key, str) else repr(key)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache in a SQLite file shared by every worker process on the host (WAL mode,
+    one connection per thread). Expiry uses wall-clock time so all processes
+    agree on it; past `max_entries`, the entries closest to expiry are dropped.
+    """
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, namespace: str, max_entries: int = 1024, path: str = CACHE_SQLITE_PATH):
+        super().__init__(max_entries)
+        self.namespace = namespace
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, expires_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def peek(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (self.namespace, _key(key), time.time()),
+        ).fetchone()
+        if row is None:
+            return False, None
+        return True, pickle.loads(row[0])
+
+    def set(self, key, value, ttl: float):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (self.namespace, _key(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL), time.time() + ttl),
+        )
+        self._maybe_prune()
+
+    def add(self, key, value, ttl: float) -> bool:
+        now = time.time()
+        # A single upsert is atomic: it only overwrites an entry that has already expired
+        cursor = self._connection().execute(
+            "INSERT INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE cache.expires_at <= ?",
+            (self.namespace, _key(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL), now + ttl, now),
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, _key(key)))
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+    def __len__(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM cache WHERE namespace = ? AND expires_at > ?", (self.namespace, time.time())
+        ).fetchone()[0]
+
+    def _maybe_prune(self):
+        self._writes += 1
+        if self._writes % PRUNE_EVERY:
+            return
+        db = self._connection()
+        db.execute("DELETE FROM cache WHERE namespace = ? AND expires_at <= ?", (self.namespace, time.time()))
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            db.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                " SELECT key FROM cache WHERE namespace = ? ORDER BY expires_at LIMIT ?)",
+                (self.namespace, self.namespace, excess),
+            )
+            with self._stats_lock:
+                self.evictions += excess
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache in a Redis-compatible server (Redis, Valkey, KeyDB, Dragonfly) shared
+    by every worker. Keys expire through Redis TTLs; eviction beyond that is
+    left to the server's maxmemory policy, so `max_entries` is not enforced.
+    """
+
+    name = "redis"
+    shared = True
+
+    def __init__(self, namespace: str, max_entries: int = 1024, url: str = CACHE_REDIS_URL):
+        super().__init__(max_entries)
+        self.prefix = f"financial-agent:{namespace}:"
+        self._client = redis.Redis.from_url(url)
+
+    def _name(self, key) -> str:
+        return self.prefix + _key(key)
+
+    def peek(self, key):
+        raw = self._client.get(self._name(key))
+        if raw is None:
+            return False, None
+        return True, pickle.loads(raw)
+
+    def set(self, key, value, ttl: float):
+        self._client.set(self._name(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL), px=max(1, int(ttl * 1000)))
+
+    def add(self, key, value, ttl: float) -> bool:
+        stored = self._client.set(self._name(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                                  px=max(1, int(ttl * 1000)), nx=True)
+        return bool(stored)
+
+    def delete(self, key):
+        self._client.delete(self._name(key))
+
+    def clear(self):
+        names = list(self._client.scan_iter(match=self.prefix + "*", count=1000))
+        if names:
+            self._client.delete(*names)
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(match=self.prefix + "*", count=1000))
+
+    def entries(self):
+        # Counting means a SCAN of the whole keyspace, too slow for every /health and /metrics call
+        return None
+
+
+def make_cache(namespace: str, max_entries: int, backend: str = None) -> CacheBackend:
+    """Build the cache for `namespace` on the configured backend (CACHE_BACKEND)."""
+    backend = (backend or CACHE_BACKEND).lower()
+    if backend == "memory":
+        return TTLCache(max_entries=max_entries)
+    if backend == "sqlite":
+        return SQLiteCache(namespace, max_entries=max_entries)
+    if backend == "redis":
+        return RedisCache(namespace, max_entries=max_entries)
+    raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
@@ -1,18 +1,24 @@
 from langchain_core.tools import tool
-import finnhub
+import asyncio
+import logging
 from config import FINNHUB_API_KEY
+from tools.cache import cached
+from tools.http_client import get_json
+from tools.results import recorded
+
+logger = logging.getLogger(__name__)
+
+FINNHUB_BASE_URL = "https://finnhub.io/api/v1"
 
 @tool
-def get_fundamentals_finnhub(ticker: str) -> dict:
+@recorded
+@cached("finnhub", "fundamentals", "fundamentals")
+async def get_fundamentals_finnhub(ticker: str) -> dict:
     """
     Fetch company fundamentals data for a NASDAQ ticker using Finnhub.
     """
 
-    print("----"*10)
-    print("Tool called: get_fundamentals_finnhub")
-    print("----"*10)
-
-    client = finnhub.Client(api_key=FINNHUB_API_KEY)
+    logger.debug("Tool called", extra={"tool": "get_fundamentals_finnhub"})
 
     company_funamentals_dict = {
                         "Valuation Metrics": {
@@ -148,8 +154,13 @@ def get_fundamentals_finnhub(ticker: str) -> dict:
 
 
     try:
-        profile = client.company_profile2(symbol=ticker)
-        metrics = client.company_basic_financials(symbol=ticker, metric="all")
+        # Profile and metrics are independent; fetch them concurrently
+        profile, metrics = await asyncio.gather(
+            get_json(f"{FINNHUB_BASE_URL}/stock/profile2",
+                     params={"symbol": ticker, "token": FINNHUB_API_KEY}, provider="finnhub"),
+            get_json(f"{FINNHUB_BASE_URL}/stock/metric",
+                     params={"symbol": ticker, "metric": "all", "token": FINNHUB_API_KEY}, provider="finnhub"),
+        )
 
         for categories in company_funamentals_dict:
 
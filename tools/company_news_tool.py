@@ -1,25 +1,48 @@
 from langchain_core.tools import tool
-import finnhub
+import os
+import re
+import math
+import time
+import asyncio
+import logging
+import httpx
+import numpy as np
 from datetime import datetime, timedelta, timezone
-import feedparser
 from config import FINNHUB_API_KEY
 from urllib.parse import quote_plus
+from tools.cache import cached, news_cache, provider_flight
+from tools.http_client import get_json, get_text
+from tools.lazy import lazy_import
+from tools.news_dedup import SIGNATURE_VERSION, LSHIndex, signatures, split_source
+from tools.results import recorded
+from tools.sentiment import aggregate, score_articles
+
+logger = logging.getLogger(__name__)
+
+# RSS parser, imported on first use
+feedparser = lazy_import("feedparser")
+
+FINNHUB_BASE_URL = "https://finnhub.io/api/v1"
+
+# Days of stories the merged pipeline keeps per ticker
+NEWS_WINDOW_DAYS = int(os.getenv("NEWS_WINDOW_DAYS", "7"))
+# Calls within this many seconds of the last refresh reuse the stored stories without fetching
+NEWS_REFRESH_SECONDS = float(os.getenv("NEWS_REFRESH_SECONDS", "60"))
+# Hours before each source's cursor that are fetched again, for items indexed after newer ones
+NEWS_OVERLAP_HOURS = float(os.getenv("NEWS_OVERLAP_HOURS", "24"))
 
 @tool
+@recorded
+@cached("finnhub", "company_news", "news")
 async def get_company_news_finnhub(ticker: str, days: int = 7) -> dict:
     """
     Fetch recent news articles for a NASDAQ ticker using Finnhub.
     """
-    print("----"*10)
-    print("Tool called: get_company_news_finnhub")
-    print("----"*10)
+    logger.debug("Tool called", extra={"tool": "get_company_news_finnhub"})
 
     if not FINNHUB_API_KEY:
         return {"error": "Finnhub API key not provided"}
 
-    # Initialize client
-    client = finnhub.Client(api_key=FINNHUB_API_KEY)
-
     # Compute date range
     to_date = datetime.now(timezone.utc).date()
     from_date = to_date - timedelta(days=days)
@@ -28,7 +51,11 @@ async def get_company_news_finnhub(ticker: str, days: int = 7) -> dict:
 
     try:
         # Fetch company news
-        news = client.company_news(symbol=ticker, _from=frm, to=to)
+        news = await get_json(
+            f"{FINNHUB_BASE_URL}/company-news",
+            params={"symbol": ticker, "from": frm, "to": to, "token": FINNHUB_API_KEY},
+            provider="finnhub",
+        )
 
         if not isinstance(news, list):
             return {"error": f"Unexpected response format: {news}"}
@@ -47,13 +74,15 @@ async def get_company_news_finnhub(ticker: str, days: int = 7) -> dict:
 
         return {"data": filtered}
 
-    except finnhub.exceptions.FinnhubAPIException as e:
+    except httpx.HTTPStatusError as e:
         return {"error": f"Finnhub API error: {e}"}
     except Exception as e:
         return {"error": f"Unexpected error: {e}"}
     
 
 @tool
+@recorded
+@cached("google_news", "rss", "news")
 async def get_company_news_rss(ticker: str, days: int = 7) -> dict:
     """
     Fetch recent news articles for a NASDAQ ticker over the past `days` days
@@ -77,9 +106,7 @@ async def get_company_news_rss(ticker: str, days: int = 7) -> dict:
           - on error:   {"error": "<message>"}
     """
 
-    print("----"*10)
-    print("Tool called: get_company_news_rss")
-    print("----"*10)
+    logger.debug("Tool called", extra={"tool": "get_company_news_rss"})
 
     # URL-encode the query to avoid spaces and control characters
     query = quote_plus(f"{ticker} stock")
@@ -87,7 +114,9 @@ async def get_company_news_rss(ticker: str, days: int = 7) -> dict:
 
     # Try parsing the feed
     try:
-        feed = feedparser.parse(feed_url)
+        body = await get_text(feed_url, provider="google_news")
+        # Parsing is CPU-bound; keep it off the event loop
+        feed = await asyncio.to_thread(feedparser.parse, body)
         if feed.bozo and hasattr(feed, "bozo_exception"):
             raise feed.bozo_exception
     except Exception as e:
@@ -111,3 +140,192 @@ async def get_company_news_rss(ticker: str, days: int = 7) -> dict:
         })
 
     return {"data": articles}
+
+
+# Sources merged by get_company_news, richest item shape first (its copy represents a story)
+NEWS_SOURCES = [
+    ("finnhub", get_company_news_finnhub),
+    ("google_news", get_company_news_rss),
+]
+_SOURCE_RANK = {provider: rank for rank, (provider, _) in enumerate(NEWS_SOURCES)}
+_TAG = re.compile(r"<[^>]+>")
+
+
+def _epoch(value) -> int:
+    """Publish time as epoch seconds; Finnhub gives epoch seconds, the RSS tool naive UTC ISO strings."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(datetime.fromisoformat(str(value)).replace(tzinfo=timezone.utc).timestamp())
+    except ValueError:
+        return 0
+
+
+def normalize_item(item: dict, provider: str) -> dict:
+    """An article from either news tool in Finnhub's shape (epoch datetime, source, url, image)."""
+    headline, source = item.get("headline") or "", item.get("source")
+    if provider == "google_news":
+        headline, source = split_source(headline)
+    return {
+        "datetime": _epoch(item.get("datetime")),
+        "headline": headline,
+        "source": source or provider,
+        "url": item.get("url") or item.get("link"),
+        # RSS summaries are HTML snippets
+        "summary": " ".join(_TAG.sub(" ", item.get("summary") or "").split()),
+        "image": item.get("image"),
+    }
+
+
+def _new_state() -> dict:
+    return {
+        "version": SIGNATURE_VERSION,
+        "cursors": {},        # provider -> epoch of the newest item seen
+        "seen": {},           # article identity -> its epoch, so overlapping fetches merge each copy once
+        "stories": {},        # story id -> story (Finnhub item shape plus sources/copies/sentiment/provider)
+        "last_seen": {},      # story id -> epoch of its newest copy, for pruning
+        "members": [],        # story id of every indexed copy, aligned with "signatures"
+        "signatures": np.empty((0, 0), dtype=np.uint32),
+        "next_id": 0,
+        "refreshed_at": 0.0,
+    }
+
+
+def _merge(state: dict, items: list) -> int:
+    """Cluster new (provider, item) pairs into the state's stories; returns how many stories were new."""
+    index = LSHIndex()
+    for signature, story_id in zip(state["signatures"], state["members"]):
+        index.add(signature, story_id)
+
+    new_signatures = signatures([item["headline"] for _, item in items])
+    created = 0
+    for (provider, item), signature in zip(items, new_signatures):
+        story_id = index.add(signature, state["next_id"])
+        story = state["stories"].get(story_id)
+        if story is None:
+            state["next_id"] += 1
+            created += 1
+            state["stories"][story_id] = {**item, "sources": [item["source"]], "copies": 1, "provider": provider}
+            state["last_seen"][story_id] = item["datetime"]
+        else:
+            story["copies"] += 1
+            if item["source"] not in story["sources"]:
+                story["sources"].append(item["source"])
+            # The richest source's copy represents the story, keeping the earliest publish time
+            if _SOURCE_RANK[provider] < _SOURCE_RANK[story["provider"]]:
+                first = min(story["datetime"], item["datetime"])
+                story.update(item, provider=provider, datetime=first)
+            story["datetime"] = min(story["datetime"], item["datetime"])
+            state["last_seen"][story_id] = max(state["last_seen"][story_id], item["datetime"])
+        state["members"].append(story_id)
+
+    if len(new_signatures):
+        stored = state["signatures"] if state["signatures"].size else np.empty((0, new_signatures.shape[1]), dtype=np.uint32)
+        state["signatures"] = np.vstack([stored, new_signatures])
+    return created
+
+
+def _identity(provider: str, item: dict) -> str:
+    return item["url"] or f"{provider}:{item['headline']}"
+
+
+def _prune(state: dict, cutoff: int):
+    seen = state["seen"]
+    for key in [key for key, published in seen.items() if published < cutoff]:
+        del seen[key]
+    expired = {story_id for story_id, seen in state["last_seen"].items() if seen < cutoff}
+    if not expired:
+        return
+    keep = np.array([story_id not in expired for story_id in state["members"]], dtype=bool)
+    state["signatures"] = state["signatures"][keep] if keep.size else state["signatures"]
+    state["members"] = [story_id for story_id in state["members"] if story_id not in expired]
+    for story_id in expired:
+        del state["stories"][story_id]
+        del state["last_seen"][story_id]
+
+
+async def _refresh(ticker: str) -> dict:
+    """Fetch items since each source's cursor, less an overlap, and merge the unseen ones into the ticker's stories."""
+    hit, state = await news_cache.aget(ticker)
+    # State stored under another signature scheme cannot be clustered against; start over
+    state = state if hit and state.get("version") == SIGNATURE_VERSION else _new_state()
+    state.setdefault("seen", {})
+    now = time.time()
+    if now - state["refreshed_at"] < NEWS_REFRESH_SECONDS:
+        return state
+
+    calls = []
+    for provider, news_tool in NEWS_SOURCES:
+        cursor = state["cursors"].get(provider)
+        # Only the days since the newest item seen plus the overlap; both tools take whole days
+        since = None if cursor is None else cursor - NEWS_OVERLAP_HOURS * 3600
+        days = NEWS_WINDOW_DAYS if since is None else min(NEWS_WINDOW_DAYS, max(1, math.ceil((now - since) / 86400)))
+        calls.append(news_tool.ainvoke({"ticker": ticker, "days": days}))
+    results = await asyncio.gather(*calls, return_exceptions=True)
+
+    cutoff = int(now) - NEWS_WINDOW_DAYS * 86400
+    new_items, errors = [], []
+    for (provider, _), result in zip(NEWS_SOURCES, results):
+        if isinstance(result, Exception) or not isinstance(result, dict) or "error" in result:
+            error = result if isinstance(result, Exception) else (result or {}).get("error", "no data")
+            errors.append(f"{provider}: {error}")
+            continue
+        fresh = []
+        for item in (normalize_item(item, provider) for item in result.get("data") or []):
+            if not item["headline"]:
+                continue
+            # An unparseable publish time counts as the moment the item was first seen
+            item["datetime"] = item["datetime"] or int(now)
+            key = _identity(provider, item)
+            if item["datetime"] < cutoff or key in state["seen"]:
+                continue
+            state["seen"][key] = item["datetime"]
+            fresh.append(item)
+        new_items += [(provider, item) for item in sorted(fresh, key=lambda item: item["datetime"])]
+        if fresh:
+            state["cursors"][provider] = max(state["cursors"].get(provider, 0), *(item["datetime"] for item in fresh))
+
+    if len(errors) == len(NEWS_SOURCES) and not state["stories"]:
+        raise RuntimeError("; ".join(errors))
+
+    # Scored once per copy as it arrives; a story keeps the score of its representative copy
+    for (_, item), score in zip(new_items, score_articles([item for _, item in new_items])):
+        item["sentiment"] = round(float(score), 3)
+    created = _merge(state, new_items)
+    _prune(state, cutoff)
+    state["refreshed_at"] = now
+    await news_cache.aset(ticker, state, NEWS_WINDOW_DAYS * 86400)
+    logger.debug("News refreshed", extra={
+        "ticker": ticker, "new_items": len(new_items), "new_stories": created,
+        "stories": len(state["stories"]), "errors": errors,
+    })
+    return state
+
+
+@tool
+@recorded
+async def get_company_news(ticker: str, days: int = 7) -> dict:
+    """
+    Fetch recent news for a NASDAQ ticker from Finnhub and Google News RSS
+    merged, with syndicated copies of the same story collapsed into one
+    article (listing every outlet under "sources"). Each article carries a
+    lexicon sentiment score in [-1, 1] and "sentiment" aggregates them.
+    """
+    logger.debug("Tool called", extra={"tool": "get_company_news"})
+
+    ticker = ticker.strip().upper()
+    try:
+        # Concurrent calls for a ticker share one refresh, so the cursors advance once
+        state = await provider_flight.do(("news", ticker), lambda: _refresh(ticker))
+    except Exception as e:
+        return {"error": f"Failed to fetch news: {e}"}
+
+    cutoff = time.time() - min(days, NEWS_WINDOW_DAYS) * 86400
+    stories = sorted(
+        (story for story_id, story in state["stories"].items() if state["last_seen"][story_id] >= cutoff),
+        key=lambda story: story["datetime"], reverse=True,
+    )
+    return {
+        "data": [{k: v for k, v in story.items() if k != "provider"} for story in stories],
+        "sentiment": aggregate(stories),
+    }
@@ -0,0 +1,134 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+
+from tools.rate_limit import scheduler
+
+logger = logging.getLogger(__name__)
+
+# Hedge budget used until a provider has enough latency samples
+DEFAULT_HEDGE_SECONDS = float(os.getenv("HEDGE_DEFAULT_SECONDS", "2.0"))
+# Never hedge sooner than this, even for very fast providers
+MIN_HEDGE_SECONDS = float(os.getenv("HEDGE_MIN_SECONDS", "0.25"))
+MIN_SAMPLES = 20
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per provider."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(provider, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, provider: str, q: float):
+        with self._lock:
+            samples = sorted(self._samples.get(provider, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def hedge_budget(self, provider: str) -> float:
+        """How long to wait for `provider` before hedging: its p95, or the default."""
+        p95 = self.percentile(provider, 0.95)
+        return DEFAULT_HEDGE_SECONDS if p95 is None else max(MIN_HEDGE_SECONDS, p95)
+
+
+latency_tracker = LatencyTracker()
+
+
+def is_usable(result) -> bool:
+    """A tool result is usable when it is not an error and carries some data."""
+    if not result:
+        return False
+    if isinstance(result, dict):
+        if "error" in result:
+            return False
+        if "data" in result and not result["data"]:
+            return False
+    return True
+
+
+async def hedged_call(candidates: list):
+    """
+    Race `candidates`, a list of (provider, zero-arg coroutine factory) in preference
+    order. The primary starts alone; if it has not produced a usable result within
+    its p95 latency (or fails), the next candidate is started alongside it. The first
+    usable result wins and the others are cancelled.
+
+    A candidate may carry a third element, (rate-limited provider, tokens per call):
+    it is then only hedged into on latency when that provider's bucket can cover the
+    call right now, so a slow primary does not spend a scarce quota. It is still
+    used when the candidates before it fail.
+
+    Returns (provider, result); if nothing usable came back, (None, last_error).
+    """
+    pending = {}
+    next_index = 0
+    last_error = "No provider returned data"
+
+    async def run(provider, factory):
+        started = time.monotonic()
+        result = await factory()
+        if is_usable(result):
+            latency_tracker.record(provider, time.monotonic() - started)
+        return result
+
+    def affordable():
+        quota = candidates[next_index][2:]
+        return not quota or scheduler.can_cover(*quota[0])
+
+    def launch():
+        nonlocal next_index
+        provider, factory = candidates[next_index][:2]
+        next_index += 1
+        pending[asyncio.ensure_future(run(provider, factory))] = provider
+        return provider
+
+    try:
+        hedge_after = latency_tracker.hedge_budget(launch())
+
+        while pending:
+            timeout = hedge_after if next_index < len(candidates) else None
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                if not affordable():
+                    # Not worth the quota for latency alone; wait for the running calls to finish or fail
+                    logger.info("Failover: not hedging into %s, its rate limit cannot cover the call",
+                                candidates[next_index][0])
+                    hedge_after = None
+                    continue
+                # Primary is slower than its p95: hedge with the next provider
+                hedge_after = latency_tracker.hedge_budget(launch())
+                continue
+
+            for task in done:
+                provider = pending.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    result = {"error": str(e)}
+
+                if is_usable(result):
+                    return provider, result
+
+                if isinstance(result, dict) and "error" in result:
+                    last_error = result["error"]
+                logger.warning("Failover: %s returned no data, trying fallback", provider)
+
+            # A failure fails over immediately rather than waiting out the budget
+            if not pending and next_index < len(candidates):
+                hedge_after = latency_tracker.hedge_budget(launch())
+
+        return None, last_error
+    finally:
+        for task in pending:
+            task.cancel()
@@ -1,22 +1,83 @@
 from langchain_core.tools import tool
+import asyncio
+import logging
+import numpy as np
 import pandas as pd
-from pandas_datareader import data as pdr
 import datetime
 from config import FMP_API_KEY
-import requests
+import httpx
+from tools.cache import cached
+from tools.http_client import get_json
+from tools.lazy import lazy_import
+from tools.ohlcv_store import ohlcv_store, to_day, from_day, validate_ticker
+from tools.rate_limit import scheduler
+
+logger = logging.getLogger(__name__)
+
+# Provider SDK, imported on first use
+pdr = lazy_import("pandas_datareader.data")
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def _frame_to_block(df: pd.DataFrame) -> np.ndarray:
+    """Convert a date-indexed OHLCV frame into the store's (6, n) layout."""
+    days = np.array([to_day(ts) for ts in df.index], dtype=float)
+    return np.vstack([days] + [df[col].to_numpy(dtype=float) for col in OHLCV_COLUMNS])
+
+
+def _block_to_frame(block: np.ndarray) -> pd.DataFrame:
+    index = pd.DatetimeIndex([pd.Timestamp(from_day(day)) for day in block[0]], name='Date')
+    return pd.DataFrame({col: block[i + 1] for i, col in enumerate(OHLCV_COLUMNS)}, index=index)
+
+
+async def _read_through_store(source: str, ticker: str, days: int, fetch) -> pd.DataFrame:
+    """
+    Serve a trailing `days` window from the local OHLCV store, calling
+    `fetch(start_date, end_date)` only for date ranges the store does not cover yet.
+    If a fetch fails, the stored bars are served when there are any.
+    """
+    # The ticker names the store's files; reject it before anything is fetched or written
+    ticker = validate_ticker(ticker)
+    end_day = to_day(datetime.date.today())
+    start_day = end_day - days
+
+    fetch_error = None
+    for range_start, range_end in ohlcv_store.missing_ranges(source, ticker, start_day, end_day):
+        try:
+            df = await fetch(from_day(range_start), from_day(range_end))
+        except Exception as e:
+            # Leave the range uncovered so the next call retries it
+            logger.warning("Error while refreshing %s history from %s: %s", ticker, source, e, extra={"ticker": ticker})
+            fetch_error = e
+            continue
+        block = _frame_to_block(df) if df is not None and not df.empty else np.empty((6, 0))
+        ohlcv_store.append(source, ticker, block, range_start, range_end)
+
+    window = ohlcv_store.window(source, ticker, start_day, end_day)
+    if window is None or window.shape[1] == 0:
+        if fetch_error is not None:
+            raise fetch_error
+        raise RuntimeError(f"No data returned for ticker {ticker}.")
+
+    return _block_to_frame(window)
+
 
 @tool
-def get_historical_data_stooq(
-    ticker: str
+@cached("stooq", "historical", "historical")
+async def get_historical_data_stooq(
+    ticker: str,
+    days: int = 182
 ) -> pd.DataFrame:
     """
-    Fetch historical OHLCV data for the past 6 months for a given ticker symbol using the Stooq data source.
+    Fetch historical OHLCV data for the trailing `days` window for a given ticker symbol using the Stooq data source.
 
     Parameters:
         ticker (str): Stock ticker symbol (e.g., 'AAPL').
+        days (int): Lookback window in days (default 182, about 6 months).
 
     Returns:
-        pd.DataFrame: DataFrame indexed by date with columns ['Open', 'High', 'Low', 'Close', 'Volume'] for the past 6 months.
+        pd.DataFrame: DataFrame indexed by date with columns ['Open', 'High', 'Low', 'Close', 'Volume'] for the window.
 
     Raises:
         ImportError: If pandas_datareader is not installed.
@@ -24,49 +85,48 @@ def get_historical_data_stooq(
         RuntimeError: If fetching data fails.
     """
 
-    print("----"*10)
-    print("Tool called: get_historical_data_stooq")
-    print("----"*10)
-
-    # Calculate date range: last 6 months (~182 days)
-    today = datetime.datetime.now()
-    start_date = today - datetime.timedelta(days=182)
-    end_date = today
-
-    try:
-        data = pdr.DataReader(ticker, 'stooq', start_date, end_date)
-    except Exception as e:
-        raise RuntimeError(f"Failed to fetch data for {ticker}: {e}")
-    
-    # Drop incomplete rows
-    data.dropna(how='any', inplace=True)
-    if data.empty:
-        raise RuntimeError(f"No data returned for ticker {ticker}.")
+    logger.debug("Tool called", extra={"tool": "get_historical_data_stooq"})
 
+    async def fetch(start_date, end_date):
+        await scheduler.acquire("stooq")
+        try:
+            # pandas_datareader is blocking; run it on a worker thread
+            data = await asyncio.to_thread(pdr.DataReader, ticker, 'stooq', start_date, end_date)
+        except Exception as e:
+            raise RuntimeError(f"Failed to fetch data for {ticker}: {e}")
 
-    # Stooq returns data in descending order by date; sort ascending
-    data.sort_index(inplace=True)
+        # Drop incomplete rows
+        data.dropna(how='any', inplace=True)
 
-    # Return only relevant OHLCV columns
-    return data[['Open', 'High', 'Low', 'Close', 'Volume']]
+        # Stooq returns data in descending order by date; sort ascending
+        data.sort_index(inplace=True)
+
+        # Keep only relevant OHLCV columns
+        return data[OHLCV_COLUMNS]
+
+    # Only the dates missing from the local store are requested from Stooq
+    return await _read_through_store("stooq", ticker, days, fetch)
 
 
 
 
 @tool
-def get_historical_data_fmp(
+@cached("fmp", "historical", "historical")
+async def get_historical_data_fmp(
     ticker: str,
+    days: int = 183
 ) -> pd.DataFrame:
     """
-    Fetch historical OHLCV data for the past six months for a given ticker symbol
-    using the Financial Modeling Prep API.
+    Fetch historical OHLCV data for the trailing `days` window for a given ticker
+    symbol using the Financial Modeling Prep API.
 
     Parameters:
         ticker (str): Stock ticker symbol (e.g., 'AAPL').
+        days (int): Lookback window in days (default 183, about six months).
 
     Returns:
         pd.DataFrame: DataFrame indexed by date with columns ['Open', 'High', 'Low', 'Close', 'Volume']
-                      for the past six months.
+                      for the window.
 
     Raises:
         ValueError: If ticker is empty.
@@ -82,55 +142,47 @@ def get_historical_data_fmp(
             "FMP API key not provided. Set FMP_API_KEY environment variable or pass `api_key` argument."
         )
 
-    # Calculate date range for past 6 months
-    end_dt = datetime.date.today()
-    start_dt = end_dt - datetime.timedelta(days=183)
-    from_date = start_dt.isoformat()
-    to_date = end_dt.isoformat()
-
-    # Build request URL
-    url = (
-        f"https://financialmodelingprep.com/api/v3/historical-price-full/{ticker}"
-        f"?from={from_date}&to={to_date}&apikey={key}"
-    )
-
-    # Fetch data
-    response = requests.get(url)
-    if response.status_code != 200:
-        raise RuntimeError(
-            f"Failed to fetch data for {ticker}: HTTP {response.status_code}"
-        )
-
-    json_data = response.json()
-    historical = json_data.get('historical')
-    if not historical:
-        raise RuntimeError(
-            f"No historical data found for ticker {ticker} via FMP API."
-        )
-
-    # Convert to DataFrame
-    df = pd.DataFrame(historical)
-    # Ensure required columns exist
-    required_cols = {'date', 'open', 'high', 'low', 'close', 'volume'}
-    if not required_cols.issubset(df.columns):
-        raise RuntimeError(
-            f"Unexpected response format, missing columns: {required_cols - set(df.columns)}"
-        )
-
-    # Rename and reformat
-    df = df.rename(columns={
-        'date': 'Date',
-        'open': 'Open',
-        'high': 'High',
-        'low':  'Low',
-        'close':'Close',
-        'volume':'Volume'
-    })
-    df['Date'] = pd.to_datetime(df['Date'])
-    df.set_index('Date', inplace=True)
-    df.sort_index(inplace=True)
-
-    return df[['Open', 'High', 'Low', 'Close', 'Volume']]
-
-
-
+    async def fetch(start_dt, end_dt):
+        # Build request URL
+        url = f"https://financialmodelingprep.com/api/v3/historical-price-full/{ticker}"
+        params = {"from": start_dt.isoformat(), "to": end_dt.isoformat(), "apikey": key}
+
+        # Fetch data
+        try:
+            json_data = await get_json(url, params=params, provider="fmp")
+        except httpx.HTTPStatusError as e:
+            raise RuntimeError(
+                f"Failed to fetch data for {ticker}: HTTP {e.response.status_code}"
+            )
+
+        # An empty list means no trading days in the range (weekend, holiday)
+        historical = json_data.get('historical') if isinstance(json_data, dict) else None
+        if not historical:
+            return None
+
+        # Convert to DataFrame
+        df = pd.DataFrame(historical)
+        # Ensure required columns exist
+        required_cols = {'date', 'open', 'high', 'low', 'close', 'volume'}
+        if not required_cols.issubset(df.columns):
+            raise RuntimeError(
+                f"Unexpected response format, missing columns: {required_cols - set(df.columns)}"
+            )
+
+        # Rename and reformat
+        df = df.rename(columns={
+            'date': 'Date',
+            'open': 'Open',
+            'high': 'High',
+            'low':  'Low',
+            'close':'Close',
+            'volume':'Volume'
+        })
+        df['Date'] = pd.to_datetime(df['Date'])
+        df.set_index('Date', inplace=True)
+        df.sort_index(inplace=True)
+
+        return df[OHLCV_COLUMNS]
+
+    # Only the dates missing from the local store are requested from FMP
+    return await _read_through_store("fmp", ticker, days, fetch)
@@ -0,0 +1,93 @@
+import os
+import asyncio
+from urllib.parse import urlsplit
+
+import httpx
+
+from tools.rate_limit import scheduler
+
+# Connection pool shared by every provider call
+HTTP_TIMEOUT = httpx.Timeout(float(os.getenv("HTTP_TIMEOUT_SECONDS", "10")), connect=5.0)
+HTTP_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=30.0,
+)
+# Max concurrent in-flight requests to a single provider host
+PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "10"))
+
+_client = None
+_client_loop = None
+_host_semaphores = {}
+# Transport for new clients; None uses httpx's own (the network)
+_transport = None
+
+
+def set_transport(transport: httpx.AsyncBaseTransport):
+    """Send provider requests through `transport` (e.g. the offline stubs) from the next client on."""
+    global _transport, _client
+    _transport = transport
+    _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the process-wide AsyncClient, creating it on first use.
+    The pool is bound to the running event loop, so a new loop gets a new client.
+    """
+    global _client, _client_loop
+
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=HTTP_LIMITS,
+            follow_redirects=True,
+            transport=_transport,
+        )
+        _client_loop = loop
+        _host_semaphores.clear()
+    return _client
+
+
+async def close_http_client():
+    """Close the shared client and release its pooled connections."""
+    global _client, _client_loop
+
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+    _host_semaphores.clear()
+
+
+def _host_semaphore(url: str) -> asyncio.Semaphore:
+    host = urlsplit(url).netloc
+    if host not in _host_semaphores:
+        _host_semaphores[host] = asyncio.Semaphore(PER_HOST_LIMIT)
+    return _host_semaphores[host]
+
+
+async def http_get(url: str, params: dict = None, provider: str = None, cost: float = 1) -> httpx.Response:
+    """
+    GET `url` through the shared pool. Waits for `provider`'s rate limiter first,
+    then honours the per-host concurrency limit.
+    """
+    if provider:
+        await scheduler.acquire(provider, cost)
+
+    client = get_http_client()
+    async with _host_semaphore(url):
+        response = await client.get(url, params=params)
+    response.raise_for_status()
+    return response
+
+
+async def get_json(url: str, params: dict = None, provider: str = None, cost: float = 1):
+    response = await http_get(url, params=params, provider=provider, cost=cost)
+    return response.json()
+
+
+async def get_text(url: str, params: dict = None, provider: str = None, cost: float = 1) -> str:
+    response = await http_get(url, params=params, provider=provider, cost=cost)
+    return response.text
@@ -0,0 +1,285 @@
+"""
+Vectorized technical indicators computed locally from OHLCV arrays.
+
+Every function works along the last axis, so the same code handles a single
+ticker (1-D arrays of shape (dates,)) and a whole universe (2-D arrays of shape
+(tickers, dates)). Warm-up positions are NaN. Definitions follow TA-Lib, which
+is what Twelve Data and Alpha Vantage compute server-side.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Column names used by Twelve Data's `as_json()` output (and plotted by streamlit_app.py)
+TWELVEDATA_COLUMNS = [
+    "rsi", "sma", "cci",
+    "upper_band", "middle_band", "lower_band",
+    "ema", "adx", "slow_k", "slow_d",
+    "aroon_down", "aroon_up",
+]
+
+
+def _positions(x: np.ndarray) -> np.ndarray:
+    return np.arange(x.shape[-1])
+
+
+def _pad_front(values: np.ndarray, window: int) -> np.ndarray:
+    """Left-pad a windowed result with NaN so it lines up with the input dates."""
+    pad = np.full(values.shape[:-1] + (window - 1,), np.nan)
+    return np.concatenate([pad, values], axis=-1)
+
+
+def _linear_recursion(x: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    Solve y[t] = (1 - alpha) * y[t-1] + alpha * x[t] with y[-1] = 0 along the last axis.
+
+    Uses the closed form y[k] = d^(k+1) * (y[-1] + alpha * cumsum(x[i] / d^(i+1)))
+    with d = 1 - alpha, evaluated in blocks short enough that d^block stays well
+    inside float64 range.
+    """
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        return alpha * x
+
+    n = x.shape[-1]
+    block = max(1, int(np.log(1e-100) / np.log(decay)))
+    out = np.empty(x.shape, dtype=float)
+    prev = np.zeros(x.shape[:-1])
+
+    for start in range(0, n, block):
+        chunk = x[..., start:start + block]
+        powers = decay ** np.arange(1, chunk.shape[-1] + 1)
+        out[..., start:start + chunk.shape[-1]] = powers * (
+            prev[..., None] + alpha * np.cumsum(chunk / powers, axis=-1)
+        )
+        prev = out[..., start + chunk.shape[-1] - 1]
+
+    return out
+
+
+def _seeded_ewm(x: np.ndarray, period: int, alpha: float, seed: np.ndarray = None) -> np.ndarray:
+    """
+    Exponential smoothing seeded with the simple average of the first `period`
+    valid values (the TA-Lib convention for EMA and Wilder smoothing), or at the
+    first finite value of `seed` when given.
+    """
+    seed = sma(x, period) if seed is None else seed
+    valid = np.isfinite(seed)
+    has_seed = valid.any(axis=-1)[..., None]
+    first = valid.argmax(axis=-1)[..., None]
+
+    pos = _positions(x)
+    is_seed = (pos == first) & has_seed
+    after = (pos > first) & has_seed
+
+    # Dividing the seed by alpha makes the recursion reproduce it exactly at `first`
+    with np.errstate(invalid="ignore"):
+        driven = np.where(is_seed, seed / alpha, np.where(after, x, 0.0))
+    out = _linear_recursion(driven, alpha)
+    return np.where(is_seed | after, out, np.nan)
+
+
+def _shift(x: np.ndarray, periods: int = 1) -> np.ndarray:
+    out = np.full(x.shape, np.nan)
+    out[..., periods:] = x[..., :-periods]
+    return out
+
+
+def sma(x: np.ndarray, period: int) -> np.ndarray:
+    """Simple moving average; NaN until `period` valid values are in the window."""
+    x = np.asarray(x, dtype=float)
+    finite = np.isfinite(x)
+    zero_filled = np.where(finite, x, 0.0)
+
+    csum = np.cumsum(zero_filled, axis=-1)
+    ccount = np.cumsum(finite, axis=-1)
+    csum[..., period:] = csum[..., period:] - csum[..., :-period]
+    ccount[..., period:] = ccount[..., period:] - ccount[..., :-period]
+
+    return np.where(ccount == period, csum / period, np.nan)
+
+
+def rolling_std(x: np.ndarray, period: int) -> np.ndarray:
+    """Population standard deviation over a rolling window."""
+    x = np.asarray(x, dtype=float)
+    # Variance is shift-invariant; centering first avoids cancellation in E[x^2] - E[x]^2
+    with np.errstate(all="ignore"):
+        reference = np.nanmean(x, axis=-1, keepdims=True)
+    centered = x - np.nan_to_num(reference)
+    mean = sma(centered, period)
+    mean_sq = sma(centered * centered, period)
+    return np.sqrt(np.clip(mean_sq - mean * mean, 0.0, None))
+
+
+def rolling_max(x: np.ndarray, period: int) -> np.ndarray:
+    x = np.asarray(x, dtype=float)
+    if x.shape[-1] < period:
+        return np.full(x.shape, np.nan)
+    return _pad_front(sliding_window_view(x, period, axis=-1).max(axis=-1), period)
+
+
+def rolling_min(x: np.ndarray, period: int) -> np.ndarray:
+    x = np.asarray(x, dtype=float)
+    if x.shape[-1] < period:
+        return np.full(x.shape, np.nan)
+    return _pad_front(sliding_window_view(x, period, axis=-1).min(axis=-1), period)
+
+
+def ema(x: np.ndarray, period: int = 14) -> np.ndarray:
+    """Exponential moving average, alpha = 2 / (period + 1), SMA-seeded."""
+    return _seeded_ewm(np.asarray(x, dtype=float), period, 2.0 / (period + 1))
+
+
+def wilder(x: np.ndarray, period: int = 14) -> np.ndarray:
+    """Wilder's smoothing (alpha = 1 / period), SMA-seeded."""
+    return _seeded_ewm(np.asarray(x, dtype=float), period, 1.0 / period)
+
+
+def _wilder_running_sum(x: np.ndarray, period: int) -> np.ndarray:
+    """
+    Wilder smoothing as TA-Lib applies it to +DM, -DM and true range in ADX: a
+    running sum seeded with the first `period - 1` values, first output one
+    value later. Returned divided by `period`, which the DI ratios cancel.
+    """
+    seed = sma(x, period - 1) * ((period - 1) / period)
+    out = _seeded_ewm(x, period, 1.0 / period, seed)
+    # The seed itself is not an output value
+    return np.where(np.isfinite(_shift(out)), out, np.nan)
+
+
+def rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    """Relative Strength Index with Wilder smoothing."""
+    close = np.asarray(close, dtype=float)
+    change = close - _shift(close)
+    gain = wilder(np.where(change > 0, change, np.where(np.isnan(change), np.nan, 0.0)), period)
+    loss = wilder(np.where(change < 0, -change, np.where(np.isnan(change), np.nan, 0.0)), period)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = 100.0 - 100.0 / (1.0 + gain / loss)
+    # No losses in the window means RSI is pinned at 100
+    return np.where((loss == 0) & np.isfinite(gain), 100.0, value)
+
+
+def bbands(close: np.ndarray, period: int = 20, stddev: float = 2.0):
+    """Bollinger Bands: (upper, middle, lower) around an SMA."""
+    middle = sma(close, period)
+    width = stddev * rolling_std(close, period)
+    return middle + width, middle, middle - width
+
+
+def stoch(high, low, close, fast_k_period: int = 14, slow_k_period: int = 1, slow_d_period: int = 3):
+    """Stochastic oscillator: (slow_k, slow_d) with SMA smoothing."""
+    close = np.asarray(close, dtype=float)
+    highest = rolling_max(high, fast_k_period)
+    lowest = rolling_min(low, fast_k_period)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fast_k = 100.0 * (close - lowest) / (highest - lowest)
+    fast_k = np.where(highest == lowest, 0.0, fast_k)
+    fast_k = np.where(np.isnan(highest), np.nan, fast_k)
+
+    slow_k = sma(fast_k, slow_k_period) if slow_k_period > 1 else fast_k
+    slow_d = sma(slow_k, slow_d_period)
+    return slow_k, slow_d
+
+
+def cci(high, low, close, period: int = 20) -> np.ndarray:
+    """Commodity Channel Index over the typical price."""
+    typical = (np.asarray(high, dtype=float) + np.asarray(low, dtype=float) + np.asarray(close, dtype=float)) / 3.0
+    if typical.shape[-1] < period:
+        return np.full(typical.shape, np.nan)
+
+    mean = sma(typical, period)
+    windows = sliding_window_view(typical, period, axis=-1)
+    mean_dev = np.abs(windows - mean[..., period - 1:, None]).mean(axis=-1)
+    mean_dev = _pad_front(mean_dev, period)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = (typical - mean) / (0.015 * mean_dev)
+    return np.where(mean_dev == 0, 0.0, value)
+
+
+def adx(high, low, close, period: int = 14) -> np.ndarray:
+    """Average Directional Index (TA-Lib seeding; `period` must be at least 2)."""
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+
+    up = high - _shift(high)
+    down = _shift(low) - low
+    missing = np.isnan(up) | np.isnan(down)
+    plus_dm = np.where(missing, np.nan, np.where((up > down) & (up > 0), up, 0.0))
+    minus_dm = np.where(missing, np.nan, np.where((down > up) & (down > 0), down, 0.0))
+
+    prev_close = _shift(close)
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    true_range = np.where(np.isnan(prev_close), np.nan, true_range)
+
+    atr = _wilder_running_sum(true_range, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # No range at all leaves both DIs at 0, like TA-Lib
+        plus_di = np.where(atr == 0, 0.0, 100.0 * _wilder_running_sum(plus_dm, period) / atr)
+        minus_di = np.where(atr == 0, 0.0, 100.0 * _wilder_running_sum(minus_dm, period) / atr)
+        di_sum = plus_di + minus_di
+        dx = np.where(di_sum == 0, 0.0, 100.0 * np.abs(plus_di - minus_di) / di_sum)
+    dx = np.where(np.isnan(di_sum), np.nan, dx)
+
+    return wilder(dx, period)
+
+
+def aroon(high, low, period: int = 14):
+    """Aroon oscillator lines: (aroon_down, aroon_up)."""
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    window = period + 1
+    if high.shape[-1] < window:
+        empty = np.full(high.shape, np.nan)
+        return empty, empty.copy()
+
+    # Reverse each window so argmax/argmin count periods since the most recent extreme
+    since_high = sliding_window_view(high, window, axis=-1)[..., ::-1].argmax(axis=-1)
+    since_low = sliding_window_view(low, window, axis=-1)[..., ::-1].argmin(axis=-1)
+
+    aroon_up = _pad_front(100.0 * (period - since_high) / period, window)
+    aroon_down = _pad_front(100.0 * (period - since_low) / period, window)
+    return aroon_down, aroon_up
+
+
+def compute_indicators(open_, high, low, close, volume=None, period: int = 14) -> dict:
+    """
+    Compute every indicator the technical tools request, keyed by Twelve Data column names.
+    `period` matches the `time_period=14` the remote tools use.
+    """
+    upper, middle, lower = bbands(close, period)
+    slow_k, slow_d = stoch(high, low, close)
+    aroon_down, aroon_up = aroon(high, low, period)
+
+    return {
+        "rsi":         rsi(close, period),
+        "sma":         sma(close, period),
+        "cci":         cci(high, low, close, period),
+        "upper_band":  upper,
+        "middle_band": middle,
+        "lower_band":  lower,
+        "ema":         ema(close, period),
+        "adx":         adx(high, low, close, period),
+        "slow_k":      slow_k,
+        "slow_d":      slow_d,
+        "aroon_down":  aroon_down,
+        "aroon_up":    aroon_up,
+    }
+
+
+def to_twelvedata_rows(dates, indicators: dict, outputsize: int = 100) -> list:
+    """
+    Format 1-D indicator arrays like Twelve Data's `as_json()`: newest row first,
+    one dict per date with a "datetime" key. NaN warm-up values become None.
+    """
+    rows = []
+    n = len(dates)
+    for i in range(n - 1, max(n - outputsize, 0) - 1, -1):
+        row = {"datetime": str(dates[i])[:10]}
+        for name in TWELVEDATA_COLUMNS:
+            value = indicators[name][i]
+            row[name] = round(float(value), 5) if np.isfinite(value) else None
+        rows.append(row)
+    return rows
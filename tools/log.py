@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import uuid
+import queue
+import time
+import random
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" (one object per line) or "text"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Fraction of requests whose full payloads (state, response data) are logged
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+# Longest payload string written to the log; the rest is cut off
+LOG_MAX_PAYLOAD_CHARS = int(os.getenv("LOG_MAX_PAYLOAD_CHARS", "2000"))
+
+# Correlation id of the request (or job) the current task is working for
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
+# Whether the current request was picked for payload dumps
+_sampled: ContextVar[bool] = ContextVar("log_sampled", default=False)
+
+# Attributes every LogRecord has; anything else came from `extra=` and is logged as a field
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+# Libraries that log every HTTP request at INFO
+QUIET_LOGGERS = ("httpx", "httpcore", "urllib3")
+
+_listener = None
+
+logger = logging.getLogger("api.access")
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def start_request(rid: str = None) -> str:
+    """Bind a correlation id to the current task and decide whether it is sampled."""
+    rid = rid or new_request_id()
+    request_id.set(rid)
+    _sampled.set(random.random() < LOG_SAMPLE_RATE)
+    return rid
+
+
+def current_context() -> tuple:
+    """Correlation id and sampling decision of the current task, to carry into another task."""
+    return request_id.get(), _sampled.get()
+
+
+def bind_context(context: tuple):
+    rid, sampled = context
+    request_id.set(rid)
+    _sampled.set(sampled)
+
+
+def truncate(value, limit: int = None) -> str:
+    """`value` as a string of at most `limit` chars (LOG_MAX_PAYLOAD_CHARS by default)."""
+    limit = LOG_MAX_PAYLOAD_CHARS if limit is None else limit
+    text = value if isinstance(value, str) else json.dumps(value, default=str, ensure_ascii=False)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}…(+{len(text) - limit} chars)"
+
+
+def log_payload(logger: logging.Logger, message: str, **payloads):
+    """
+    Log large payloads (full state, response data) for sampled requests only,
+    truncated, or for every request when the logger is at DEBUG.
+    """
+    if not (_sampled.get() or logger.isEnabledFor(logging.DEBUG)):
+        return
+    logger.info(message, extra={name: truncate(value) for name, value in payloads.items()})
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record):
+        text = super().format(record)
+        fields = {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS and not k.startswith("_")}
+        return f"{text} {fields}" if fields else text
+
+
+def configure_logging():
+    """
+    Send the app's logs through a QueueHandler so request handlers never block
+    on stdout; a background QueueListener thread does the formatting and writing.
+    Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    records = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    # Read the context variable in the calling task, before the record is queued
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+
+    _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=False)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestLogMiddleware:
+    """
+    ASGI middleware giving each HTTP request a correlation id (the client's
+    X-Request-ID, or a new one), echoing it in the response and logging one
+    access line when the response is complete.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        rid = start_request(headers.get(b"x-request-id", b"").decode("latin-1")[:64] or None)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", rid.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            logger.info("%s %s %s", scope["method"], scope["path"], status, extra={
+                "status": status,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            })
@@ -0,0 +1,154 @@
+import time
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import Counter, Gauge, Histogram
+
+# Seconds; wide enough for cached tool calls (ms) up to full agent runs and LLM summaries (minutes)
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+# Which part of the analysis the LLM calls made from the current task belong to
+llm_caller: ContextVar[str] = ContextVar("llm_caller", default="other")
+
+
+class Outcome:
+    """Handed to the body of `Stage.time`; set `failed` for errors reported as return values."""
+
+    def __init__(self):
+        self.failed = False
+
+
+class Stage:
+    """
+    Latency histogram, error counter and in-flight gauge for one kind of
+    operation, e.g. `provider_request_duration_seconds{provider, endpoint}`.
+    """
+
+    def __init__(self, name: str, description: str, labels: list):
+        self.duration = Histogram(f"{name}_duration_seconds", f"{description} latency in seconds",
+                                  labels, buckets=LATENCY_BUCKETS)
+        self.errors = Counter(f"{name}_errors", f"{description} failures", labels)
+        self.in_flight = Gauge(f"{name}_in_flight", f"{description}s in progress", labels)
+
+    def start(self, **labels) -> float:
+        self.in_flight.labels(**labels).inc()
+        return time.perf_counter()
+
+    def finish(self, started: float, failed: bool = False, cancelled: bool = False, **labels):
+        self.in_flight.labels(**labels).dec()
+        # Cancelled calls (e.g. the losing side of a hedge) say nothing about latency
+        if cancelled:
+            return
+        self.duration.labels(**labels).observe(time.perf_counter() - started)
+        if failed:
+            self.errors.labels(**labels).inc()
+
+    @contextmanager
+    def time(self, **labels):
+        outcome = Outcome()
+        started = self.start(**labels)
+        cancelled = False
+        try:
+            yield outcome
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception:
+            outcome.failed = True
+            raise
+        finally:
+            self.finish(started, outcome.failed, cancelled, **labels)
+
+
+PROVIDER = Stage("provider_request", "Upstream provider call (cache misses only)", ["provider", "endpoint"])
+SUB_AGENT = Stage("sub_agent", "Sub-agent run", ["section"])
+LLM = Stage("llm_request", "LLM call", ["model", "caller"])
+GRAPH_NODE = Stage("graph_node", "Graph node", ["mode", "node"])
+HTTP = Stage("http_request", "HTTP request", ["method", "route"])
+HTTP_RESPONSES = Counter("http_responses", "HTTP responses by status code", ["method", "route", "status"])
+
+
+def timed_node(mode: str, name: str, node):
+    """Wrap an async graph node so its runs are recorded under GRAPH_NODE."""
+    async def wrapper(state):
+        with GRAPH_NODE.time(mode=mode, node=name):
+            return await node(state)
+
+    wrapper.__name__ = node.__name__
+    return wrapper
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """LangChain callback recording every chat model call under LLM, labelled by model and `llm_caller`."""
+
+    # Called on the event loop rather than a worker thread, so `llm_caller` is the caller's
+    run_inline = True
+
+    def __init__(self):
+        self._running = {}
+
+    def _start(self, run_id, kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = (kwargs.get("metadata") or {}).get("ls_model_name") or params.get("model") or params.get("model_name") or "unknown"
+        labels = {"model": model, "caller": llm_caller.get()}
+        self._running[run_id] = (LLM.start(**labels), labels)
+
+    def _finish(self, run_id, failed: bool):
+        started, labels = self._running.pop(run_id, (None, None))
+        if started is not None:
+            LLM.finish(started, failed, **labels)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, failed=False)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, failed=not isinstance(error, asyncio.CancelledError))
+
+
+llm_metrics = LLMMetricsHandler()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording every HTTP request under HTTP, labelled by route
+    template (so /jobs/{job_id} is one series). Streaming responses are timed
+    until their last chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = 500
+        # The route is only known once routing ran, so in-flight is tracked per method
+        in_flight = HTTP.in_flight.labels(method=method, route="*")
+        in_flight.inc()
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP.duration.labels(method=method, route=route).observe(time.perf_counter() - started)
+            HTTP_RESPONSES.labels(method=method, route=route, status=str(status)).inc()
+            if status >= 500:
+                HTTP.errors.labels(method=method, route=route).inc()
@@ -0,0 +1,99 @@
+import os
+import re
+import zlib
+
+import numpy as np
+
+# MinHash signature length, split into LSH bands of NEWS_LSH_ROWS rows. With 32 bands of
+# 4 rows, pairs with Jaccard similarity 0.8 become candidates ~100% of the time, 0.3 ~23%.
+NUM_PERM = 128
+NEWS_LSH_ROWS = 4
+# Estimated Jaccard similarity of headline shingles above which two items are the same story
+NEWS_DEDUP_THRESHOLD = float(os.getenv("NEWS_DEDUP_THRESHOLD", "0.8"))
+# Word n-gram length. Character shingles scored distinct stories that differ in one token
+# ("Q2"/"Q3", "Apple"/"Microsoft", "$90B"/"$110B") as near-duplicates; a changed word breaks two bigrams
+SHINGLE_WORDS = 2
+
+# Stored signatures are only comparable with the same scheme; bump when shingling or permutations change
+SIGNATURE_VERSION = 2
+
+_MASK = np.uint64(0xFFFFFFFF)
+# Fixed seed: signatures are stored between calls (and shared between workers), so the
+# permutations must not change from one process to the next
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, 2**32, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2**32, NUM_PERM, dtype=np.uint64)
+
+# Google News appends " - <Publisher>" to every headline
+_SOURCE_SUFFIX = re.compile(r"\s+-\s+([^-]{2,60})$")
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def split_source(headline: str) -> tuple:
+    """("Headline", "Publisher") from a Google News "Headline - Publisher" title."""
+    match = _SOURCE_SUFFIX.search(headline or "")
+    if not match:
+        return (headline or "").strip(), None
+    return headline[:match.start()].strip(), match.group(1).strip()
+
+
+def _shingles(text: str) -> np.ndarray:
+    words = _NON_WORD.sub(" ", (text or "").lower()).split()
+    if len(words) <= SHINGLE_WORDS:
+        grams = {" ".join(words)}
+    else:
+        grams = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    return np.array([zlib.crc32(g.encode()) for g in grams], dtype=np.uint64)
+
+
+def signatures(texts: list) -> np.ndarray:
+    """MinHash signatures (len(texts), NUM_PERM) as uint32, one row per text."""
+    out = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+    for i, text in enumerate(texts):
+        # (shingles, permutations) universal hashes a*x + b mod 2^32, minimum per permutation
+        hashed = (np.outer(_shingles(text), _A) + _B) & _MASK
+        out[i] = hashed.min(axis=0)
+    return out
+
+
+class LSHIndex:
+    """
+    Banded LSH over MinHash signatures: items sharing any band are candidates,
+    and a candidate whose estimated Jaccard similarity (share of equal
+    signature positions) reaches `threshold` joins its cluster.
+    """
+
+    def __init__(self, threshold: float = NEWS_DEDUP_THRESHOLD, rows: int = NEWS_LSH_ROWS):
+        self.threshold = threshold
+        self.rows = rows
+        self._buckets = {}
+        self._signatures = []
+        self._clusters = []
+
+    def _bands(self, signature: np.ndarray):
+        for band in range(NUM_PERM // self.rows):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, signature: np.ndarray, cluster: int = None) -> int:
+        """
+        Index `signature` and return its cluster: the cluster of the most similar
+        candidate above the threshold, else `cluster` (or a new id).
+        """
+        candidates = {i for key in self._bands(signature) for i in self._buckets.get(key, ())}
+        best, best_similarity = None, self.threshold
+        for i in candidates:
+            similarity = float(np.mean(self._signatures[i] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = i, similarity
+
+        if best is not None:
+            cluster = self._clusters[best]
+        elif cluster is None:
+            cluster = max(self._clusters, default=-1) + 1
+
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        self._clusters.append(cluster)
+        for key in self._bands(signature):
+            self._buckets.setdefault(key, []).append(index)
+        return cluster
@@ -0,0 +1,163 @@
+import os
+import re
+import json
+import datetime
+import tempfile
+import threading
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within one process
+    fcntl = None
+
+import numpy as np
+
+# Row layout of every stored array: one contiguous row per field (columnar)
+FIELDS = ["Date", "Open", "High", "Low", "Close", "Volume"]
+EPOCH = datetime.date(1970, 1, 1)
+# Tickers become file names, so anything outside this set (path separators, "..") is rejected
+TICKER_PATTERN = re.compile(r"^[A-Z0-9.\-^=]{1,15}$")
+
+
+def validate_ticker(ticker: str) -> str:
+    """Upper-cased `ticker`; raises ValueError unless it matches TICKER_PATTERN."""
+    symbol = (ticker or "").strip().upper()
+    if not TICKER_PATTERN.match(symbol):
+        raise ValueError(f"Invalid ticker symbol: {ticker!r}")
+    return symbol
+
+
+def to_day(value) -> int:
+    """Convert a date/datetime/Timestamp to days since the Unix epoch."""
+    if hasattr(value, "date") and callable(value.date):
+        value = value.date()
+    return (value - EPOCH).days
+
+
+def from_day(day: int) -> datetime.date:
+    return EPOCH + datetime.timedelta(days=int(day))
+
+
+class OHLCVStore:
+    """
+    Local columnar OHLCV store: one `.npy` array of shape (6, n) per source and
+    ticker, sorted by date and read back memory-mapped. A JSON sidecar records
+    the date range already requested from the provider, so ranges with no
+    trading days (weekends, pre-IPO) are not fetched again.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _paths(self, source: str, ticker: str):
+        base = os.path.join(self.root, source, validate_ticker(ticker))
+        return base + ".npy", base + ".json"
+
+    @contextlib.contextmanager
+    def _write_lock(self, data_path: str):
+        """Serialize writers of one ticker across threads and worker processes."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(data_path[:-len(".npy")] + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read(self, source: str, ticker: str):
+        """Return the stored (6, n) array memory-mapped, or None."""
+        data_path, _ = self._paths(source, ticker)
+        if not os.path.exists(data_path):
+            return None
+        return np.load(data_path, mmap_mode="r")
+
+    def coverage(self, source: str, ticker: str):
+        """Return the (first_day, last_day) range already fetched, or None."""
+        _, meta_path = self._paths(source, ticker)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return meta["from"], meta["to"]
+
+    def missing_ranges(self, source: str, ticker: str, start_day: int, end_day: int) -> list:
+        """
+        Day ranges in [start_day, end_day] that still have to be fetched. The last
+        covered day is always refetched, since its bar may have been intraday.
+        """
+        covered = self.coverage(source, ticker)
+        if covered is None:
+            return [(start_day, end_day)]
+
+        first, last = covered
+        ranges = []
+        if start_day < first:
+            ranges.append((start_day, first - 1))
+        if end_day >= last:
+            ranges.append((last, end_day))
+        return ranges
+
+    def append(self, source: str, ticker: str, block: np.ndarray, start_day: int, end_day: int):
+        """
+        Merge a (6, m) block fetched for [start_day, end_day] into the store.
+        Rows in the new block replace stored rows with the same date.
+        """
+        data_path, meta_path = self._paths(source, ticker)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+
+        # The whole read-merge-write holds the lock, so a concurrent writer in another
+        # worker cannot drop these rows while its coverage claims them
+        with self._write_lock(data_path):
+            existing = self.read(source, ticker)
+            if existing is not None and existing.shape[1]:
+                keep = ~np.isin(existing[0], block[0])
+                merged = np.concatenate([np.asarray(existing[:, keep]), block], axis=1)
+            else:
+                merged = np.asarray(block, dtype=float)
+            merged = merged[:, np.argsort(merged[0], kind="stable")]
+
+            covered = self.coverage(source, ticker)
+            if covered is not None:
+                start_day = min(start_day, covered[0])
+                end_day = max(end_day, covered[1])
+
+            # Write to temp files and swap in, so readers never see a partial array. The data
+            # goes first, so the coverage never claims days the array does not hold yet.
+            self._replace(data_path, ".tmp.npy", lambda f: np.save(f, merged))
+            self._replace(meta_path, ".tmp", lambda f: f.write(
+                json.dumps({"from": int(start_day), "to": int(end_day)}).encode()))
+
+    @staticmethod
+    def _replace(path: str, suffix: str, write):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=suffix)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def window(self, source: str, ticker: str, start_day: int, end_day: int):
+        """Return the stored (6, k) slice with start_day <= date <= end_day, or None."""
+        data = self.read(source, ticker)
+        if data is None:
+            return None
+        lo, hi = np.searchsorted(data[0], [start_day, end_day + 1])
+        return np.asarray(data[:, lo:hi])
+
+    def tickers(self, source: str) -> list:
+        directory = os.path.join(self.root, source)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-4] for name in os.listdir(directory)
+                      if name.endswith(".npy") and not name.endswith(".tmp.npy") and not name.startswith("tmp"))
+
+
+ohlcv_store = OHLCVStore(os.getenv("OHLCV_STORE_DIR", os.path.join("data", "ohlcv")))
@@ -0,0 +1,132 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from contextvars import ContextVar
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# Priority of provider calls made from the current request/task
+request_priority: ContextVar[int] = ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+# Give up instead of queueing when the estimated wait exceeds this, so callers fall back
+MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "30"))
+
+
+def _per_minute(provider: str, default: int) -> int:
+    return int(os.getenv(f"RATE_LIMIT_{provider.upper()}_PER_MIN", str(default)))
+
+
+# Calls per minute allowed by each provider's plan
+PROVIDER_LIMITS = {
+    "alpha_vantage": _per_minute("alpha_vantage", 5),
+    "twelvedata":    _per_minute("twelvedata", 8),
+    "finnhub":       _per_minute("finnhub", 60),
+    "fmp":           _per_minute("fmp", 300),
+    "google_news":   _per_minute("google_news", 60),
+    "yfinance":      _per_minute("yfinance", 120),
+    "stooq":         _per_minute("stooq", 60),
+}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a provider's queue is too long to wait for."""
+
+
+class TokenBucket:
+    """
+    Token bucket with a priority queue of waiters. Requests are granted in
+    (priority, arrival) order as tokens refill, so interactive calls overtake
+    queued background work instead of racing it.
+    """
+
+    def __init__(self, provider: str, per_minute: int):
+        self.provider = provider
+        self.capacity = max(1, per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._waiters = []
+        self._counter = itertools.count()
+        self._dispatcher = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def queue_depth(self) -> int:
+        return sum(1 for *_, future in self._waiters if not future.done())
+
+    def _estimated_wait(self, cost: float, priority: int) -> float:
+        ahead = sum(c for p, _, c, future in self._waiters if p <= priority and not future.done())
+        deficit = ahead + cost - self.tokens
+        return max(0.0, deficit / self.rate) if self.rate else float("inf")
+
+    def can_cover(self, cost: float) -> bool:
+        """True if `cost` tokens are available right now, with nobody queued ahead."""
+        self._refill()
+        return not self.queue_depth() and self.tokens >= min(cost, self.capacity)
+
+    async def acquire(self, cost: float = 1, priority: int = None):
+        cost = min(cost, self.capacity)
+        priority = request_priority.get() if priority is None else priority
+        self._refill()
+
+        if not self.queue_depth() and self.tokens >= cost:
+            self.tokens -= cost
+            return
+
+        wait = self._estimated_wait(cost, priority)
+        if wait > MAX_WAIT_SECONDS:
+            raise RateLimitExceeded(
+                f"{self.provider} rate limit: estimated wait {wait:.0f}s exceeds {MAX_WAIT_SECONDS:.0f}s"
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), cost, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        while self._waiters:
+            _, _, cost, future = self._waiters[0]
+            if future.done():
+                # Waiter was cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+
+            self._refill()
+            if self.tokens >= cost:
+                heapq.heappop(self._waiters)
+                self.tokens -= cost
+                future.set_result(None)
+            else:
+                await asyncio.sleep((cost - self.tokens) / self.rate)
+
+
+class ProviderScheduler:
+    """Per-provider token buckets that every outbound provider call goes through."""
+
+    def __init__(self, limits: dict):
+        self._buckets = {provider: TokenBucket(provider, per_minute) for provider, per_minute in limits.items()}
+
+    async def acquire(self, provider: str, cost: float = 1, priority: int = None):
+        bucket = self._buckets.get(provider)
+        if bucket is not None:
+            await bucket.acquire(cost, priority)
+
+    def can_cover(self, provider: str, cost: float = 1) -> bool:
+        """Whether `provider`'s bucket could grant `cost` tokens without waiting (always True if unlimited)."""
+        bucket = self._buckets.get(provider)
+        return bucket is None or bucket.can_cover(cost)
+
+    def queue_depth(self) -> dict:
+        return {provider: bucket.queue_depth() for provider, bucket in self._buckets.items()}
+
+
+scheduler = ProviderScheduler(PROVIDER_LIMITS)
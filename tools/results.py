@@ -0,0 +1,36 @@
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# (tool name, result) of every recorded tool call made in the current collection scope
+_collector: ContextVar = ContextVar("tool_results", default=None)
+
+
+@contextmanager
+def collect_tool_results():
+    """
+    Collect the parsed results of @recorded tools called inside the block,
+    including from tasks it spawns (e.g. a ReAct agent's tool calls).
+    """
+    results = []
+    token = _collector.set(results)
+    try:
+        yield results
+    finally:
+        _collector.reset(token)
+
+
+def recorded(func):
+    """
+    Decorator (apply below `@tool`) that hands the tool's return value to the
+    active collector, before LangChain serializes it into a ToolMessage.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        result = await func(*args, **kwargs)
+        results = _collector.get()
+        if results is not None:
+            results.append((func.__name__, result))
+        return result
+
+    return wrapper
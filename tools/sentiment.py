@@ -0,0 +1,174 @@
+import os
+import re
+import time
+
+import numpy as np
+
+# Weight of the headline relative to the summary when scoring an article
+HEADLINE_WEIGHT = 2.0
+# Lexicon hits within this many tokens after a negator ("not", "no", "fails to") count reversed
+NEGATION_WINDOW = 3
+# Scores are total / sqrt(total^2 + alpha): one plain hit is ~0.24, four ~0.72
+NORMALIZATION_ALPHA = 16.0
+# |score| below this is neutral
+NEUTRAL_BAND = float(os.getenv("SENTIMENT_NEUTRAL_BAND", "0.1"))
+# Older articles count less in a ticker's aggregate: weight halves every this many hours
+SENTIMENT_HALF_LIFE_HOURS = float(os.getenv("SENTIMENT_HALF_LIFE_HOURS", "48"))
+
+# Finance lexicon in the spirit of Loughran-McDonald: words that read neutral in
+# general English ("liability", "cut", "beat") carry their market meaning here.
+# 2.0 marks strong words.
+_POSITIVE = {
+    1.0: """
+        beat beats beating exceed exceeds exceeded exceeding outperform outperforms outperformed
+        upgrade upgrades upgraded gain gains gained rise rises rising rose rally rallies rallied
+        growth grow grows grew growing expand expands expanded expansion profit profits profitable
+        profitability strong stronger strongest strength robust improve improves improved improvement
+        record high higher highs boost boosts boosted upbeat optimistic optimism bullish buy
+        outperform overweight accelerate accelerates accelerating momentum recover recovers recovered
+        recovery rebound rebounds rebounded win wins won award awarded approval approved approves
+        launch launches launched partnership partner deal agreement dividend buyback buybacks
+        repurchase raise raises raised hike hikes innovative innovation breakthrough leading leader
+        success successful successfully efficient efficiency benefit benefits positive opportunity
+        opportunities demand surpass surpasses surpassed top tops topped climb climbs climbed
+        advance advances advanced attractive favorable stable stability resilient resilience
+        upside confident confidence milestone
+    """,
+    2.0: """
+        soar soars soared soaring surge surges surged surging skyrocket skyrockets skyrocketed
+        jump jumps jumped blowout stellar outstanding exceptional blockbuster
+    """,
+}
+_NEGATIVE = {
+    1.0: """
+        miss misses missed missing downgrade downgrades downgraded fall falls fell falling drop
+        drops dropped decline declines declined declining slip slips slipped slide slides slid
+        lose loses losing lost loss losses weak weaker weakest weakness cut cuts cutting lower
+        lowered lowers low lows concern concerns concerned worry worries worried risk risks risky
+        uncertain uncertainty volatile volatility bearish sell underperform underperforms
+        underperformed underweight slowdown slow slows slowed slowing delay delays delayed
+        lawsuit lawsuits sue sues sued litigation probe probes investigation investigations
+        penalty penalties fined recall recalls recalled layoff layoffs restructuring
+        shortfall disappoint disappoints disappointed disappointing warning warns warned warn
+        headwind headwinds pressure pressures challenge challenges challenging struggle struggles
+        struggled struggling debt liability liabilities impairment writedown downturn deficit
+        negative fail fails failed failure halt halts halted suspend suspended resign resigns
+        resigned outage breach downside ban banned tariff tariffs sanctions dispute
+        pessimistic glut
+    """,
+    2.0: """
+        plunge plunges plunged plunging plummet plummets plummeted crash crashes crashed tumble
+        tumbles tumbled collapse collapses collapsed sink sinks sank slump slumps slumped
+        bankruptcy bankrupt insolvency default defaults defaulted fraud scandal crisis
+        investigated subpoena delisting selloff
+    """,
+}
+_NEGATORS = """
+    not no never without neither nor cannot isnt wasnt arent werent dont doesnt didnt wont
+    hardly barely fails avoid avoids avoided
+"""
+
+_TOKEN = re.compile(r"[a-z]+")
+_APOSTROPHE = re.compile(r"['’]")
+
+
+def _build():
+    vocab, weights = {}, [0.0]
+    for sign, groups in ((1.0, _POSITIVE), (-1.0, _NEGATIVE)):
+        for weight, words in groups.items():
+            for word in words.split():
+                vocab[word] = len(weights)
+                weights.append(sign * weight)
+    negators = set(_NEGATORS.split())
+    for word in negators - vocab.keys():
+        vocab[word] = len(weights)
+        weights.append(0.0)
+    is_negator = np.zeros(len(weights), dtype=bool)
+    is_negator[[vocab[word] for word in negators]] = True
+    return vocab, np.array(weights), is_negator
+
+
+# Token id 0 is every word outside the lexicon
+_VOCAB, _WEIGHTS, _IS_NEGATOR = _build()
+
+
+def _totals(texts: list) -> np.ndarray:
+    """Signed lexicon total per text, negation applied; one array pass over all tokens."""
+    ids = [[_VOCAB.get(token, 0) for token in _TOKEN.findall(_APOSTROPHE.sub("", (text or "").lower()))]
+           for text in texts]
+    lengths = np.fromiter((len(row) for row in ids), dtype=np.int64, count=len(ids))
+    flat = np.fromiter((i for row in ids for i in row), dtype=np.int64, count=int(lengths.sum()))
+    doc = np.repeat(np.arange(len(ids)), lengths)
+    # Position of each token within its text, so negation does not leak across texts
+    position = np.arange(flat.size) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    negator = _IS_NEGATOR[flat]
+    negated = np.zeros(flat.size, dtype=bool)
+    for lag in range(1, NEGATION_WINDOW + 1):
+        negated[lag:] |= negator[:-lag] & (position[lag:] >= lag)
+
+    weights = np.where(negated, -_WEIGHTS[flat], _WEIGHTS[flat])
+    return np.bincount(doc, weights=weights, minlength=len(ids))
+
+
+def _normalize(totals: np.ndarray) -> np.ndarray:
+    return totals / np.sqrt(totals ** 2 + NORMALIZATION_ALPHA)
+
+
+def score_texts(texts: list) -> np.ndarray:
+    """Sentiment in [-1, 1] per text."""
+    return _normalize(_totals(texts))
+
+
+def score_articles(items: list) -> np.ndarray:
+    """Sentiment in [-1, 1] per news item, from its headline (weighted) and summary, in one batch."""
+    n = len(items)
+    totals = _totals([item.get("headline") for item in items] + [item.get("summary") for item in items])
+    return _normalize(HEADLINE_WEIGHT * totals[:n] + totals[n:])
+
+
+def label(score: float) -> str:
+    if score >= NEUTRAL_BAND:
+        return "positive"
+    if score <= -NEUTRAL_BAND:
+        return "negative"
+    return "neutral"
+
+
+def article_scores(items: list) -> np.ndarray:
+    """Each item's "sentiment" score, scoring the items without one (e.g. from the per-source tools) in one batch."""
+    scores = np.array([item.get("sentiment", np.nan) for item in items], dtype=float)
+    missing = np.isnan(scores)
+    if missing.any():
+        scores[missing] = score_articles([item for item, m in zip(items, missing) if m])
+    return scores
+
+
+def aggregate(items: list, scores: np.ndarray = None, now: float = None) -> dict:
+    """
+    A ticker's sentiment from its news items: the mean article score weighted by
+    recency (SENTIMENT_HALF_LIFE_HOURS) and by how many outlets carried the
+    story ("copies"), plus article counts per label.
+    """
+    if not items:
+        return {"score": None, "label": None, "articles": 0, "positive": 0, "negative": 0, "neutral": 0}
+
+    scores = article_scores(items) if scores is None else scores
+    now = time.time() if now is None else now
+    # Undated items (epoch 0, non-numeric) get the weight of a fresh article
+    published = np.array([item.get("datetime") if isinstance(item.get("datetime"), (int, float)) else now
+                          for item in items], dtype=float)
+    published[published <= 0] = now
+    age_hours = np.clip(now - published, 0, None) / 3600
+    copies = np.array([item.get("copies", 1) for item in items], dtype=float)
+    weights = copies * 0.5 ** (age_hours / SENTIMENT_HALF_LIFE_HOURS)
+
+    score = float(np.dot(weights, scores) / weights.sum())
+    return {
+        "score": round(score, 3),
+        "label": label(score),
+        "articles": len(items),
+        "positive": int((scores >= NEUTRAL_BAND).sum()),
+        "negative": int((scores <= -NEUTRAL_BAND).sum()),
+        "neutral": int((np.abs(scores) < NEUTRAL_BAND).sum()),
+    }
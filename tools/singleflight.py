@@ -0,0 +1,29 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent async calls that share a key: the first caller starts the
+    work, later callers attach to the same in-flight task and receive its result
+    (or exception). The key is released as soon as the task finishes.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key, func):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._release(key, t))
+
+        # Shield so one waiter being cancelled does not cancel the shared work
+        return await asyncio.shield(task)
+
+    def _release(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def __len__(self):
+        return len(self._inflight)
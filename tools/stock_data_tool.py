@@ -1,56 +1,89 @@
 from langchain_core.tools import tool
-import yfinance as yf
-import requests
+import asyncio
+import logging
+from typing import Dict, List
 from config import FMP_API_KEY
+from tools.cache import cached, alookup, astore
+from tools.http_client import get_json
+from tools.lazy import lazy_import
+from tools.rate_limit import scheduler
+from tools.results import recorded
+
+logger = logging.getLogger(__name__)
+
+# Provider SDK, imported on first use
+yf = lazy_import("yfinance")
+
+# Max symbols per comma-separated FMP quote request
+FMP_QUOTE_BATCH_SIZE = 100
+
+YF_KEYS = [
+    'dayHigh', 'dayLow', 'previousClose', 'open', 'close',
+    'volume', 'lastPrice', 'lastVolume', 'marketCap', 'shares',
+    'yearHigh', 'yearLow', 'yearChange'
+]
+
+
+def _fetch_fast_info_yf(ticker_symbol: str) -> dict:
+    # Fetch the ticker data
+    stock_info = yf.Ticker(ticker_symbol).fast_info
+
+    result = {}
+    for key in YF_KEYS:
+        try:
+            # getattr will call fast.__getattr__(key) internally
+            value = getattr(stock_info, key)
+        except (AttributeError, KeyError):
+            # if the scraper didn’t provide that field
+            value = None
+        result[key] = value
+
+    return result
+
 
 @tool
+@recorded
+@cached("yfinance", "fast_info", "quote")
 async def get_stock_info_yf(ticker_symbol: str) -> dict:
     """
     Fetches key stock information for the given ticker using yfinance.
     """
-    print("----"*10)
-    print("Tool called: get_stock_info_yf")
-    print("----"*10)
+    logger.debug("Tool called", extra={"tool": "get_stock_info_yf"})
 
     try:
-        keys = [
-        'dayHigh', 'dayLow', 'previousClose', 'open', 'close',
-        'volume', 'lastPrice', 'lastVolume', 'marketCap', 'shares',
-        'yearHigh', 'yearLow', 'yearChange'
-    ]
-
-        # Fetch the ticker data
-        stock = yf.Ticker(ticker_symbol)
-        stock_info = stock.fast_info
-
-        result = {}
-        for key in keys:
-            try:
-                # getattr will call fast.__getattr__(key) internally
-                value = getattr(stock_info, key)
-            except (AttributeError, KeyError):
-                # if the scraper didn’t provide that field
-                value = None
-            result[key] = value
-        
-        return result
+        await scheduler.acquire("yfinance")
+        # yfinance is blocking; run it on a worker thread so the event loop keeps going
+        return await asyncio.to_thread(_fetch_fast_info_yf, ticker_symbol)
     except Exception as e:
-        print(f"Error while getting stock data from yfinance: {e}")
+        logger.warning("Error while getting stock data from yfinance: %s", e, extra={"ticker": ticker_symbol})
         return {"error": str(e)}
 
 @tool
-def get_stock_info_fmp(symbol: str) -> dict:
+@recorded
+@cached("fmp", "quote", "quote")
+async def get_stock_info_fmp(symbol: str) -> dict:
     """
     Fetches key stock information for the given ticker using financialmodelingprep.
     """
-    print("----"*10)
-    print("Tool called: get_stock_info_fmp")
-    print("----"*10)
+    logger.debug("Tool called", extra={"tool": "get_stock_info_fmp"})
 
     url = f'https://financialmodelingprep.com/api/v3/quote/{symbol}'
     params = {'apikey': FMP_API_KEY}
-    q = requests.get(url, params=params).json()[0]
+    try:
+        quotes = await get_json(url, params=params, provider="fmp")
+    except Exception as e:
+        logger.warning("Error while getting stock data from financialmodelingprep: %s", e, extra={"ticker": symbol})
+        return {"error": str(e)}
 
+    # Unknown symbols come back as [], plan and key errors as {"Error Message": ...}
+    if not isinstance(quotes, list) or not quotes:
+        return {"error": f"No quote returned for {symbol}"}
+
+    return _quote_from_fmp(quotes[0])
+
+
+def _quote_from_fmp(q: dict) -> dict:
+    """Map an FMP quote record onto the stock-data keys used across the app."""
     prev = q.get('previousClose')
     last = q.get('price')
 
@@ -68,4 +101,96 @@ def get_stock_info_fmp(symbol: str) -> dict:
         'yearHigh':     q.get('yearHigh'),
         'yearLow':      q.get('yearLow'),
         'yearChange':   q.get('changesPercentage') / 100 if q.get('changesPercentage') else None
-    }
\ No newline at end of file
+    }
+
+
+def _quote_from_yf_history(frame) -> dict:
+    """Build the quote keys from one symbol's daily bars (oldest first) of a year-long download."""
+    frame = frame.dropna(subset=["Close"])
+    if frame.empty:
+        raise ValueError("no bars returned")
+    last = frame.iloc[-1]
+    close = float(last["Close"])
+    first_close = float(frame["Close"].iloc[0])
+    return {
+        'dayHigh':       float(last["High"]),
+        'dayLow':        float(last["Low"]),
+        'previousClose': float(frame["Close"].iloc[-2]) if len(frame) > 1 else None,
+        'open':          float(last["Open"]),
+        'close':         close,
+        'volume':        float(last["Volume"]),
+        'lastPrice':     close,
+        'lastVolume':    float(last["Volume"]),
+        # Not in the price history
+        'marketCap':     None,
+        'shares':        None,
+        'yearHigh':      float(frame["High"].max()),
+        'yearLow':       float(frame["Low"].min()),
+        'yearChange':    close / first_close - 1 if first_close else None,
+    }
+
+
+def _fetch_fast_info_yf_batch(symbols: List[str]) -> Dict[str, dict]:
+    # One download request for every symbol; a year of bars also gives the 52-week fields
+    history = yf.download(symbols, period="1y", group_by="ticker", threads=False,
+                          progress=False, auto_adjust=False)
+
+    quotes = {}
+    for symbol in symbols:
+        try:
+            quotes[symbol] = _quote_from_yf_history(history[symbol])
+        except Exception as e:
+            # A bad symbol only drops itself from the batch
+            logger.warning("No yfinance quote for %s: %s", symbol, e)
+
+    return quotes
+
+
+async def _fetch_quotes_fmp(symbols: List[str]) -> Dict[str, dict]:
+    url = f'https://financialmodelingprep.com/api/v3/quote/{",".join(symbols)}'
+    records = await get_json(url, params={'apikey': FMP_API_KEY}, provider="fmp")
+    return {q['symbol'].upper(): _quote_from_fmp(q) for q in records or [] if q.get('symbol')}
+
+
+async def get_stock_quotes(symbols: List[str]) -> Dict[str, dict]:
+    """
+    Fetch quotes for many tickers at once, returning {symbol: quote} with the same
+    per-ticker dict as `get_stock_info_fmp`. Cached quotes are reused; the rest are
+    fetched from FMP in comma-separated chunks, and any symbols FMP misses fall back
+    to one yfinance `download` request. Symbols no provider returned are left out.
+    """
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+
+    quotes = {}
+    pending = []
+    cached_quotes = await asyncio.gather(*(alookup("fmp", "quote", get_stock_info_fmp.coroutine, symbol)
+                                           for symbol in symbols))
+    for symbol, (hit, value) in zip(symbols, cached_quotes):
+        if hit:
+            quotes[symbol] = value
+        else:
+            pending.append(symbol)
+
+    chunks = [pending[i:i + FMP_QUOTE_BATCH_SIZE] for i in range(0, len(pending), FMP_QUOTE_BATCH_SIZE)]
+    results = await asyncio.gather(*(_fetch_quotes_fmp(chunk) for chunk in chunks), return_exceptions=True)
+    fetched = {}
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, Exception):
+            logger.warning("Error while getting batch quotes from financialmodelingprep: %s", result)
+            continue
+        fetched.update((symbol, quote) for symbol, quote in result.items() if symbol in chunk)
+    quotes.update(fetched)
+    # Prime the per-ticker cache so single-ticker calls hit it too
+    await asyncio.gather(*(astore("fmp", "quote", "quote", get_stock_info_fmp.coroutine, quote, symbol)
+                           for symbol, quote in fetched.items()))
+
+    missing = [symbol for symbol in pending if symbol not in quotes]
+    if missing:
+        try:
+            await scheduler.acquire("yfinance")
+            fallback = await asyncio.to_thread(_fetch_fast_info_yf_batch, missing)
+            quotes.update(fallback)
+        except Exception as e:
+            logger.warning("Error while getting batch quotes from yfinance: %s", e)
+
+    return {symbol: quotes[symbol] for symbol in symbols if symbol in quotes}
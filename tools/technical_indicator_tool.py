@@ -1,64 +1,125 @@
 from langchain_core.tools import tool
-from alpha_vantage.techindicators import TechIndicators
-from twelvedata import TDClient, exceptions
+import asyncio
+import logging
+import threading
+import httpx
 from requests.exceptions import RequestException
 from config import ALPHA_VANTAGE_API_KEY, TWELVEDATA_API_KEY
+from tools.cache import cached
+from tools.http_client import get_json
+from tools.lazy import lazy_import
+from tools.rate_limit import scheduler
+from tools.results import recorded
+from tools.historical_data_tool import get_historical_data_fmp, get_historical_data_stooq
+from tools.indicators import compute_indicators, to_twelvedata_rows
+
+logger = logging.getLogger(__name__)
+
+# Provider SDK, imported on first use
+twelvedata = lazy_import("twelvedata")
+
+# Alpha Vantage indicator function -> extra query params
+ALPHA_VANTAGE_INDICATORS = {
+    "RSI":    {"time_period": 14, "series_type": "close"},
+    "SMA":    {"time_period": 14, "series_type": "close"},
+    "EMA":    {"time_period": 14, "series_type": "close"},
+    "STOCH":  {},
+    "ADX":    {"time_period": 14},
+    "CCI":    {"time_period": 14},
+    "BBANDS": {"time_period": 14, "series_type": "close"},
+    "AROON":  {"time_period": 14, "series_type": "close"},
+}
+
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
+
+# Indicators chained onto the Twelve Data time series request below
+TWELVEDATA_INDICATOR_COUNT = 8
+
+_td_client = None
+_td_client_lock = threading.Lock()
+
+
+def get_td_client():
+    """
+    Shared Twelve Data client, so its requests session keeps connections alive.
+    Building one is blocking and costs a round trip (it fetches endpoint metadata).
+    """
+    global _td_client
+    with _td_client_lock:
+        if _td_client is None:
+            _td_client = twelvedata.TDClient(apikey=TWELVEDATA_API_KEY)
+    return _td_client
+
 
 @tool
+@recorded
+@cached("alpha_vantage", "indicators", "indicators")
 async def get_technical_indicators_alpha_vantage_tool(ticker: str) -> dict:
     """
     Fetch RSI, SMA, EMA, and STOCH indicators for the given NASDAQ ticker using Alpha Vantage API.
     """
-    print("----"*10)
-    print("Tool called: get_technical_indicators_alpha_vantage_tool")
-    print("----"*10)
+    logger.debug("Tool called", extra={"tool": "get_technical_indicators_alpha_vantage_tool"})
+
+    # Helper to fetch and handle indicator data
+    async def safe_fetch(name, extra_params):
+        params = {
+            "function": name,
+            "symbol": ticker,
+            "interval": "monthly",
+            "apikey": ALPHA_VANTAGE_API_KEY,
+            **extra_params,
+        }
+        try:
+            # Paced as one batch below, not per call
+            payload = await get_json(ALPHA_VANTAGE_URL, params=params)
+        except httpx.HTTPError as he:
+            logger.warning("Network error while fetching %s for %s: %s", name, ticker, he)
+            return None
+        except Exception as ex:
+            logger.warning("Error while fetching %s for %s: %s", name, ticker, ex)
+            return None
+
+        data = payload.get(f"Technical Analysis: {name}")
+        if not data:
+            # Rate-limit notes and errors come back as "Note"/"Information"/"Error Message"
+            logger.warning("No data or access issue for %s of %s", name, ticker)
+            return None
+        return data
 
     try:
-        ti = TechIndicators(key=ALPHA_VANTAGE_API_KEY, output_format='pandas')
-        indicators = {}
-
-        # Helper to fetch and handle indicator data
-        def safe_fetch(fetch_func, name, *args, **kwargs):
-            try:
-                data, meta = fetch_func(*args, **kwargs)
-                if data.empty or "Note" in meta.get("Information", "") or "Error Message" in meta.get("Information", ""):
-                    print(f"Warning: No data or access issue for {name} of {ticker}")
-                    return None
-                return data
-            except RequestException as re:
-                print(f"Network error while fetching {name} for {ticker}: {re}")
-                return None
-            except Exception as ex:
-                print(f"Error while fetching {name} for {ticker}: {ex}")
-                return None
-
-        # Fetch each indicator with error handling
-        indicators["RSI"] = safe_fetch(ti.get_rsi, "RSI", symbol=ticker, interval='monthly', time_period=14, series_type='close')
-        indicators["SMA"] = safe_fetch(ti.get_sma, "SMA", symbol=ticker, interval='monthly', time_period=14, series_type='close')
-        indicators["EMA"] = safe_fetch(ti.get_ema, "EMA", symbol=ticker, interval='monthly', time_period=14, series_type='close')
-        indicators["STOCH"] = safe_fetch(ti.get_stoch, "STOCH", symbol=ticker, interval='monthly',)
-        indicators["ADX"] = safe_fetch(ti.get_adx, "ADX", symbol=ticker, interval='monthly', time_period=14)
-        indicators["CCI"] = safe_fetch(ti.get_cci, "CCI", symbol=ticker, interval='monthly', time_period=14)
-        indicators["BBANDS"] = safe_fetch(ti.get_bbands, "BBANDS", symbol=ticker, interval='monthly', time_period=14, series_type='close')
-        indicators["AROON"] = safe_fetch(ti.get_aroon, "AROON", symbol=ticker, interval='monthly', time_period=14, series_type='close')
+        # Take the whole batch's tokens at once (capped at the bucket), so no single
+        # indicator call times out in the rate limiter and is dropped
+        await scheduler.acquire("alpha_vantage", cost=len(ALPHA_VANTAGE_INDICATORS))
+
+        # Fetch every indicator concurrently over the shared connection pool
+        results = await asyncio.gather(*(
+            safe_fetch(name, extra_params)
+            for name, extra_params in ALPHA_VANTAGE_INDICATORS.items()
+        ))
+        indicators = dict(zip(ALPHA_VANTAGE_INDICATORS, results))
+
+        # A partial set is an error, so it is not cached and failover moves on
+        missing = [name for name, data in indicators.items() if data is None]
+        if missing:
+            return {"error": f"Alpha Vantage returned no data for {', '.join(missing)}"}
 
         return {"data": indicators}
 
     except Exception as e:
-        print(f"General error in fetching indicators for {ticker}: {e}")
+        logger.warning("General error in fetching indicators for %s: %s", ticker, e)
         return {"error": str(e)}
 
 @tool
+@recorded
+@cached("twelvedata", "indicators", "indicators")
 async def get_technical_indicators_twelvedata_tool(ticker: str) -> dict:
     """
     Fetch daily OHLC, volume, RSI, SMA and MACD for a given NASDAQ ticker via Twelve Data.
     """
-    print("----"*10)
-    print("Tool called: get_technical_indicators_twelvedata_tool")
-    print("----"*10)
+    logger.debug("Tool called", extra={"tool": "get_technical_indicators_twelvedata_tool"})
 
     try:
-        td = TDClient(apikey=TWELVEDATA_API_KEY)
+        td = await asyncio.to_thread(get_td_client)
 
         # Build the time series request and chain indicators
         ts = (
@@ -77,13 +138,50 @@ async def get_technical_indicators_twelvedata_tool(ticker: str) -> dict:
             .with_aroon(time_period=14, )
         ).without_ohlc()
 
-        # Execute and get JSON-serializable data
-        data = ts.as_json()
+        # Each chained indicator costs a Twelve Data credit
+        await scheduler.acquire("twelvedata", cost=TWELVEDATA_INDICATOR_COUNT)
+        # The Twelve Data SDK is blocking; execute it on a worker thread
+        data = await asyncio.to_thread(ts.as_json)
         return {"data": data}
 
-    except exceptions.TwelveDataError as e:
+    except twelvedata.exceptions.TwelveDataError as e:
         return {"error": f"Twelve Data API error: {e}"}
     except RequestException as e:
         return {"error": f"Network error: {e}"}
     except Exception as e:
         return {"error": f"Unexpected error: {e}"}
+
+
+@tool
+@recorded
+@cached("local", "indicators", "indicators")
+async def get_technical_indicators_local_tool(ticker: str) -> dict:
+    """
+    Compute daily RSI, SMA, EMA, STOCH, ADX, CCI, BBANDS and AROON for a given NASDAQ ticker
+    locally from one historical OHLCV fetch. Output rows use the Twelve Data column names.
+    """
+    logger.debug("Tool called", extra={"tool": "get_technical_indicators_local_tool"})
+
+    # One OHLCV fetch feeds every indicator; FMP first, Stooq as fallback
+    ohlcv = None
+    for historical_tool in (get_historical_data_fmp, get_historical_data_stooq):
+        try:
+            ohlcv = await historical_tool.ainvoke({"ticker": ticker})
+            break
+        except Exception as e:
+            logger.warning("Error while fetching OHLCV from %s for %s: %s", historical_tool.name, ticker, e)
+
+    if ohlcv is None or ohlcv.empty:
+        return {"error": f"No OHLCV data available for {ticker}"}
+
+    try:
+        indicators = compute_indicators(
+            ohlcv["Open"].to_numpy(dtype=float),
+            ohlcv["High"].to_numpy(dtype=float),
+            ohlcv["Low"].to_numpy(dtype=float),
+            ohlcv["Close"].to_numpy(dtype=float),
+            ohlcv["Volume"].to_numpy(dtype=float),
+        )
+        return {"data": to_twelvedata_rows(ohlcv.index, indicators, outputsize=100)}
+    except Exception as e:
+        return {"error": f"Failed to compute indicators: {e}"}
@@ -1,20 +1,102 @@
 from langgraph.graph import StateGraph, Graph
-from typing import TypedDict, Dict, Any
-from langchain_core.messages import HumanMessage
+from typing import TypedDict, Dict, Any, Optional
+from langchain_core.messages import HumanMessage, SystemMessage
 import asyncio
+import logging
+import os
+
+from tools.stock_data_tool import get_stock_info_fmp, get_stock_info_yf
+from tools.company_news_tool import get_company_news
+from tools.technical_indicator_tool import (
+    get_technical_indicators_local_tool,
+    get_technical_indicators_twelvedata_tool,
+    get_technical_indicators_alpha_vantage_tool,
+    ALPHA_VANTAGE_INDICATORS, TWELVEDATA_INDICATOR_COUNT,
+)
+from tools.company_fundamentals_tool import get_fundamentals_finnhub
+from digest import build_digest, format_section, summary_key
+from tools.cache import summary_cache, SUMMARY_TTL_SECONDS, refresh_lease
+from tools.failover import hedged_call, is_usable
+from tools.results import collect_tool_results
+from tools.metrics import SUB_AGENT, llm_caller, timed_node
+from tools.lazy import lazy_object
+from tools.log import log_payload
+
+logger = logging.getLogger(__name__)
+
+# The agent modules build the chat model (langchain_openai) when imported;
+# defer that to the first request that needs an agent
+stock_price_agent = lazy_object("agents.stock_price_agent", "stock_price_agent")
+company_news_agent = lazy_object("agents.company_news_agent", "company_news_agent")
+financial_data_agent = lazy_object("agents.financial_agent", "financial_data_agent")
+company_fundamental_agent = lazy_object("agents.company_fundamental_agent", "company_fundamental_agent")
+orchestrator_agent = lazy_object("agents.orchestrator_agent", "orchestrator_agent")
+orchestrator_llm = lazy_object("agents.llm", "llm")
+
+
+def load_agents():
+    """Import the agent modules now rather than on the first request."""
+    for agent in (stock_price_agent, company_news_agent, financial_data_agent,
+                  company_fundamental_agent, orchestrator_agent, orchestrator_llm):
+        agent.load()
+
+# "agents": ReAct sub-agents pick the tools; "direct": tools are called in code
+ANALYSIS_MODES = ("agents", "direct")
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "agents")
+
+# Provider fallback order per state section, as (tool, name of its ticker argument, provider).
+# Mirrors the order the sub-agent prompts ask for.
+SECTION_TOOLS = {
+    "stock_data": [
+        (get_stock_info_fmp, "symbol", "fmp"),
+        (get_stock_info_yf, "ticker_symbol", "yfinance"),
+    ],
+    "news_data": [
+        # Finnhub and Google News RSS merged, near-duplicate stories collapsed
+        (get_company_news, "ticker", "merged"),
+    ],
+    "technical_data": [
+        (get_technical_indicators_local_tool, "ticker", "local"),
+        (get_technical_indicators_twelvedata_tool, "ticker", "twelvedata"),
+        (get_technical_indicators_alpha_vantage_tool, "ticker", "alpha_vantage"),
+    ],
+    "company_data": [
+        (get_fundamentals_finnhub, "ticker", "finnhub"),
+    ],
+}
+
+# Rate-limit tokens one tool call spends per provider (default 1); direct mode only
+# hedges into a provider on latency when its bucket can cover the whole call
+PROVIDER_CALL_COSTS = {
+    "twelvedata":    TWELVEDATA_INDICATOR_COUNT,
+    "alpha_vantage": len(ALPHA_VANTAGE_INDICATORS),
+}
+
+# Tool name -> provider that serves it
+TOOL_PROVIDERS = {tool.name: provider for tools in SECTION_TOOLS.values() for tool, _, provider in tools}
+
+# Sub-agent and request message per state section
+SUB_AGENTS = {
+    "stock_data":     (stock_price_agent, "Get stock data for {ticker}"),
+    "news_data":      (company_news_agent, "Get news for {ticker}"),
+    "technical_data": (financial_data_agent, "Get technical indicators for {ticker}"),
+    "company_data":   (company_fundamental_agent, "Get company fundamentals for {ticker}"),
+}
+
+class SectionResult(TypedDict, total=False):
+    """Parsed output of the tool that served a section, or why none did."""
+    tool: str        # e.g. "get_stock_info_yf"
+    provider: str    # e.g. "yfinance"
+    data: Any        # the tool's return value, as returned (not re-parsed)
+    error: str
 
-from agents.stock_price_agent import stock_price_agent
-from agents.company_news_agent import company_news_agent
-from agents.financial_agent import financial_data_agent
-from agents.company_fundamental_agent import company_fundamental_agent 
-from agents.orchestrator_agent import orchestrator_agent
 
 class FinancialAnalysisState(TypedDict):
     ticker: str
-    stock_data: Dict[str, Any]
-    news_data: Dict[str, Any]
-    technical_data: Dict[str, Any]
-    company_data: Dict[str, Any]
+    stock_data: SectionResult
+    news_data: SectionResult
+    technical_data: SectionResult
+    company_data: SectionResult
     final_summary: str
 
 # Define workflow nodes
@@ -23,138 +105,263 @@ async def orchestrator_node(state: FinancialAnalysisState) -> FinancialAnalysisS
     ticker = state['ticker']
     
     try:
-        print(f"🎯 Orchestrator Agent: Starting parallel analysis for {ticker}")
-        
-        # Create tasks for parallel execution of all 4 sub-agents
-
-        stock_task = stock_price_agent.ainvoke({
-            "messages": [HumanMessage(content=f"Get stock data for {ticker}")]
-        })
-        
-        news_task = company_news_agent.ainvoke({
-            "messages": [HumanMessage(content=f"Get news for {ticker}")]
-        })
-        
+        logger.info("Orchestrator Agent: Running 4 sub-agents in parallel", extra={"ticker": ticker})
 
-        technical_task = financial_data_agent.ainvoke({
-            "messages": [HumanMessage(content=f"Get technical indicators for {ticker}")]
-        })
-
-        company_task = company_fundamental_agent.ainvoke({
-            "messages": [HumanMessage(content=f"Get company fundamentals for {ticker}")]
-        })
-        
-        # Execute all sub-agents in parallel
-        print(f"🔄 Orchestrator Agent: Running 4 sub-agents in parallel...")
-        stock_result, news_result, technical_result, company_result = await asyncio.gather(
-            stock_task, news_task, technical_task, company_task, return_exceptions=True
+        # Execute all 4 sub-agents in parallel
+        sections = list(SUB_AGENTS)
+        results = await asyncio.gather(
+            *(_run_sub_agent(ticker, section) for section in sections), return_exceptions=True
         )
-        
+
         # Handle results and store in state
-        state["stock_data"] = stock_result if not isinstance(stock_result, Exception) else {"error": str(stock_result)}
-        state["news_data"] = news_result if not isinstance(news_result, Exception) else {"error": str(news_result)}
-        state["technical_data"] = technical_result if not isinstance(technical_result, Exception) else {"error": str(technical_result)}
-        state["company_data"] = company_result if not isinstance(company_result, Exception) else {"error": str(company_result)}
-        
-        print(f"✅ Orchestrator Agent: All sub-agents completed")
+        for section, result in zip(sections, results):
+            state[section] = result if not isinstance(result, Exception) else {"error": str(result)}
         
-        print("----"*10)
-        print('state["stock_data"]')
-        print("----"*10)
-        print(state["stock_data"])
-        print("\n"*5)
-
-
-        print("----"*10)
-        print('state["news_data"]')
-        print("----"*10)
-        print(state["news_data"])
-        print("\n"*5)
-
-        print("----"*10)
-        print('state["technical_data"]')
-        print("----"*10)
-        print(state["technical_data"])
-        print("\n"*5)
-
-        print("----"*10)
-        print('state["company_data"]')
-        print("----"*10)
-        print(state["company_data"])
-        print("\n"*5)
+        logger.info("Orchestrator Agent: All sub-agents completed", extra={"ticker": ticker})
+        log_payload(logger, "Orchestrator Agent: Section results", **{section: state[section] for section in sections})
 
         return state
         
     except Exception as e:
-        print(f"❌ Orchestrator Agent: Error in parallel execution - {str(e)}")
+        logger.exception("Orchestrator Agent: Error in parallel execution", extra={"ticker": ticker})
         state["stock_data"] = {"error": f"Failed to fetch stock data: {str(e)}"}
         state["news_data"] = {"error": f"Failed to fetch news: {str(e)}"}
         state["technical_data"] = {"error": f"Failed to fetch technical data: {str(e)}"}
         state["company_data"] = {"error": f"Failed to fetch company fundamentals: {str(e)}"}
         return state
 
-async def final_summary_node(state: FinancialAnalysisState) -> FinancialAnalysisState:
-    """Node where orchestrator agent provides final comprehensive summary"""
+def _section_result(tool_name: Optional[str], result: Any) -> SectionResult:
+    if tool_name is None:
+        return {"error": result}
+    section_result: SectionResult = {"tool": tool_name, "provider": TOOL_PROVIDERS.get(tool_name, tool_name)}
+    if is_usable(result):
+        section_result["data"] = result
+    else:
+        section_result["error"] = result.get("error", "No data returned") if isinstance(result, dict) else "No data returned"
+    return section_result
+
+
+async def _run_sub_agent(ticker: str, section: str) -> SectionResult:
+    """
+    Run the section's sub-agent and keep the parsed output of the tools it
+    called: the last usable result wins, otherwise the last error.
+    """
+    agent, request = SUB_AGENTS[section]
+    section_tools = {tool.name for tool, _, _ in SECTION_TOOLS[section]}
+    llm_caller.set(section)
+
+    with SUB_AGENT.time(section=section) as outcome:
+        with collect_tool_results() as results:
+            await agent.ainvoke({
+                "messages": [HumanMessage(content=request.format(ticker=ticker))]
+            })
+        section_result = _pick_result([(name, result) for name, result in results if name in section_tools])
+        outcome.failed = "error" in section_result
+    return section_result
+
+
+def _pick_result(calls: list) -> SectionResult:
+    for name, result in reversed(calls):
+        if is_usable(result):
+            return _section_result(name, result)
+    if calls:
+        return _section_result(*calls[-1])
+    return {"error": "Sub-agent did not call any tool"}
+
+
+async def _fetch_section(ticker: str, section: str) -> SectionResult:
+    """
+    Race the section's tools in fallback order (hedging a slow primary, failing
+    over on errors) and keep the winning tool's result.
+    """
+    candidates = [
+        (tool.name, lambda tool=tool, arg_name=arg_name: tool.ainvoke({arg_name: ticker}),
+         (provider, PROVIDER_CALL_COSTS.get(provider, 1)))
+        for tool, arg_name, provider in SECTION_TOOLS[section]
+    ]
+    tool_name, result = await hedged_call(candidates)
+    return _section_result(tool_name, result)
+
+
+async def direct_fetch_node(state: FinancialAnalysisState) -> FinancialAnalysisState:
+    """Fetch every section by calling the tools directly, skipping the ReAct sub-agents"""
+    ticker = state['ticker']
+
+    logger.info("Direct fetch: Calling provider tools in parallel", extra={"ticker": ticker})
+    sections = list(SECTION_TOOLS)
+    results = await asyncio.gather(*(_fetch_section(ticker, section) for section in sections))
+
+    for section, result in zip(sections, results):
+        state[section] = result
+
+    logger.info("Direct fetch: All sections completed", extra={"ticker": ticker})
+    log_payload(logger, "Direct fetch: Section results", **{section: state[section] for section in sections})
+    return state
+
+
+async def fetch_section(ticker: str, section: str, mode: str = None) -> SectionResult:
+    """Gather one state section, via its sub-agent or directly depending on `mode`."""
+    mode = mode or ANALYSIS_MODE
     try:
-        print(f"📊 Orchestrator Agent: Creating comprehensive summary...")
-        
-        # Create a comprehensive summary prompt with all collected data
-        summary_prompt = f"""
-        As the Financial Analysis Orchestrator Agent, create a comprehensive financial analysis summary for {state['ticker']} based on the following data collected from your sub-agents:
+        if mode == "agents":
+            return await _run_sub_agent(ticker, section)
+        return await _fetch_section(ticker, section)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+async def iter_sections(ticker: str, mode: str = None):
+    """
+    Gather all four sections concurrently and yield (section, result) pairs in
+    completion order, so callers can stream each one as soon as it is ready.
+    """
+    async def tagged(section):
+        return section, await fetch_section(ticker, section, mode)
+
+    tasks = [asyncio.ensure_future(tagged(section)) for section in SUB_AGENTS]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away mid-stream: stop the remaining fetches
+        for task in tasks:
+            task.cancel()
+
+
+def build_summary_prompt(state: FinancialAnalysisState, digest: dict = None) -> str:
+    """Create a comprehensive summary prompt from a compact digest of the collected data"""
+    # Raw sub-agent results carry every message and 100 indicator rows; the LLM only needs the digest
+    digest = digest or build_digest(state)
+
+    return f"""
+        As the Financial Analysis Orchestrator Agent, create a comprehensive financial analysis summary for {state['ticker']} based on the following data collected from your sub-agents.
+        Indicator "chg_N" fields are the change over the last N bars.
+        News "sentiment" fields are lexicon scores from -1 (negative) to 1 (positive); the news section's "sentiment" aggregates them, weighted by recency and by how many outlets carried each story.
 
         STOCK DATA (from StockPriceAgent):
-        {state.get('stock_data', {})}
+        {format_section(digest['stock_data'])}
 
         NEWS DATA (from CompanyNewsAgent):
-        {state.get('news_data', {})}
+        {format_section(digest['news_data'])}
 
         TECHNICAL DATA (from FinancialAgent):
-        {state.get('technical_data', {})}
+        {format_section(digest['technical_data'])}
+
+        COMPANY FUNDAMENTALS (from CompanyFundamentalAgent):
+        {format_section(digest['company_data'])}
 
         Provide a professional, comprehensive analysis that includes:
 
         1. **Current Stock Performance**: Analyze current price, volume, market cap, and key metrics
         2. **Key News Highlights**: Summarize important news and their potential impact
         3. **Technical Analysis**: Interpret technical indicators and trends
-        4. **Market Sentiment**: Overall market perception and sentiment
-        5. **Investment Considerations**: Clear recommendations and risk factors
-        6. **Action Items**: Specific actionable insights for investors
+        4. **Company Fundamentals**: Valuation, profitability, growth and balance sheet strength
+        5. **Market Sentiment**: Overall market perception and sentiment, grounded in the news sentiment scores
+        6. **Investment Considerations**: Clear recommendations and risk factors
+        7. **Action Items**: Specific actionable insights for investors
 
         Be thorough, data-driven, and provide clear, actionable insights.
         """
+
+
+async def stream_summary(state: FinancialAnalysisState):
+    """
+    Yield the final summary token by token from the orchestrator's LLM, or all
+    at once when a summary for the same inputs is cached.
+    """
+    from agents.orchestrator_agent import ORCHESTRATOR_PROMPT
+
+    llm_caller.set("summary")
+    digest = build_digest(state)
+    key = summary_key(state["ticker"], digest)
+    hit, summary = await summary_cache.aget(key)
+    if hit:
+        yield summary
+        return
+
+    async with refresh_lease(summary_cache, key) as (hit, summary):
+        if hit:
+            yield summary
+            return
+
+        messages = [SystemMessage(content=ORCHESTRATOR_PROMPT), HumanMessage(content=build_summary_prompt(state, digest))]
+        tokens = []
+        async for chunk in orchestrator_llm.astream(messages):
+            if chunk.content:
+                tokens.append(chunk.content)
+                yield chunk.content
+
+        if tokens:
+            await summary_cache.aset(key, "".join(tokens), SUMMARY_TTL_SECONDS)
+
+
+async def final_summary_node(state: FinancialAnalysisState) -> FinancialAnalysisState:
+    """Node where orchestrator agent provides final comprehensive summary"""
+    try:
+        logger.info("Orchestrator Agent: Creating comprehensive summary", extra={"ticker": state["ticker"]})
+        llm_caller.set("summary")
+
+        # Identical inputs (same rounded price, headlines, indicators, fundamentals) reuse the last summary
+        digest = build_digest(state)
+        key = summary_key(state["ticker"], digest)
+        hit, summary = await summary_cache.aget(key)
+        if hit:
+            logger.info("Orchestrator Agent: Reusing cached summary", extra={"ticker": state["ticker"]})
+            state["final_summary"] = summary
+            return state
+
+        async with refresh_lease(summary_cache, key) as (hit, summary):
+            if hit:
+                logger.info("Orchestrator Agent: Reusing summary from another worker", extra={"ticker": state["ticker"]})
+                state["final_summary"] = summary
+                return state
+
+            summary_prompt = build_summary_prompt(state, digest)
+
+            # Use the orchestrator agent to create the final summary
+            result = await orchestrator_agent.ainvoke({
+                "messages": [HumanMessage(content=summary_prompt)]
+            })
         
-        # Use the orchestrator agent to create the final summary
-        result = await orchestrator_agent.ainvoke({
-            "messages": [HumanMessage(content=summary_prompt)]
-        })
-        
-        # Fix: Access content directly from AIMessage
-        if hasattr(result, 'content'):
-            state["final_summary"] = result.content
-        elif isinstance(result, dict) and 'messages' in result:
-            state["final_summary"] = result['messages'][-1].content if result['messages'] else "Summary generation failed"
-        else:
-            state["final_summary"] = "Summary generation failed"
+            # Fix: Access content directly from AIMessage
+            if hasattr(result, 'content'):
+                state["final_summary"] = result.content
+            elif isinstance(result, dict) and 'messages' in result:
+                state["final_summary"] = result['messages'][-1].content if result['messages'] else "Summary generation failed"
+            else:
+                state["final_summary"] = "Summary generation failed"
+
+            if state["final_summary"] and state["final_summary"] != "Summary generation failed":
+                await summary_cache.aset(key, state["final_summary"], SUMMARY_TTL_SECONDS)
         
-        print(f"✅ Orchestrator Agent: Final summary completed")
+        logger.info("Orchestrator Agent: Final summary completed", extra={"ticker": state["ticker"]})
         
         return state
         
     except Exception as e:
-        print(f"❌ Orchestrator Agent: Error in summary generation - {str(e)}")
+        logger.exception("Orchestrator Agent: Error in summary generation", extra={"ticker": state["ticker"]})
         state["final_summary"] = f"Failed to create summary: {str(e)}"
         return state
 
 # Create the workflow graph
-def create_financial_analysis_graph() -> Graph:
-    """Create the LangGraph workflow with proper orchestrator agent"""
-    
+def create_financial_analysis_graph(mode: str = None) -> Graph:
+    """
+    Create the LangGraph workflow with proper orchestrator agent.
+
+    `mode` selects how the data sections are gathered: "agents" runs the four
+    ReAct sub-agents, "direct" calls the tools in code and only uses the LLM
+    for the final summary. Defaults to the ANALYSIS_MODE environment variable.
+    """
+    mode = mode or ANALYSIS_MODE
+    if mode not in ANALYSIS_MODES:
+        raise ValueError(f"Unknown analysis mode: {mode}")
+
     # Create state graph
     workflow = StateGraph(FinancialAnalysisState)
     
     # Add nodes
-    workflow.add_node("orchestrator", orchestrator_node)
-    workflow.add_node("summary_generation", final_summary_node)
+    workflow.add_node("orchestrator", timed_node(mode, "orchestrator", orchestrator_node if mode == "agents" else direct_fetch_node))
+    workflow.add_node("summary_generation", timed_node(mode, "summary_generation", final_summary_node))
     
     # Set entry point
     workflow.set_entry_point("orchestrator")